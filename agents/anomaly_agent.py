@@ -1,21 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from utils.historical_baseline import HistoricalBaseline
+
+
 class PayrollAnomalyAgent:
     """
     Detects anomalies by comparing current payroll with historical data.
+    The comparison point is the employee's latest historical month,
+    read from a HistoricalBaseline index (built from historical_df
+    when no baseline is passed in).
+
+    With a fitted StatisticalAnomalyEngine (utils.anomaly_engine), its
+    robust-statistics / model anomalies are appended to the rule-based ones.
+    The engine scores the run's input rows (`inputs`, on the same basis
+    as the history it was fitted on), not the computed gross / net.
     """
 
-    def run(self, current_df, historical_df, threshold=0.2):
+    def __init__(self, engine=None):
+        self.engine = engine
+
+    def run(self, current_df, historical_df=None, threshold=0.2, baseline=None,
+            earnings=None, inputs=None):
         anomalies = []
 
-        historical_map = historical_df.set_index("employee_id")
+        if baseline is None:
+            baseline = HistoricalBaseline.from_frame(historical_df)
 
         for _, row in current_df.iterrows():
             emp_id = row["employee_id"]
 
-            if emp_id not in historical_map.index:
+            previous = baseline.get(emp_id)
+
+            if previous is None:
                 continue
 
-            previous = historical_map.loc[emp_id]
-            prev_gross = previous["gross_salary"]
+            prev_gross = previous["last_gross"]
             curr_gross = row["gross_salary"]
 
             if prev_gross > 0:
@@ -33,4 +53,92 @@ class PayrollAnomalyAgent:
                         }
                     })
 
+        if self.engine is not None:
+            scored = inputs if inputs is not None else current_df
+            for row_anomalies in self.engine.score(scored, earnings):
+                anomalies.extend(row_anomalies)
+
         return anomalies
+
+    def run_batch(self, current_df, historical_df=None, threshold=0.2, baseline=None,
+                  earnings=None, months=None, period_gross=None, inputs=None):
+        """
+        Columnar anomaly detection for a whole payroll frame:
+        one vectorized join against the baseline index.
+        earnings (Bonus / Incentive columns aligned on current_df) feeds
+        the engine's bonus statistics; inputs (the input payroll rows,
+        aligned on current_df; default current_df) are what the engine
+        scores gross and net on.
+        months ("YYYY-MM" per row) makes it a multi-period check: each row
+        is compared with the same employee's previous month in current_df,
+        and with the baseline only for the employee's first month.
+        period_gross is what a month contributes as history to the next
+        one (default: current_df gross_salary); pass the input gross, as
+        in the historical files, to match month-by-month runs.
+        Returns one list of anomalies per row, in row order.
+        """
+        if baseline is None:
+            baseline = HistoricalBaseline.from_frame(historical_df)
+
+        prev_gross = baseline.join(current_df["employee_id"])["last_gross"].to_numpy()
+
+        if months is not None:
+            if period_gross is None:
+                period_gross = current_df["gross_salary"]
+            in_batch = self.previous_month_gross(current_df["employee_id"], months, period_gross)
+            prev_gross = np.where(np.isnan(in_batch), prev_gross, in_batch)
+        curr_gross = current_df["gross_salary"].to_numpy(dtype=float)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change_ratio = (curr_gross - prev_gross) / prev_gross
+
+        flagged = (prev_gross > 0) & (np.abs(change_ratio) > threshold)
+
+        per_row = [[] for _ in range(len(current_df))]
+
+        emp_list = current_df["employee_id"].tolist()
+        curr_list = current_df["gross_salary"].tolist()
+
+        for i in np.flatnonzero(flagged):
+            per_row[i].append({
+                "employee_id": emp_list[i],
+                "issue_type": "Salary Anomaly",
+                "severity": "High",
+                "details": {
+                    "previous_gross": float(prev_gross[i]),
+                    "current_gross": curr_list[i],
+                    "change_percentage": round(change_ratio[i] * 100, 2)
+                }
+            })
+
+        if self.engine is not None:
+            scored = inputs if inputs is not None else current_df
+            for row_anomalies, extra in zip(per_row, self.engine.score(scored, earnings)):
+                row_anomalies.extend(extra)
+
+        return per_row
+
+    @staticmethod
+    def previous_month_gross(employee_ids, months, gross):
+        """
+        Gross of each row's employee in the latest earlier month among
+        the rows (NaN for the employee's first month). An employee
+        listed twice in a month counts with their last row.
+        """
+        frame = pd.DataFrame({
+            "employee_id": pd.Series(employee_ids).astype(str).to_numpy(),
+            "month": np.asarray(months, dtype=str),
+            "gross_salary": np.asarray(gross, dtype=float)
+        })
+
+        monthly = (
+            frame.drop_duplicates(["employee_id", "month"], keep="last")
+            .sort_values(["employee_id", "month"])
+        )
+        monthly["previous_gross"] = monthly.groupby("employee_id", sort=False)["gross_salary"].shift(1)
+
+        return frame[["employee_id", "month"]].merge(
+            monthly[["employee_id", "month", "previous_gross"]],
+            on=["employee_id", "month"],
+            how="left"
+        )["previous_gross"].to_numpy(dtype=float)
@@ -1,62 +1,388 @@
 # agents/audit_agent.py
 
+import itertools
 import json
 import os
+import queue
+import threading
 from datetime import datetime
 
+from utils.audit_store import AuditStore, AUDIT_DB_PATH, summary_row
+from utils.audit_segments import SegmentedAuditLog, AUDIT_LOG_DIR, SEGMENT_MAX_BYTES
+
+# Legacy single-file logs (detail log is now segmented under AUDIT_LOG_DIR)
 AUDIT_LOG_JSON = "data/payroll_audit_detail.jsonl"
 AUDIT_LOG_CSV = "data/payroll_audit_summary.csv"
 
+AUDIT_CSV_HEADER = (
+    "payroll_run_id,payroll_period,employee_id,"
+    "gross_salary,net_salary,"
+    "validation_issue_count,anomaly_count,execution_timestamp\n"
+)
 
-class AuditAgent:
+# -----------------------------
+# Audit record schema
+# -----------------------------
+# Only these fields are numeric; everything else is written as-is.
+NUMERIC_FIELDS = ("gross_salary", "net_salary", "total_deductions")
+NUMERIC_MAP_FIELDS = ("earnings", "deductions")
+ANOMALY_NUMERIC_DETAILS = ("previous_gross", "current_gross", "change_percentage")
+
+
+def serialize_audit_record(payload: dict) -> dict:
     """
-    Persists payroll audit data in JSON-safe and reporting-friendly formats.
+    Schema-aware JSON-safe copy of an audit payload: known numeric
+    fields are cast to float, nothing else is probed.
     """
+    record = dict(payload)
 
-    def _safe(self, obj):
-        if isinstance(obj, dict):
-            return {k: self._safe(v) for k, v in obj.items()}
-        if isinstance(obj, list):
-            return [self._safe(v) for v in obj]
-        try:
-            return float(obj)
-        except Exception:
-            return obj
+    for field in NUMERIC_FIELDS:
+        if field in record:
+            record[field] = float(record[field])
 
-    def run(self, payload: dict):
+    for field in NUMERIC_MAP_FIELDS:
+        if field in record:
+            record[field] = {k: float(v) for k, v in record[field].items()}
+
+    if "anomalies" in record:
+        anomalies = []
+        for anomaly in record["anomalies"]:
+            anomaly = dict(anomaly)
+            details = dict(anomaly.get("details", {}))
+            for field in ANOMALY_NUMERIC_DETAILS:
+                if details.get(field) is not None:
+                    details[field] = float(details[field])
+            anomaly["details"] = details
+            anomalies.append(anomaly)
+        record["anomalies"] = anomalies
+
+    return record
+
+
+class SerializedAudit:
+    """
+    Audit records ready to be written: detail-log entries
+    (payroll_run_id, employee_id, payroll_period, JSON line), audit store
+    rows, legacy summary CSV lines, and the detail-log byte count.
+    """
+
+    def __init__(self, entries, rows, csv_lines, bytes):
+        self.entries = entries
+        self.rows = rows
+        self.csv_lines = csv_lines
+        self.bytes = bytes
+
+
+def serialize_audit_batch(payloads, store=True, csv=False):
+    """
+    Serializes audit payloads (timestamping each one) into a
+    SerializedAudit. This is the costly part of auditing, so sharded runs
+    do it in their worker processes and hand the result to the parent's
+    AuditWriter.write_serialized.
+    """
+    entries, rows, csv_lines = [], [], []
+    size = 0
+
+    for payload in payloads:
         timestamp = datetime.utcnow().isoformat()
 
         payload["execution_timestamp"] = timestamp
-        safe_payload = self._safe(payload)
-
-        # -----------------------------
-        # 1️⃣ JSONL – full audit record
-        # -----------------------------
-        os.makedirs("data", exist_ok=True)
-        with open(AUDIT_LOG_JSON, "a", encoding="utf-8") as f:
-            f.write(json.dumps(safe_payload) + "\n")
-
-        # -----------------------------
-        # 2️⃣ CSV – summary for reports
-        # -----------------------------
-        summary_row = (
-            f"{payload['payroll_run_id']},"
-            f"{payload['payroll_period']},"
-            f"{payload['employee_id']},"
-            f"{safe_payload.get('gross_salary', 0)},"
-            f"{safe_payload.get('net_salary', 0)},"
-            f"{len(payload.get('validation_issues', []))},"
-            f"{len(payload.get('anomalies', []))},"
-            f"{timestamp}\n"
+        safe_payload = serialize_audit_record(payload)
+
+        # 1️⃣ JSONL – full audit record (segmented, indexed)
+        line = json.dumps(safe_payload)
+        entries.append((
+            payload["payroll_run_id"],
+            payload["employee_id"],
+            payload["payroll_period"],
+            line
+        ))
+        size += len(line.encode("utf-8")) + 1
+
+        # 2️⃣ Audit store – indexed summary + record
+        if store:
+            rows.append(summary_row(safe_payload))
+
+        # 3️⃣ CSV – legacy summary for reports
+        if csv:
+            csv_lines.append(
+                f"{payload['payroll_run_id']},"
+                f"{payload['payroll_period']},"
+                f"{payload['employee_id']},"
+                f"{safe_payload.get('gross_salary', 0)},"
+                f"{safe_payload.get('net_salary', 0)},"
+                f"{len(payload.get('validation_issues', []))},"
+                f"{len(payload.get('anomalies', []))},"
+                f"{timestamp}\n"
+            )
+
+    return SerializedAudit(entries, rows, csv_lines, size)
+
+
+class AuditWriter:
+    """
+    Run-scoped audit writer.
+    Keeps the segmented JSONL detail log and the audit store open for
+    the whole run, buffers records and writes them in batches (optionally
+    from a background thread), and fsyncs once when the run is committed.
+    Store batches are committed as they are written but stay pending
+    (invisible) until the run commits, so no database lock is held for
+    the whole run. The legacy summary CSV is only written when csv_path
+    is set.
+
+    Usage:
+        with AuditWriter() as audit:
+            audit.write(payload)
+
+    Leaving the block with an exception aborts the run instead: nothing
+    of it is committed (see abort).
+    """
+
+    def __init__(self, log_dir=AUDIT_LOG_DIR, csv_path=None,
+                 store_path=AUDIT_DB_PATH, flush_every=1000, background=False,
+                 segment_max_bytes=SEGMENT_MAX_BYTES):
+        self.log_dir = log_dir
+        self.segment_max_bytes = segment_max_bytes
+        self.csv_path = csv_path
+        self.store_path = store_path
+        self.flush_every = flush_every
+        self.background = background
+
+        self._json_buffer = []
+        self._csv_buffer = []
+        self._rows = []
+        self._log = None
+        self._csv_file = None
+        self._store = None
+        self._pending = None        # audit store token of this run's rows
+        self._run_ids = set()
+        self._written = []          # segment entries, for abort()
+        self._csv_start = 0
+        self._queue = None
+        self._thread = None
+        self._error = None
+        self._aborted = False
+        self._lock = threading.Lock()   # write() may be called from worker threads
+
+        self.records_written = 0
+        self.bytes_written = 0      # uncompressed detail-log bytes
+
+    # -----------------------------
+    # Lifecycle
+    # -----------------------------
+    def open(self):
+        self._log = SegmentedAuditLog(self.log_dir, max_bytes=self.segment_max_bytes)
+
+        if self.csv_path is not None:
+            os.makedirs(os.path.dirname(self.csv_path) or ".", exist_ok=True)
+            self._csv_file = open(self.csv_path, "a", encoding="utf-8")
+            if self._csv_file.tell() == 0:
+                self._csv_file.write(AUDIT_CSV_HEADER)
+            self._csv_start = self._csv_file.tell()
+
+        if self.store_path is not None:
+            self._store = AuditStore(self.store_path)
+            self._pending = self._store.new_pending()
+
+        if self.background:
+            self._queue = queue.Queue(maxsize=8)
+            self._thread = threading.Thread(
+                target=self._drain, name="audit-writer", daemon=True
+            )
+            self._thread.start()
+
+        return self
+
+    def commit(self):
+        """
+        Flushes everything buffered, fsyncs the log files once,
+        commits the audit store and closes everything. If any batch
+        failed to write, the run is aborted instead and the error raised.
+        """
+        if self._log is None:
+            return
+
+        try:
+            self.flush()
+            self._stop_thread()
+            if self._error is not None:
+                raise self._error
+        except BaseException:
+            # Nothing is closed, fsynced or committed for a failed run
+            self.abort()
+            raise
+
+        self._log.close()
+
+        if self._csv_file is not None:
+            self._csv_file.flush()
+            os.fsync(self._csv_file.fileno())
+            self._csv_file.close()
+
+        if self._store is not None:
+            self._store.publish(self._pending, self._run_ids)
+            self._store.close()
+
+        self._reset()
+
+    def abort(self):
+        """
+        Discards the run: buffered records are dropped, records already
+        flushed are removed from the segment indexes and from the audit
+        store, and the summary CSV is truncated. Closes everything.
+        """
+        if self._log is None:
+            return
+
+        with self._lock:
+            self._json_buffer = []
+            self._csv_buffer = []
+            self._rows = []
+            self._aborted = True
+        self._stop_thread()
+
+        self._log.discard(self._written)
+        self._log.close()
+
+        if self._csv_file is not None:
+            self._csv_file.flush()
+            self._csv_file.truncate(self._csv_start)
+            self._csv_file.close()
+
+        if self._store is not None:
+            self._store.discard(self._pending)
+            self._store.close()
+
+        self._reset()
+
+    def _stop_thread(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+            self._queue = None
+
+    def _reset(self):
+        self._log = None
+        self._csv_file = None
+        self._store = None
+        self._pending = None
+        self._written = []
+        self._error = None
+        self._aborted = False
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc, tb):
+        # A run that failed part-way is not committed
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+    # -----------------------------
+    # Writing
+    # -----------------------------
+    def write(self, payload: dict):
+        self.write_serialized(self.serialize([payload]))
+
+    def write_results(self, results):
+        """
+        Writes one record per employee of a PayrollResultSet, reading
+        its columns directly.
+        """
+        payloads = results.audit_payloads()
+        while True:
+            batch = self.serialize(itertools.islice(payloads, self.flush_every))
+            if not batch.entries:
+                return
+            self.write_serialized(batch)
+
+    def serialize(self, payloads):
+        """
+        SerializedAudit of payloads for this writer's outputs.
+        """
+        return serialize_audit_batch(
+            payloads, store=self.store_path is not None, csv=self.csv_path is not None
         )
 
-        if not os.path.exists(AUDIT_LOG_CSV):
-            with open(AUDIT_LOG_CSV, "w", encoding="utf-8") as f:
-                f.write(
-                    "payroll_run_id,payroll_period,employee_id,"
-                    "gross_salary,net_salary,"
-                    "validation_issue_count,anomaly_count,execution_timestamp\n"
-                )
+    def write_serialized(self, batch):
+        """
+        Buffers records serialized by serialize_audit_batch (possibly in
+        another process); written on the next flush.
+        """
+        with self._lock:
+            self._json_buffer.extend(batch.entries)
+            self._rows.extend(batch.rows)
+            self._csv_buffer.extend(batch.csv_lines)
+            if batch.rows:
+                self._run_ids.update(entry[0] for entry in batch.entries)
+            self.records_written += len(batch.entries)
+            self.bytes_written += batch.bytes
+
+        if len(self._json_buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """
+        Hands the buffered batch to the files (or the background thread).
+        """
+        with self._lock:
+            # A failed batch fails the run: stop feeding it
+            if self._error is not None:
+                raise self._error
+            if not self._json_buffer:
+                return
+
+            batch = (self._json_buffer, "".join(self._csv_buffer), self._rows)
+            self._json_buffer = []
+            self._csv_buffer = []
+            self._rows = []
+
+            # Under the lock so batches reach the files in order
+            if self._queue is not None:
+                self._queue.put(batch)
+            else:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        entries, csv_chunk, rows = batch
+        self._written.extend(self._log.write_batch(entries))
+        if self._csv_file is not None:
+            self._csv_file.write(csv_chunk)
+        if self._store is not None:
+            self._store.insert_rows(rows, self._pending)
+
+    def _drain(self):
+        while True:
+            batch = self._queue.get()
+            if batch is None:
+                return
+            if self._error is not None or self._aborted:
+                # After a failure (or abort) queued batches are dropped, not written
+                continue
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                self._error = e
 
-        with open(AUDIT_LOG_CSV, "a", encoding="utf-8") as f:
-            f.write(summary_row)
+
+class AuditAgent:
+    """
+    Persists payroll audit data in JSON-safe and reporting-friendly formats.
+    """
+
+    def open_run(self, flush_every=1000, background=False):
+        """
+        Returns a run-scoped AuditWriter (use as a context manager).
+        """
+        return AuditWriter(flush_every=flush_every, background=background)
+
+    def run(self, payload: dict):
+        """
+        Writes a single audit record (one-off runs outside a batch).
+        """
+        with self.open_run() as audit:
+            audit.write(payload)
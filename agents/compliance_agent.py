@@ -1,18 +1,21 @@
 # agents/compliance_agent.py
 
-from rules.payroll_rules import (
-    calculate_pf,
-    calculate_esi,
-    calculate_pt,
-    calculate_tds
-)
+import numpy as np
+import pandas as pd
+
+from rules.payroll_rules import RULES_VERSION
+from rules.rule_tables import load_rule_table
 
 class ComplianceAgent:
     """
-    Applies statutory deductions using centralized payroll rules
+    Applies statutory deductions using the versioned rule tables
+    (PF / ESI wage ceilings by date, per-state PT slabs, income-tax slabs)
     """
 
-    def run(self, earnings: dict):
+    def __init__(self, rules_version=RULES_VERSION):
+        self.rules = load_rule_table(rules_version)
+
+    def run(self, earnings: dict, state=None, pay_date=None):
         """
         earnings: dict with numeric values only
         """
@@ -25,13 +28,40 @@ class ComplianceAgent:
         basic = clean_earnings.get("Basic", 0.0)
         gross = sum(clean_earnings.values())
 
-        deductions = {}
+        deductions = self._compute(
+            np.array([basic]),
+            np.array([gross]),
+            None if state is None else [state],
+            None if pay_date is None else [pay_date]
+        )
+
+        return {k: float(v[0]) for k, v in deductions.items()}
 
-        deductions["PF"] = calculate_pf(basic)
-        deductions["ESI"] = calculate_esi(gross)
-        deductions["PT"] = calculate_pt()
+    def run_batch(self, earnings_df, states=None, pay_dates=None):
+        """
+        earnings_df: one float column per earning component, one row per employee.
+        states / pay_dates: optional per-row PT state codes and pay dates.
+        Returns a DataFrame (PF, ESI, PT, TDS) aligned on earnings_df.index.
+        """
 
-        taxable_income = gross - deductions["PF"]
-        deductions["TDS"] = calculate_tds(taxable_income)
+        basic = earnings_df["Basic"].to_numpy(dtype=float)
 
-        return deductions
+        # Left-to-right column sum, same order as sum(earnings.values())
+        gross = 0.0
+        for col in earnings_df.columns:
+            gross = gross + earnings_df[col].to_numpy(dtype=float)
+
+        return pd.DataFrame(
+            self._compute(basic, gross, states, pay_dates),
+            index=earnings_df.index
+        )
+
+    def _compute(self, basic, gross, states, pay_dates):
+        pf = self.rules.pf(basic, pay_dates)
+
+        return {
+            "PF": pf,
+            "ESI": self.rules.esi(gross, pay_dates),
+            "PT": self.rules.pt(gross, states),
+            "TDS": self.rules.tds(gross - pf)
+        }
@@ -1,21 +1,189 @@
+import math
+
+from agents.explanation_backends import TemplateBackend
+from utils.explanation_cache import ExplanationCache
+
+CHANGE_BUCKET = 10          # percent; anomalies share a template per bucket
+
+NO_ISSUES_EXPLANATION = "No validation issues or anomalies detected."
+
+# Values each issue type can fill into its template
+_PLACEHOLDERS = {
+    "Validation Error": ("employee_id", "issues"),
+    "Salary Anomaly": ("employee_id", "change_percentage", "previous_gross", "current_gross"),
+    "Statistical Anomaly": (
+        "employee_id", "metric", "current_value", "median_value",
+        "robust_z_score", "z_score", "change_percentage"
+    ),
+    "Model Anomaly": ("employee_id", "model", "model_score"),
+}
+
+
+def _bucket(change_percentage):
+    if change_percentage is None or (isinstance(change_percentage, float) and math.isnan(change_percentage)):
+        return "na"
+    return str(int(math.floor(change_percentage / CHANGE_BUCKET) * CHANGE_BUCKET))
+
+
+def issue_signature(issue):
+    """
+    Identical issues across employees share a signature, and so one
+    cached explanation template:
+    - validation errors: the issue code (set of failed rules)
+    - salary / statistical anomalies: metric + change % bucket
+    - model anomalies: the model
+    """
+    issue_type = issue["issue_type"]
+    details = issue.get("details", {})
+
+    if issue_type == "Validation Error":
+        code = issue.get("issue_code")
+        return f"validation:{code if code is not None else '|'.join(issue['issues'])}"
+
+    if issue_type == "Salary Anomaly":
+        return f"salary:{_bucket(details.get('change_percentage'))}"
+
+    if issue_type == "Statistical Anomaly":
+        return f"statistical:{details['metric']}:{_bucket(details.get('change_percentage'))}"
+
+    if issue_type == "Model Anomaly":
+        return f"model:{details['model']}"
+
+    return f"other:{issue_type}"
+
+
+def issue_fields(issue):
+    """
+    Placeholder values of one issue.
+    """
+    if issue["issue_type"] == "Validation Error":
+        return {"employee_id": issue["employee_id"], "issues": ", ".join(issue["issues"])}
+
+    return {"employee_id": issue["employee_id"], **issue.get("details", {})}
+
+
 class PayrollExplanationAgent:
     """
     Generates human-readable explanations for payroll issues.
+
+    Explanations are rendered from templates keyed by issue signature.
+    Templates come from a pluggable backend (built-in wording by default,
+    see agents.explanation_backends) and are cached, so a batch asks the
+    backend once per distinct signature, however many employees share it.
     """
 
+    def __init__(self, backend=None, cache=None):
+        self.backend = backend or TemplateBackend()
+        self.cache = cache if cache is not None else ExplanationCache()
+        self._fallback = TemplateBackend()
+
     def explain_validation(self, issue):
-        return (
-            f"Employee {issue['employee_id']} has payroll validation issues. "
-            f"Issues detected: {', '.join(issue['issues'])}. "
-            f"Please verify payroll inputs."
-        )
+        return self._render(self.templates_for([issue]), issue)
 
     def explain_anomaly(self, anomaly):
-        details = anomaly["details"]
-        return (
-            f"Employee {anomaly['employee_id']} has a salary change of "
-            f"{details['change_percentage']}% compared to the previous period. "
-            f"Previous Gross: {details['previous_gross']}, "
-            f"Current Gross: {details['current_gross']}. "
-            f"Please verify bonus or compensation changes."
+        return self._render(self.templates_for([anomaly]), anomaly)
+
+    def explain(self, validation_issues, anomalies):
+        """
+        Combined explanation of one employee's issues.
+        """
+        issues = list(validation_issues) + list(anomalies)
+        return self._compose(self.templates_for(issues), issues)
+
+    def explain_results(self, results):
+        """
+        Fills the missing ("explanation": None) explanations of a batch
+        of results in place, resolving all their templates in one pass.
+        Returns results.
+        """
+        pending = [r for r in results if r.get("explanation") is None]
+        if not pending:
+            return results
+
+        templates = self.templates_for(
+            issue
+            for r in pending
+            for issue in r["validation_issues"] + r["anomalies"]
         )
+
+        for result in pending:
+            result["explanation"] = self._compose(
+                templates, result["validation_issues"] + result["anomalies"]
+            )
+
+        return results
+
+    # -----------------------------
+    # Templates
+    # -----------------------------
+    def templates_for(self, issues):
+        """
+        signature → template for every distinct signature in issues.
+        Cache misses go to the backend in one call; signatures the
+        backend cannot answer get the built-in wording (not cached).
+        """
+        examples = {}
+        for issue in issues:
+            examples.setdefault(issue_signature(issue), issue)
+
+        if not examples:
+            return {}
+
+        templates = self.cache.get_many(self.backend.name, list(examples))
+        missing = [signature for signature in examples if signature not in templates]
+
+        if missing:
+            contexts = [self._context(signature, examples[signature]) for signature in missing]
+            try:
+                generated = self.backend.generate(contexts)
+            except Exception:
+                generated = {}
+
+            accepted = {}
+            for context in contexts:
+                signature = context["signature"]
+                template = generated.get(signature)
+                if template is not None and self._renders(template, examples[signature]):
+                    accepted[signature] = template
+                else:
+                    templates[signature] = self._fallback.template_for(context)
+
+            self.cache.put_many(self.backend.name, accepted)
+            templates.update(accepted)
+
+        return templates
+
+    @staticmethod
+    def _context(signature, issue):
+        fields = issue_fields(issue)
+        placeholders = _PLACEHOLDERS.get(issue["issue_type"], tuple(fields))
+        return {
+            "signature": signature,
+            "issue_type": issue["issue_type"],
+            "placeholders": list(placeholders),
+            "example": {k: fields.get(k) for k in placeholders},
+        }
+
+    @staticmethod
+    def _renders(template, issue):
+        try:
+            template.format(**issue_fields(issue))
+        except (KeyError, IndexError, ValueError, AttributeError):
+            return False
+        return True
+
+    # -----------------------------
+    # Rendering
+    # -----------------------------
+    def _render(self, templates, issue):
+        try:
+            return templates[issue_signature(issue)].format(**issue_fields(issue))
+        except (KeyError, IndexError, ValueError, AttributeError):
+            # e.g. a cached model template using a field this issue lacks
+            context = self._context(issue_signature(issue), issue)
+            return self._fallback.template_for(context).format(**issue_fields(issue))
+
+    def _compose(self, templates, issues):
+        if not issues:
+            return NO_ISSUES_EXPLANATION
+        return "\n".join(self._render(templates, issue) for issue in issues)
@@ -0,0 +1,214 @@
+# agents/explanation_backends.py
+
+"""
+Explanation template backends.
+
+A backend turns issue contexts into explanation templates:
+
+    generate([{"signature", "issue_type", "placeholders", "example"}, ...])
+        → {signature: template}
+
+Templates use str.format placeholders ({employee_id}, {previous_gross},
+...), so one template serves every employee with the same issue shape.
+
+- TemplateBackend      : built-in wording, no I/O (default)
+- HTTPExplanationBackend: OpenAI-compatible chat completions endpoint
+  (xAI Grok by default), called in concurrent batches under a rate limit
+"""
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+GROK_API_URL = "https://api.x.ai/v1/chat/completions"
+GROK_MODEL = "grok-2-latest"
+
+VALIDATION_TEMPLATE = (
+    "Employee {employee_id} has payroll validation issues. "
+    "Issues detected: {issues}. "
+    "Please verify payroll inputs."
+)
+
+SALARY_ANOMALY_TEMPLATE = (
+    "Employee {employee_id} has a salary change of "
+    "{change_percentage}% compared to the previous period. "
+    "Previous Gross: {previous_gross}, "
+    "Current Gross: {current_gross}. "
+    "Please verify bonus or compensation changes."
+)
+
+STATISTICAL_ANOMALY_TEMPLATE = (
+    "Employee {employee_id} has an unusual {metric} "
+    "of {current_value} against a typical {median_value} "
+    "(robust z-score {robust_z_score}). "
+    "Please verify this month's payroll inputs."
+)
+
+MODEL_ANOMALY_TEMPLATE = (
+    "Employee {employee_id}'s pay pattern is an outlier "
+    "against the workforce history ({model} score "
+    "{model_score}). Please review."
+)
+
+_TEMPLATES = {
+    "Validation Error": VALIDATION_TEMPLATE,
+    "Salary Anomaly": SALARY_ANOMALY_TEMPLATE,
+    "Statistical Anomaly": STATISTICAL_ANOMALY_TEMPLATE,
+    "Model Anomaly": MODEL_ANOMALY_TEMPLATE,
+}
+
+SYSTEM_PROMPT = (
+    "You write short, neutral explanations of payroll issues for HR reviewers. "
+    "For every issue in the user's JSON, return one explanation template that "
+    "uses only the listed placeholders in Python str.format syntax, e.g. "
+    "{employee_id}. Reply with a JSON object: "
+    '{"templates": {"<signature>": "<template>", ...}}.'
+)
+
+
+class TemplateBackend:
+    """
+    Built-in explanation wording.
+    """
+
+    name = "template-v1"
+
+    def template_for(self, context):
+        return _TEMPLATES.get(context["issue_type"], SALARY_ANOMALY_TEMPLATE)
+
+    def generate(self, contexts):
+        return {c["signature"]: self.template_for(c) for c in contexts}
+
+
+class RateLimiter:
+    """
+    Spaces calls at most `rate` per second across threads.
+    """
+
+    def __init__(self, rate):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.interval = 1.0 / rate
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class HTTPExplanationBackend:
+    """
+    Chat-completions backend. Contexts are sent `batch_size` at a time,
+    with up to `max_concurrency` requests in flight and at most
+    `rate_limit` requests per second. Failed or malformed responses
+    yield no template for their signatures (the agent falls back to
+    the built-in wording for those and does not cache them).
+    """
+
+    def __init__(self, url=GROK_API_URL, api_key=None, model=GROK_MODEL,
+                 batch_size=20, max_concurrency=4, rate_limit=2.0,
+                 timeout=30, retries=2, backoff=0.5):
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.batch_size = batch_size
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+        self.name = f"http:{model}"
+        self.requests_sent = 0
+
+        self._limiter = RateLimiter(rate_limit)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, **options):
+        """
+        GROK_API_URL / GROK_API_KEY / GROK_MODEL from the environment.
+        """
+        return cls(
+            url=os.getenv("GROK_API_URL", GROK_API_URL),
+            api_key=os.getenv("GROK_API_KEY"),
+            model=os.getenv("GROK_MODEL", GROK_MODEL),
+            **options
+        )
+
+    def _session(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def generate(self, contexts):
+        batches = [
+            contexts[i:i + self.batch_size]
+            for i in range(0, len(contexts), self.batch_size)
+        ]
+        templates = {}
+
+        with ThreadPoolExecutor(max_workers=max(1, min(self.max_concurrency, len(batches)))) as pool:
+            for batch_templates in pool.map(self._request, batches):
+                templates.update(batch_templates)
+
+        return templates
+
+    def _request(self, batch):
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        payload = {
+            "model": self.model,
+            "temperature": 0,
+            "response_format": {"type": "json_object"},
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": json.dumps({"issues": batch})},
+            ],
+        }
+
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+
+            self._limiter.acquire()
+            with self._lock:
+                self.requests_sent += 1
+            try:
+                response = self._session().post(
+                    self.url, json=payload, headers=headers, timeout=self.timeout
+                )
+            except requests.RequestException:
+                continue
+
+            if response.status_code == 429 or response.status_code >= 500:
+                continue
+            if not response.ok:
+                return {}
+
+            try:
+                content = response.json()["choices"][0]["message"]["content"]
+                templates = json.loads(content)["templates"]
+            except (ValueError, KeyError, IndexError, TypeError):
+                return {}
+
+            wanted = {c["signature"] for c in batch}
+            return {
+                signature: template
+                for signature, template in templates.items()
+                if signature in wanted and isinstance(template, str)
+            }
+
+        return {}
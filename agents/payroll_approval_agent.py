@@ -3,47 +3,90 @@
 from datetime import datetime
 import uuid
 
+from utils.approval_store import ApprovalStore
+
+FINAL_STATUS = "FINAL_APPROVED"
+
+# (role, action) → (required status, next status)
+TRANSITIONS = {
+    ("HR", "approve"): ("HR_PENDING", "FINANCE_PENDING"),
+    ("Finance", "approve"): ("FINANCE_PENDING", FINAL_STATUS),
+    ("HR", "reject"): ("HR_PENDING", "REJECTED"),
+    ("Finance", "reject"): ("FINANCE_PENDING", "REJECTED"),
+}
+
 
 class PayrollApprovalAgent:
     """
     Handles multi-stage payroll approval:
-    HR → Finance → Final
+    HR → Finance → Final (or Rejected at either stage)
+
+    State is kept once per payroll_run_id (optionally overridden per
+    employee) in an ApprovalStore: an append-only transition log with an
+    in-memory index. The store is opened on first use.
     """
 
-    def init_state(self, payroll_run_id=None):
+    def __init__(self, store=None):
+        self._store = store
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = ApprovalStore()
+        return self._store
+
+    @staticmethod
+    def next_status(role, action, current_status):
         """
-        Initializes approval workflow.
+        Status after `role` performs `action`, or None if not allowed.
+        """
+        required, status = TRANSITIONS.get((role, action), (None, None))
+        return status if current_status == required else None
+
+    def init_state(self, payroll_run_id=None, payroll_period=None):
+        """
+        Registers a run as HR_PENDING the first time it is seen; later
+        calls return its current state.
         payroll_run_id is optional to avoid Streamlit reload issues.
         """
 
         if payroll_run_id is None:
             payroll_run_id = f"PR-UNKNOWN-{uuid.uuid4().hex[:6]}"
 
-        return {
-            "payroll_run_id": payroll_run_id,
-            "status": "HR_PENDING",
-            "approved_by": None,
-            "timestamp": None
-        }
+        state = self.store.run_state(payroll_run_id)
+        if state is not None:
+            return state
+
+        with self.store.locked():
+            state = self.store.run_state(payroll_run_id)
+            if state is None:
+                self.store.append([{
+                    "payroll_run_id": payroll_run_id,
+                    "employee_id": None,
+                    "action": "init",
+                    "from_status": None,
+                    "status": "HR_PENDING",
+                    "approved_by": None,
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "payroll_period": payroll_period
+                }])
+                state = self.store.run_state(payroll_run_id)
+
+        return state
 
     def approve(self, payroll_run_id, role, current_status):
         """
-        Moves payroll to next approval stage
+        Moves payroll to next approval stage (pure: nothing is recorded;
+        see transition() for the persistent, bulk form)
         """
 
-        if role == "HR" and current_status == "HR_PENDING":
-            return {
-                "payroll_run_id": payroll_run_id,
-                "status": "FINANCE_PENDING",
-                "approved_by": "HR",
-                "timestamp": datetime.utcnow().isoformat()
-            }
+        status = self.next_status(role, "approve", current_status)
 
-        if role == "Finance" and current_status == "FINANCE_PENDING":
+        if status is not None:
             return {
                 "payroll_run_id": payroll_run_id,
-                "status": "FINAL_APPROVED",
-                "approved_by": "Finance",
+                "status": status,
+                "approved_by": role,
                 "timestamp": datetime.utcnow().isoformat()
             }
 
@@ -53,3 +96,83 @@ class PayrollApprovalAgent:
             "approved_by": None,
             "timestamp": None
         }
+
+    def transition(self, keys, role, action="approve"):
+        """
+        Applies one approval action to many runs and/or employees at once.
+
+        keys: payroll_run_ids (run-level) or (payroll_run_id, employee_id)
+        pairs (employee-level). Each key is checked against its current
+        status; all allowed transitions are appended in one write.
+        Returns (applied, skipped) key lists.
+        """
+        if (role, action) not in TRANSITIONS:
+            raise ValueError(f"Unknown approval action: {role} {action}")
+
+        applied, skipped, entries = [], [], []
+        timestamp = datetime.utcnow().isoformat()
+
+        with self.store.locked():
+            for key in dict.fromkeys(keys):
+                payroll_run_id, employee_id = key if isinstance(key, tuple) else (key, None)
+
+                state = self.store.state(payroll_run_id, employee_id)
+                current_status = state["status"] if state is not None else None
+                status = self.next_status(role, action, current_status)
+
+                if status is None:
+                    skipped.append(key)
+                    continue
+
+                applied.append(key)
+                entries.append({
+                    "payroll_run_id": payroll_run_id,
+                    "employee_id": employee_id,
+                    "action": action,
+                    "from_status": current_status,
+                    "status": status,
+                    "approved_by": role,
+                    "timestamp": timestamp
+                })
+
+            self.store.append(entries)
+
+        return applied, skipped
+
+    def status(self, payroll_run_id, employee_id=None):
+        self.store.refresh()
+        state = self.store.state(payroll_run_id, employee_id)
+        return state["status"] if state is not None else None
+
+    def list_runs(self):
+        """
+        Current state of every known run, newest first.
+        """
+        self.store.refresh()
+        return self.store.runs()
+
+    def closed_runs(self):
+        """
+        payroll_run_ids whose period is finalised (Finance approved);
+        these feed the historical baseline (see HistoricalBaseline.load_or_build).
+        """
+        self.store.refresh()
+        return [s["payroll_run_id"] for s in self.store.runs() if s["status"] == FINAL_STATUS]
+
+    def excluded_employees(self, payroll_run_ids):
+        """
+        payroll_run_id → employee_ids whose own state in that run is not
+        final (e.g. rejected while the rest of the run was approved);
+        their pay stays out of the historical baseline.
+        """
+        self.store.refresh()
+        excluded = {}
+        for payroll_run_id in payroll_run_ids:
+            employees = [
+                employee_id
+                for employee_id, state in self.store.employee_states(payroll_run_id).items()
+                if state["status"] != FINAL_STATUS
+            ]
+            if employees:
+                excluded[payroll_run_id] = employees
+        return excluded
@@ -1,5 +1,7 @@
 # agents/payroll_calculation_agent.py
 
+import pandas as pd
+
 class PayrollCalculationAgent:
     """
     Computes gross and net salary
@@ -15,3 +17,22 @@ class PayrollCalculationAgent:
             "total_deductions": total_deductions,
             "net_salary": net
         }
+
+    def run_batch(self, earnings_df, deductions_df):
+        """
+        Gross and net salary for every employee at once.
+        """
+        # Left-to-right column sums, same order as sum(dict.values())
+        gross = 0.0
+        for col in earnings_df.columns:
+            gross = gross + earnings_df[col]
+
+        total_deductions = 0.0
+        for col in deductions_df.columns:
+            total_deductions = total_deductions + deductions_df[col]
+
+        return pd.DataFrame({
+            "gross_salary": gross,
+            "total_deductions": total_deductions,
+            "net_salary": gross - total_deductions
+        }, index=earnings_df.index)
@@ -1,5 +1,8 @@
 # agents/salary_structure_agent.py
 
+import numpy as np
+import pandas as pd
+
 class SalaryStructureAgent:
     """
     Fetches and normalizes salary structure for an employee.
@@ -33,3 +36,31 @@ class SalaryStructureAgent:
             )
 
         return structure
+
+    def run_batch(self, payroll_df):
+        """
+        Normalizes salary structure for every row of payroll_df at once.
+        Returns a float DataFrame (Basic, HRA, Allowances) aligned on payroll_df.index.
+        """
+
+        # Case 1: Component-based salary exists
+        if all(col in payroll_df.columns for col in ["basic", "hra", "allowances"]):
+            return pd.DataFrame({
+                "Basic": payroll_df["basic"].to_numpy(dtype=float),
+                "HRA": payroll_df["hra"].to_numpy(dtype=float),
+                "Allowances": payroll_df["allowances"].to_numpy(dtype=float)
+            }, index=payroll_df.index)
+
+        # Case 2: Fallback to gross salary
+        if "gross_salary" in payroll_df.columns:
+            gross = payroll_df["gross_salary"].to_numpy(dtype=float)
+            return pd.DataFrame({
+                "Basic": np.round(gross * 0.50, 2),
+                "HRA": np.round(gross * 0.30, 2),
+                "Allowances": np.round(gross * 0.20, 2)
+            }, index=payroll_df.index)
+
+        raise ValueError(
+            "Payroll data must contain either salary components "
+            "or gross_salary column"
+        )
@@ -1,22 +1,64 @@
-from rules.payroll_rules import validate_payroll_record
+import numpy as np
+import pandas as pd
+
+from rules.payroll_rules import RULES_VERSION, validate_payroll_frame, decode_issues
+from rules.rule_tables import load_rule_table
+
 
 class PayrollValidationAgent:
     """
     Performs rule-based payroll validation.
+    Rules are evaluated over whole columns into per-employee issue
+    masks; messages are only decoded for employees that have issues.
+    Limits (PF rate, ESI ceiling) come from the same statutory table
+    version as the deductions.
     """
 
-    def run(self, payroll_df):
-        validation_results = []
+    def __init__(self, rules_version=RULES_VERSION):
+        self.rules = load_rule_table(rules_version)
+
+    def run(self, payroll_df, pay_dates=None):
+        """
+        payroll_df: computed records with gross_salary, net_salary and
+        a `deductions` dict column (or flat PF / ESI / PT columns).
+        """
+        if "deductions" in payroll_df.columns:
+            payroll_df = pd.concat([
+                payroll_df.drop(columns="deductions").reset_index(drop=True),
+                pd.DataFrame(payroll_df["deductions"].tolist())
+            ], axis=1)
+
+        return [
+            issue
+            for row_issues in self.run_batch(payroll_df, pay_dates)
+            for issue in row_issues
+        ]
+
+    def run_masks(self, payroll_df, pay_dates=None):
+        """
+        Issue mask per row (0 = valid), see rules.payroll_rules.ISSUE_MESSAGES.
+        """
+        return validate_payroll_frame(payroll_df, self.rules, pay_dates)
+
+    def run_batch(self, payroll_df, pay_dates=None):
+        """
+        Columnar validation over a flat payroll frame
+        (gross_salary, net_salary, PF, ESI, PT, ...).
+        pay_dates: per-row pay dates (date-dependent ESI ceilings).
+        Returns one list of validation results per row, in row order.
+        """
+        masks = self.run_masks(payroll_df, pay_dates)
+        employee_ids = payroll_df["employee_id"].tolist()
 
-        for _, row in payroll_df.iterrows():
-            issues = validate_payroll_record(row)
+        per_row = [[] for _ in range(len(payroll_df))]
 
-            if issues:
-                validation_results.append({
-                    "employee_id": row["employee_id"],
-                    "issue_type": "Validation Error",
-                    "issues": issues,
-                    "severity": "High"
-                })
+        for i in np.flatnonzero(masks):
+            per_row[i].append({
+                "employee_id": employee_ids[i],
+                "issue_type": "Validation Error",
+                "issues": decode_issues(masks[i]),
+                "issue_code": int(masks[i]),
+                "severity": "High"
+            })
 
-        return validation_results
+        return per_row
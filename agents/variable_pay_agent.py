@@ -1,5 +1,8 @@
 # agents/variable_pay_agent.py
 
+import numpy as np
+import pandas as pd
+
 class VariablePayAgent:
     """
     Handles incentives and bonuses.
@@ -20,3 +23,19 @@ class VariablePayAgent:
             "Bonus": bonus,
             "Incentive": incentive
         }
+
+    def run_batch(self, payroll_df):
+        """
+        Variable pay for every row of payroll_df at once.
+        Returns a float DataFrame (Bonus, Incentive) aligned on payroll_df.index.
+        """
+
+        def column(name):
+            if name in payroll_df.columns:
+                return payroll_df[name].to_numpy(dtype=float)
+            return np.zeros(len(payroll_df))
+
+        return pd.DataFrame({
+            "Bonus": column("bonus"),
+            "Incentive": column("incentive")
+        }, index=payroll_df.index)
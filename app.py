@@ -1,67 +1,141 @@
+import os
+
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-import os
 
-from workflows.payroll_workflow import PayrollWorkflow
+from rules.payroll_rules import RULES_VERSION
+from utils.anomaly_engine import StatisticalAnomalyEngine
+from utils.audit_store import AuditStore
+from utils.data_loader import load_payroll_data, content_hash
+from utils.payslip_export import generate_salary_slip_df, write_payslip_archive
+from utils.results_export import (
+    FINANCE_COLUMNS,
+    arrow_available,
+    open_run_results,
+    run_results_path,
+    table_to_csv
+)
+from workflows.payroll_workflow import PayrollWorkflow, new_payroll_run
+
+
+PAGE_SIZES = [25, 50, 100, 250]
 
 
 # -------------------------------------------------
 # Helpers
 # -------------------------------------------------
-def safe_float(x):
-    try:
-        return float(x)
-    except Exception:
-        return 0.0
-
-
 def calculate_total_variable_pay(results):
-    total = 0.0
-    for r in results:
-        for k, v in r["earnings"].items():
-            if k in ["Bonus", "Incentive"]:
-                total += safe_float(v)
-    return total
-
-
-def generate_salary_slip_df(result):
-    rows = []
-
-    # Fixed earnings (exclude variable pay)
-    for k, v in result["earnings"].items():
-        if k not in ["Bonus", "Incentive"]:
-            rows.append({
-                "Section": "Earnings",
-                "Component": k,
-                "Amount": safe_float(v)
-            })
-
-    # Variable Pay section
-    for k, v in result["earnings"].items():
-        if k in ["Bonus", "Incentive"]:
-            rows.append({
-                "Section": "Variable Pay",
-                "Component": k,
-                "Amount": safe_float(v)
-            })
-
-    # Deductions
-    for k, v in result["deductions"].items():
-        rows.append({
-            "Section": "Deductions",
-            "Component": k,
-            "Amount": safe_float(v)
-        })
-
-    # Summary
-    rows.extend([
-        {"Section": "Summary", "Component": "Gross Salary", "Amount": safe_float(result["gross_salary"])},
-        {"Section": "Summary", "Component": "Total Deductions", "Amount": safe_float(result["total_deductions"])},
-        {"Section": "Summary", "Component": "Net Salary", "Amount": safe_float(result["net_salary"])},
-    ])
-
-    return pd.DataFrame(rows)
+    return results.component_total("earnings", ["Bonus", "Incentive"])
+
+
+def payslip_index(summary_df, search="", only_flagged=False):
+    """
+    One light row per employee for the HR browser, filtered by employee ID
+    substring and optionally to flagged employees. The index is the
+    position in `results`.
+    """
+    issue_counts = summary_df["validation_issue_count"]
+    anomaly_counts = summary_df["anomaly_count"]
+    flagged = issue_counts.gt(0) | anomaly_counts.gt(0)
+
+    index = pd.DataFrame({
+        "Status": flagged.map({True: "⚠️", False: "✅"}),
+        "Employee ID": summary_df["employee_id"].astype(str),
+        "Gross Salary": summary_df["gross_salary"],
+        "Net Salary": summary_df["net_salary"],
+        "Issues": issue_counts,
+        "Anomalies": anomaly_counts,
+    })
+
+    mask = pd.Series(True, index=index.index)
+    if search:
+        mask &= index["Employee ID"].str.contains(search, case=False, regex=False)
+    if only_flagged:
+        mask &= flagged
+
+    return index[mask]
+
+
+def render_payslip(r, workflow):
+    # Explanations are generated lazily, only for payslips that are viewed
+    workflow.explain([r])
+
+    st.markdown(f"### Employee ID: {r['employee_id']}")
+
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Gross Salary", f"₹ {r['gross_salary']:,.2f}")
+    col2.metric("Total Deductions", f"₹ {r['total_deductions']:,.2f}")
+    col3.metric("Net Salary", f"₹ {r['net_salary']:,.2f}")
+
+    st.divider()
+    st.markdown("### 🧾 Payslip Breakdown")
+
+    slip_df = generate_salary_slip_df(r)
+    st.dataframe(slip_df, hide_index=True, width="stretch")
+
+    st.download_button(
+        "⬇ Download Salary Slip (CSV)",
+        slip_df.to_csv(index=False),
+        file_name=f"salary_slip_{r['employee_id']}.csv",
+        mime="text/csv"
+    )
+
+    if r["validation_issues"]:
+        st.warning("⚠️ Validation Issues")
+        for issue in r["validation_issues"]:
+            for msg in issue.get("issues", []):
+                st.write(f"- {msg}")
+
+    if r["anomalies"]:
+        st.error("🚨 Anomalies")
+        for a in r["anomalies"]:
+            d = a["details"]
+            if a["issue_type"] == "Salary Anomaly":
+                st.write(
+                    f"- Salary changed by {d['change_percentage']}% "
+                    f"(Prev: {d['previous_gross']}, Current: {d['current_gross']})"
+                )
+            else:
+                st.write(f"- {workflow.explainer.explain_anomaly(a)}")
+
+    if not r["validation_issues"] and not r["anomalies"]:
+        st.success("No issues detected.")
+    else:
+        with st.expander("🧠 Explanation"):
+            st.write(r["explanation"])
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def load_upload(content_key, _data):
+    """
+    Parses an uploaded CSV once per distinct content.
+    Keyed by the content hash; the raw bytes are not re-hashed by Streamlit.
+    """
+    return load_payroll_data(_data)
+
+
+@st.cache_resource
+def get_workflow(engine_key=None, _anomaly_engine=None):
+    return PayrollWorkflow(anomaly_engine=_anomaly_engine, lazy_explanations=True)
+
+
+@st.cache_resource(max_entries=4)
+def load_finance_table(path, mtime):
+    """
+    Finance columns of a run's exported results, memory-mapped once per
+    file version (mtime).
+    """
+    return open_run_results(path=path, columns=FINANCE_COLUMNS)
+
+
+@st.cache_resource(show_spinner="Fitting anomaly engine...")
+def get_anomaly_engine(content_key, period, _historical_df):
+    """
+    Statistical anomaly engine for one historical upload and payroll
+    period (also cached on disk).
+    """
+    return StatisticalAnomalyEngine.load_or_fit(_historical_df, period=period)
 
 
 # -------------------------------------------------
@@ -101,13 +175,24 @@ historical_file = st.sidebar.file_uploader(
     type=["csv"]
 )
 
+statistical_anomalies = st.sidebar.checkbox(
+    "Statistical anomaly detection",
+    help="Also flag robust z-score / MAD outliers against the multi-month history"
+)
+
 
 # -------------------------------------------------
 # Main Logic
 # -------------------------------------------------
 if current_file and historical_file:
-    current_df = pd.read_csv(current_file)
-    historical_df = pd.read_csv(historical_file)
+    current_bytes = current_file.getvalue()
+    historical_bytes = historical_file.getvalue()
+
+    current_key = content_hash(current_bytes)
+    historical_key = content_hash(historical_bytes)
+
+    current_df = load_upload(current_key, current_bytes)
+    historical_df = load_upload(historical_key, historical_bytes)
 
     with st.expander("📄 Preview Uploaded Data", expanded=False):
         st.subheader("Current Payroll")
@@ -116,51 +201,142 @@ if current_file and historical_file:
         st.subheader("Historical Payroll")
         st.dataframe(historical_df, width="stretch")
 
-    if st.button("▶️ Run Payroll Agent"):
-        workflow = PayrollWorkflow()
-        results = []
+    # Same uploads + same rules → same results; never recompute them
+    run_key = (current_key, historical_key, RULES_VERSION, statistical_anomalies)
+    cached_run = st.session_state.get("payroll_run")
 
-        for _, row in current_df.iterrows():
-            employee_id = row["employee_id"]
-
-            result = workflow.run(
-                employee_id=employee_id,
-                payroll_df=current_df,
-                historical_df=historical_df
+    def current_workflow(period):
+        if statistical_anomalies:
+            return get_workflow(
+                (historical_key, period), get_anomaly_engine(historical_key, period, historical_df)
             )
-
-            result["employee_id"] = employee_id
-            result["payroll_period"] = datetime.now().strftime("%B %Y")
-            results.append(result)
-
-        summary_df = pd.DataFrame(results)
-        total_variable_pay = calculate_total_variable_pay(results)
-
-        # ==================================================
-        # PAYROLL RUN SUMMARY
-        # ==================================================
-        st.subheader("📊 Payroll Run Summary")
-
-        col1, col2, col3, col4, col5 = st.columns(5)
-
-        col1.metric("Employees", len(summary_df))
-        col2.metric("Total Net Pay", f"₹ {summary_df['net_salary'].sum():,.2f}")
-        col3.metric("Total Variable Pay", f"₹ {total_variable_pay:,.2f}")
-        col4.metric("Validation Issues", summary_df["validation_issues"].apply(len).gt(0).sum())
-        col5.metric("Anomalies", summary_df["anomalies"].apply(len).gt(0).sum())
-
-        # ==================================================
-        # FINANCE VIEW
-        # ==================================================
-        if role == "Finance":
-            st.subheader("💰 Finance Payroll Overview")
-
-            finance_df = summary_df[[
-                "employee_id",
-                "gross_salary",
-                "total_deductions",
-                "net_salary"
-            ]]
+        return get_workflow()
+
+    if st.button("▶️ Run Payroll Agent") and (cached_run is None or cached_run["key"] != run_key):
+        # Every run gets its own id and period, kept in this session: the
+        # server process is shared by all sessions
+        period = datetime.now().strftime("%B %Y")
+        run = (new_payroll_run(period), period)
+        workflow = current_workflow(period)
+
+        # Corrected re-runs only recompute employees whose inputs changed
+        results = workflow.run_batch(
+            payroll_df=current_df,
+            historical_df=historical_df,
+            incremental=True,
+            run=run
+        )
+
+        st.session_state["payroll_run"] = {
+            "key": run_key,
+            "results": results,
+            "payroll_run_id": run[0],
+            "payroll_period": run[1],
+        }
+        cached_run = st.session_state["payroll_run"]
+
+    if cached_run is None or cached_run["key"] != run_key:
+        st.stop()
+
+    # Role switches and other widget changes rerun the script; they
+    # re-render the stored results instead of re-running the payroll.
+    results = cached_run["results"]
+    payroll_run_id = cached_run["payroll_run_id"]
+    workflow = current_workflow(cached_run["payroll_period"])
+
+    # Flat columns only: no per-employee dicts are built for the summary
+    summary_df = results.summary_frame()
+    total_variable_pay = calculate_total_variable_pay(results)
+
+    # ==================================================
+    # PAYROLL RUN SUMMARY
+    # ==================================================
+    st.subheader("📊 Payroll Run Summary")
+
+    col1, col2, col3, col4, col5 = st.columns(5)
+
+    col1.metric("Employees", len(summary_df))
+    col2.metric("Total Net Pay", f"₹ {summary_df['net_salary'].sum():,.2f}")
+    col3.metric("Total Variable Pay", f"₹ {total_variable_pay:,.2f}")
+    col4.metric("Validation Issues", summary_df["validation_issue_count"].gt(0).sum())
+    col5.metric("Anomalies", summary_df["anomaly_count"].gt(0).sum())
+
+    # ==================================================
+    # APPROVAL (persistent, per payroll_run_id)
+    # ==================================================
+    st.subheader("✅ Approval")
+
+    approval_agent = workflow.approval_agent
+    approval_runs = approval_agent.list_runs()      # in-memory index, no audit scan
+    result_run_ids = results.run_ids()
+
+    statuses = {s["payroll_run_id"]: s["status"] for s in approval_runs}
+    st.write(" · ".join(f"`{run_id}`: **{statuses.get(run_id)}**" for run_id in result_run_ids))
+
+    col1, col2 = st.columns(2)
+    action = None
+    if col1.button(f"✔️ Approve as {role}"):
+        action = "approve"
+    if col2.button(f"✖️ Reject as {role}"):
+        action = "reject"
+
+    if action is not None:
+        # Results reused by an incremental re-run keep their own runs;
+        # all of them move together in one transition
+        applied, skipped = approval_agent.transition(result_run_ids, role, action)
+        if applied:
+            st.success(f"{action.title()}d {len(applied)} run(s).")
+        if skipped:
+            st.warning(f"{len(skipped)} run(s) are not awaiting {role} approval.")
+        approval_runs = approval_agent.list_runs()
+
+    with st.expander("📜 All Payroll Runs"):
+        runs_df = pd.DataFrame(
+            approval_runs,
+            columns=["payroll_run_id", "payroll_period", "status", "approved_by", "timestamp", "created_at"]
+        )
+        st.dataframe(runs_df, width="stretch", hide_index=True)
+
+        pending = runs_df.loc[
+            runs_df["status"] == ("HR_PENDING" if role == "HR" else "FINANCE_PENDING"),
+            "payroll_run_id"
+        ].tolist()
+        selected = st.multiselect(f"Runs awaiting {role} approval", pending)
+
+        if selected and st.button(f"✔️ Approve {len(selected)} selected run(s)"):
+            applied, _ = approval_agent.transition(selected, role, "approve")
+            st.success(f"Approved {len(applied)} run(s).")
+
+    # ==================================================
+    # FINANCE VIEW
+    # ==================================================
+    if role == "Finance":
+        st.subheader("💰 Finance Payroll Overview")
+
+        results_path = run_results_path(payroll_run_id) if arrow_available() else None
+
+        if results_path is not None:
+            # Memory-mapped run export: no re-serialization, no copy in RAM
+            finance_table = load_finance_table(results_path, os.path.getmtime(results_path))
+
+            st.dataframe(finance_table, width="stretch", hide_index=True)
+
+            col1, col2 = st.columns(2)
+            col1.download_button(
+                "⬇ Download Finance Payroll Report",
+                table_to_csv(finance_table),
+                file_name="finance_payroll_report.csv",
+                mime="text/csv"
+            )
+            with open(results_path, "rb") as f:
+                col2.download_button(
+                    "⬇ Download Run Results",
+                    f,
+                    file_name=f"payroll_results_{payroll_run_id}{os.path.splitext(results_path)[1]}",
+                    mime="application/octet-stream"
+                )
+        else:
+            finance_df = summary_df[FINANCE_COLUMNS]
 
             st.dataframe(finance_df, width="stretch", hide_index=True)
 
@@ -171,61 +347,70 @@ if current_file and historical_file:
                 mime="text/csv"
             )
 
-            if os.path.exists("data/payroll_audit_summary.csv"):
-                with open("data/payroll_audit_summary.csv", "r", encoding="utf-8") as f:
-                    st.download_button(
-                        "⬇ Download Payroll Audit Log",
-                        f.read(),
-                        file_name="payroll_audit_summary.csv",
-                        mime="text/csv"
-                    )
-
-        # ==================================================
-        # HR VIEW
-        # ==================================================
-        if role == "HR":
-            st.subheader("🧾 Employee Payslips")
-
-            for r in results:
-                status = "⚠️" if r["validation_issues"] or r["anomalies"] else "✅"
-
-                with st.expander(f"{status} Employee ID: {r['employee_id']}"):
-
-                    col1, col2, col3 = st.columns(3)
-                    col1.metric("Gross Salary", f"₹ {r['gross_salary']:,.2f}")
-                    col2.metric("Total Deductions", f"₹ {r['total_deductions']:,.2f}")
-                    col3.metric("Net Salary", f"₹ {r['net_salary']:,.2f}")
-
-                    st.divider()
-                    st.markdown("### 🧾 Payslip Breakdown")
-
-                    slip_df = generate_salary_slip_df(r)
-                    st.dataframe(slip_df, hide_index=True, width="stretch")
-
-                    st.download_button(
-                        "⬇ Download Salary Slip (CSV)",
-                        slip_df.to_csv(index=False),
-                        file_name=f"salary_slip_{r['employee_id']}.csv",
-                        mime="text/csv"
-                    )
-
-                    if r["validation_issues"]:
-                        st.warning("⚠️ Validation Issues")
-                        for issue in r["validation_issues"]:
-                            for msg in issue.get("issues", []):
-                                st.write(f"- {msg}")
-
-                    if r["anomalies"]:
-                        st.error("🚨 Anomalies")
-                        for a in r["anomalies"]:
-                            d = a["details"]
-                            st.write(
-                                f"- Salary changed by {d['change_percentage']}% "
-                                f"(Prev: {d['previous_gross']}, Current: {d['current_gross']})"
-                            )
-
-                    if not r["validation_issues"] and not r["anomalies"]:
-                        st.success("No issues detected.")
+        # Unchanged employees keep the run that audited them
+        run_ids = results.run_ids()
+
+        with AuditStore() as store:
+            st.download_button(
+                "⬇ Download Payroll Audit Log",
+                store.export_csv(payroll_run_id=run_ids),
+                file_name=f"payroll_audit_{payroll_run_id}.csv",
+                mime="text/csv"
+            )
+
+    # ==================================================
+    # HR VIEW
+    # ==================================================
+    if role == "HR":
+        st.subheader("🧾 Employee Payslips")
+
+        col1, col2, col3 = st.columns([3, 2, 1])
+        search = col1.text_input("🔍 Search Employee ID")
+        only_flagged = col2.checkbox("Only employees with issues / anomalies")
+        page_size = col3.selectbox("Per page", PAGE_SIZES, index=1)
+
+        if st.button("📦 Export All Payslips"):
+            with st.spinner("Building payslip archive..."):
+                st.session_state["payslip_archive"] = {
+                    "key": run_key,
+                    "data": write_payslip_archive(results)
+                }
+
+        archive = st.session_state.get("payslip_archive")
+        if archive is not None and archive["key"] == run_key:
+            st.download_button(
+                "⬇ Download All Payslips (ZIP)",
+                archive["data"],
+                file_name=f"salary_slips_{payroll_run_id}.zip",
+                mime="application/zip"
+            )
+
+        view = payslip_index(summary_df, search, only_flagged)
+
+        pages = max(1, -(-len(view) // page_size))
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1)
+        page_df = view.iloc[(page - 1) * page_size: page * page_size]
+
+        st.caption(f"{len(view):,} employees · page {page} of {pages}")
+
+        # Only the current page is sent to the browser; a payslip is built
+        # when its row is selected. The key resets the selection whenever
+        # the page or filters change.
+        event = st.dataframe(
+            page_df,
+            width="stretch",
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="single-row",
+            key=f"payslips_{page}_{page_size}_{search}_{only_flagged}"
+        )
+
+        if event.selection.rows:
+            render_payslip(results[page_df.index[event.selection.rows[0]]], workflow)
+        elif len(view):
+            st.info("Select an employee to open their payslip.")
+        else:
+            st.info("No employees match the current filters.")
 
 else:
     st.info("Please upload both current and historical payroll CSV files.")
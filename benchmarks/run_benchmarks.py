@@ -0,0 +1,299 @@
+# benchmarks/run_benchmarks.py
+
+"""
+Payroll benchmark runner.
+
+Generates a synthetic workforce per size, runs PayrollWorkflow.run_batch
+and reports wall time, throughput and peak traced memory per stage (from
+the workflow's own stage metrics, see utils.run_metrics), plus the
+end-to-end run_batch time.
+
+Results are compared against a stored baseline; a stage that is slower
+than baseline × (1 + tolerance) is reported as a regression and the
+runner exits with status 1.
+
+    python -m benchmarks.run_benchmarks --sizes 1k,10k,100k
+    python -m benchmarks.run_benchmarks --sizes 10k --save-baseline
+"""
+
+import argparse
+import gc
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+from agents.explanation_agent import PayrollExplanationAgent
+from benchmarks.synthetic_payroll import generate_workforce, parse_size, DEFAULT_STATES
+from utils.data_loader import apply_payroll_schema
+from utils.historical_baseline import HistoricalBaseline
+from workflows.payroll_workflow import PayrollWorkflow
+
+BASELINE_PATH = "benchmarks/results/baseline.json"
+DEFAULT_SIZES = "1k,10k,100k"
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.005     # ignore timer noise on tiny stages
+BENCHMARK_PERIOD = "Benchmark"
+
+
+# =================================================
+# Stages
+# =================================================
+# Pipeline stages are timed by PayrollWorkflow itself (RunMetrics, see
+# utils.run_metrics), so the benchmark measures exactly what run_batch
+# runs. Only work done outside the workflow is timed here.
+def _explanations(results):
+    # Explanations are lazy: what main.py / app.py do for the results
+    # they show (a fresh agent, so every repeat starts with a cold cache)
+    PayrollExplanationAgent().explain_results(results)
+
+
+def _ui_summary(results):
+    # What app.py does before rendering the summary and Finance view
+    summary_df = results.summary_frame()
+    (summary_df["validation_issue_count"] > 0).sum()
+    (summary_df["anomaly_count"] > 0).sum()
+    results.component_total("earnings", ["Bonus", "Incentive"])
+    summary_df[["employee_id", "gross_salary", "total_deductions", "net_salary"]].to_csv(index=False)
+
+
+EXTRA_STAGES = [
+    ("explanation", _explanations),
+    ("ui_summary", _ui_summary),
+]
+
+
+# =================================================
+# Measurement
+# =================================================
+def _measure(fn, trace_memory):
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    return elapsed, peak
+
+
+def _timed_run(workflow, payroll_df, baseline, run_id):
+    """
+    One run_batch under its own run id; returns (wall seconds, results,
+    the run's RunMetrics).
+    """
+    gc.collect()
+    start = time.perf_counter()
+    results = workflow.run_batch(payroll_df, baseline, run=(run_id, BENCHMARK_PERIOD))
+    elapsed = time.perf_counter() - start
+    return elapsed, results, workflow.release_metrics(run_id)
+
+
+def bench_size(employees, repeat=3, trace_memory=True, **workforce_options):
+    """
+    Benchmarks one workforce size through PayrollWorkflow.run_batch.
+    Stage times are the best of `repeat` runs, read from the workflow's
+    own stage metrics; peak memory per stage comes from one extra run
+    with tracemalloc profiling. Audit, results and approval files go to
+    a temporary directory.
+    """
+    current_raw, historical_raw = generate_workforce(employees, **workforce_options)
+    payroll_df = apply_payroll_schema(current_raw)
+    historical_df = apply_payroll_schema(historical_raw)
+
+    stages = {}
+    end_to_end = float("inf")
+
+    def record(name, seconds=None, peak=None):
+        stats = stages.setdefault(name, {"seconds": float("inf"), "peak_bytes": None})
+        if seconds is not None:
+            stats["seconds"] = min(stats["seconds"], seconds)
+        if peak is not None:
+            stats["peak_bytes"] = peak
+
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            baseline_seconds, _ = _measure(
+                lambda: HistoricalBaseline.from_frame(historical_df), trace_memory=False
+            )
+            baseline = HistoricalBaseline.from_frame(historical_df)
+
+            wf = PayrollWorkflow(metrics_dir=None)
+            for attempt in range(repeat):
+                elapsed, results, metrics = _timed_run(wf, payroll_df, baseline, f"BENCH-{attempt}")
+                end_to_end = min(end_to_end, elapsed)
+                for name, stats in metrics.stages.items():
+                    record(name, seconds=stats["seconds"])
+                for name, fn in EXTRA_STAGES:
+                    record(name, seconds=_measure(lambda: fn(results), trace_memory=False)[0])
+
+            if trace_memory:
+                traced = PayrollWorkflow(metrics_dir=None, profile="tracemalloc")
+                _, results, metrics = _timed_run(traced, payroll_df, baseline, "BENCH-traced")
+                for name, stats in metrics.stages.items():
+                    record(name, peak=stats.get("peak_bytes"))
+                for name, fn in EXTRA_STAGES:
+                    record(name, peak=_measure(lambda: fn(results), trace_memory=True)[1])
+        finally:
+            os.chdir(cwd)
+
+    for stats in stages.values():
+        stats["rows_per_second"] = employees / stats["seconds"] if stats["seconds"] else None
+
+    return {
+        "employees": employees,
+        "baseline_build_seconds": baseline_seconds,
+        "end_to_end_seconds": end_to_end,
+        "end_to_end_rows_per_second": employees / end_to_end,
+        "stages": stages,
+    }
+
+
+# =================================================
+# Baseline / Regressions
+# =================================================
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(report, path=BASELINE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+
+def find_regressions(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    (size, stage, baseline_seconds, current_seconds) for every stage
+    slower than baseline × (1 + tolerance).
+    """
+    regressions = []
+
+    for size, result in report["sizes"].items():
+        previous = (baseline or {}).get("sizes", {}).get(size)
+        if previous is None:
+            continue
+
+        timings = {name: stats["seconds"] for name, stats in result["stages"].items()}
+        timings["end_to_end"] = result["end_to_end_seconds"]
+
+        before = {name: stats["seconds"] for name, stats in previous["stages"].items()}
+        before["end_to_end"] = previous["end_to_end_seconds"]
+
+        for name, seconds in timings.items():
+            old = before.get(name)
+            if old is None:
+                continue
+            if seconds > old * (1 + tolerance) and seconds - old > MIN_REGRESSION_SECONDS:
+                regressions.append((size, name, old, seconds))
+
+    return regressions
+
+
+# =================================================
+# CLI
+# =================================================
+def _format_bytes(n):
+    if n is None:
+        return "-"
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} TB"
+
+
+def print_report(report):
+    for size, result in report["sizes"].items():
+        print(f"\n{size} employees ({result['employees']:,})")
+        print("-" * 62)
+        print(f"{'stage':<14}{'seconds':>12}{'rows/s':>16}{'peak memory':>20}")
+        for name, stats in result["stages"].items():
+            print(
+                f"{name:<14}{stats['seconds']:>12.4f}"
+                f"{stats['rows_per_second'] or 0:>16,.0f}"
+                f"{_format_bytes(stats['peak_bytes']):>20}"
+            )
+        print(
+            f"{'end_to_end':<14}{result['end_to_end_seconds']:>12.4f}"
+            f"{result['end_to_end_rows_per_second']:>16,.0f}"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Payroll benchmarks")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="Comma-separated: 1k,10k,100k,1m")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-memory", action="store_true", help="Skip the traced memory run")
+    parser.add_argument("--components", action="store_true")
+    parser.add_argument("--states", action="store_true")
+    parser.add_argument("--bonus-rate", type=float, default=0.25)
+    parser.add_argument("--history-months", type=int, default=6)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--json", help="Also write the report as JSON here")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    report = {
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "pandas": pd.__version__,
+        "sizes": {},
+    }
+
+    for size in args.sizes.split(","):
+        size = size.strip().lower()
+        report["sizes"][size] = bench_size(
+            parse_size(size),
+            repeat=args.repeat,
+            trace_memory=not args.no_memory,
+            components=args.components,
+            states=DEFAULT_STATES if args.states else None,
+            bonus_rate=args.bonus_rate,
+            history_months=args.history_months
+        )
+
+    print_report(report)
+
+    if args.json:
+        save_baseline(report, args.json)
+
+    if args.save_baseline:
+        save_baseline(report, args.baseline)
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    regressions = find_regressions(report, load_baseline(args.baseline), args.tolerance)
+
+    if regressions:
+        print("\n⚠️  Regressions")
+        for size, name, old, new in regressions:
+            print(f"- {size} {name}: {old:.4f}s → {new:.4f}s ({(new / old - 1) * 100:+.0f}%)")
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,176 @@
+# benchmarks/synthetic_payroll.py
+
+"""
+Deterministic synthetic workforce generator.
+
+Produces current and historical payroll frames in the same layout as
+data/current_payroll.csv / data/historical_payroll.csv, at any size.
+The same seed and options always give the same data, so benchmark
+numbers are comparable between runs and machines.
+
+    python -m benchmarks.synthetic_payroll --employees 100000 --out data/synthetic
+"""
+
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+DEFAULT_COMPONENT_MIX = (0.50, 0.30, 0.20)     # basic / hra / allowances
+DEFAULT_STATES = ("MH", "KA", "WB", "GJ", "TG")
+
+
+def parse_size(size):
+    """
+    "10k" / "1m" / "2500" → number of employees.
+    """
+    size = str(size).lower()
+    if size in SIZES:
+        return SIZES[size]
+    try:
+        return int(size.replace("_", ""))
+    except ValueError:
+        raise ValueError(f"Unknown workforce size: {size}")
+
+
+def generate_workforce(employees, history_months=6, current_month="2024-11",
+                       components=False, component_mix=DEFAULT_COMPONENT_MIX,
+                       bonus_rate=0.25, incentive_rate=0.0, anomaly_rate=0.02,
+                       states=None, seed=7):
+    """
+    Returns (current_df, historical_df) as raw (untyped) frames.
+
+    - components     : also emit basic / hra / allowances split by component_mix
+    - bonus_rate     : share of employees paid a bonus this month
+    - incentive_rate : share of employees paid an incentive (adds the column)
+    - anomaly_rate   : share of employees whose gross jumps by 25–60%
+    - states         : PT state codes to assign (adds the column)
+    """
+    if employees <= 0:
+        raise ValueError("employees must be positive")
+    if history_months < 1:
+        raise ValueError("history_months must be at least 1")
+    if len(component_mix) != 3 or not np.isclose(sum(component_mix), 1.0):
+        raise ValueError("component_mix must be three shares summing to 1")
+
+    rng = np.random.default_rng(seed)
+
+    width = max(len(str(employees)), 3)
+    employee_ids = np.char.add("E", np.char.zfill(np.arange(1, employees + 1).astype(str), width))
+
+    # Log-normal base pay, rounded to the nearest 500
+    base = np.round(np.exp(rng.normal(np.log(45000), 0.45, employees)) / 500) * 500
+    base = np.clip(base, 8000, 1_500_000)
+
+    months = pd.period_range(end=current_month, periods=history_months + 1, freq="M")
+
+    # Gross per month: slow drift plus small noise, newest month last
+    drift = 1 + rng.normal(0.004, 0.01, (employees, 1)) * np.arange(len(months))
+    noise = 1 + rng.normal(0, 0.01, (employees, len(months)))
+    gross = np.round(base[:, None] * drift * noise, 0)
+
+    jumpers = rng.random(employees) < anomaly_rate
+    gross[jumpers, -1] = np.round(
+        gross[jumpers, -1] * (1 + rng.uniform(0.25, 0.60, jumpers.sum())), 0
+    )
+
+    bonus = np.where(
+        rng.random((employees, len(months))) < bonus_rate,
+        np.round(gross * rng.uniform(0.05, 0.25, (employees, len(months))), 0),
+        0.0
+    )
+
+    tax = np.round(gross * 0.10, 0)
+    insurance = np.where(base > 30000, 1500.0, 0.0)[:, None].repeat(len(months), axis=1)
+    net = gross - tax - insurance
+
+    state_codes = (
+        np.asarray(states)[rng.integers(0, len(states), employees)]
+        if states else None
+    )
+
+    def frame(cols):
+        n_months = cols.stop - cols.start
+        df = pd.DataFrame({
+            "employee_id": np.repeat(employee_ids, n_months),
+            "month": np.tile(months[cols].astype(str), employees),
+            "gross_salary": gross[:, cols].ravel(),
+            "net_salary": net[:, cols].ravel(),
+            "bonus": bonus[:, cols].ravel(),
+            "tax": tax[:, cols].ravel(),
+            "insurance": insurance[:, cols].ravel(),
+        })
+
+        if components:
+            fixed = df["gross_salary"].to_numpy() - df["bonus"].to_numpy()
+            df["basic"] = np.round(fixed * component_mix[0], 2)
+            df["hra"] = np.round(fixed * component_mix[1], 2)
+            df["allowances"] = np.round(fixed - df["basic"] - df["hra"], 2)
+
+        if incentive_rate:
+            paid = rng.random(len(df)) < incentive_rate
+            df["incentive"] = np.where(paid, np.round(df["gross_salary"] * 0.05, 0), 0.0)
+
+        if state_codes is not None:
+            df["state"] = np.repeat(state_codes, n_months)
+
+        return df
+
+    historical_df = frame(slice(0, history_months))
+    current_df = frame(slice(history_months, history_months + 1))
+    return current_df, historical_df
+
+
+def write_workforce(out_dir, employees, **options):
+    """
+    Writes current_payroll.csv and historical_payroll.csv under out_dir.
+    Returns (current_path, historical_path).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    current_df, historical_df = generate_workforce(employees, **options)
+
+    current_path = os.path.join(out_dir, "current_payroll.csv")
+    historical_path = os.path.join(out_dir, "historical_payroll.csv")
+    current_df.to_csv(current_path, index=False)
+    historical_df.to_csv(historical_path, index=False)
+
+    return current_path, historical_path
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic payroll generator")
+    parser.add_argument("--employees", default="10k", help="1k, 10k, 100k, 1m or a number")
+    parser.add_argument("--out", default="data/synthetic")
+    parser.add_argument("--history-months", type=int, default=6)
+    parser.add_argument("--current-month", default="2024-11")
+    parser.add_argument("--components", action="store_true", help="Emit basic / hra / allowances")
+    parser.add_argument("--bonus-rate", type=float, default=0.25)
+    parser.add_argument("--incentive-rate", type=float, default=0.0)
+    parser.add_argument("--anomaly-rate", type=float, default=0.02)
+    parser.add_argument("--states", action="store_true", help="Assign PT state codes")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    paths = write_workforce(
+        args.out,
+        parse_size(args.employees),
+        history_months=args.history_months,
+        current_month=args.current_month,
+        components=args.components,
+        bonus_rate=args.bonus_rate,
+        incentive_rate=args.incentive_rate,
+        anomaly_rate=args.anomaly_rate,
+        states=DEFAULT_STATES if args.states else None,
+        seed=args.seed
+    )
+    print("\n".join(paths))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,40 +1,239 @@
-from utils.data_loader import load_payroll_data
-from workflows.payroll_workflow import PayrollWorkflow
+import argparse
+import csv
+
+from utils.data_loader import load_payroll_data, iter_payroll_chunks, DEFAULT_CHUNK_SIZE
+from agents.explanation_agent import PayrollExplanationAgent
+from agents.payroll_approval_agent import PayrollApprovalAgent
+from agents.explanation_backends import HTTPExplanationBackend
+from rules.payroll_rules import RULES_VERSION, RULE_TABLE_VERSIONS
+from utils.anomaly_engine import StatisticalAnomalyEngine
+from utils.audit_segments import AUDIT_LOG_DIR
+from utils.explanation_cache import ExplanationCache, EXPLANATION_CACHE_PATH
+from utils.historical_baseline import HistoricalBaseline
+from utils.payroll_report import REPORT_COLUMNS, report_rows
+from utils.payslip_export import write_payslip_archive
+from workflows.payroll_workflow import PayrollWorkflow, payroll_period
+from workflows.parallel_runner import ParallelPayrollRunner
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Payroll Agent")
+    parser.add_argument("--current", default="data/current_payroll.csv")
+    parser.add_argument("--historical", default="data/historical_payroll.csv")
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Process the current payroll in fixed-size chunks (flat memory)"
+    )
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument(
+        "--rules-version",
+        default=RULES_VERSION,
+        choices=sorted(RULE_TABLE_VERSIONS),
+        help="Statutory table for deductions and validation"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Shard employees across this many processes"
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only recompute employees whose inputs changed since the last run of this period"
+    )
+    parser.add_argument(
+        "--multi-period",
+        action="store_true",
+        help="Split the input by its month column: one run id, audit partition and results file per period"
+    )
+    parser.add_argument(
+        "--statistical-anomalies",
+        action="store_true",
+        help="Also flag robust z-score / MAD outliers against multi-month history"
+    )
+    parser.add_argument(
+        "--isolation-forest",
+        action="store_true",
+        help="With --statistical-anomalies, also score an IsolationForest (needs scikit-learn)"
+    )
+    parser.add_argument(
+        "--model-explanations",
+        action="store_true",
+        help="Word explanations with a chat-completions model (GROK_API_URL / GROK_API_KEY / GROK_MODEL)"
+    )
+    parser.add_argument(
+        "--explanation-url",
+        help="Chat-completions endpoint for --model-explanations (e.g. a local stub server)"
+    )
+    parser.add_argument(
+        "--output",
+        help="Also write a CSV payroll report here, one row per employee"
+    )
+    parser.add_argument(
+        "--payslips",
+        help="Also write every employee's payslip CSV into this ZIP archive"
+    )
+    parser.add_argument(
+        "--profile",
+        choices=["tracemalloc", "cprofile"],
+        help="Also capture per-stage peak memory or a cProfile of the run"
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Skip the per-employee console report"
+    )
+    args = parser.parse_args(argv)
+
+    if args.payslips and args.stream:
+        parser.error("--payslips needs the whole run; it cannot be combined with --stream")
+
+    if args.isolation_forest and not args.statistical_anomalies:
+        parser.error("--isolation-forest needs --statistical-anomalies")
+
+    if args.explanation_url:
+        args.model_explanations = True
+
+    if args.incremental and (args.stream or args.workers > 1):
+        parser.error("--incremental runs in a single process; drop --stream / --workers")
+
+    if args.multi_period and (args.stream or args.workers > 1 or args.incremental):
+        parser.error("--multi-period runs in one pass; drop --stream / --workers / --incremental")
+
+    return args
+
+
+def print_result(result):
+    # Console Output (same spirit as before, richer now)
+    print(f"\nEmployee ID: {result['employee_id']}")
+    print(f"Gross Salary     : {result['gross_salary']}")
+    print(f"Total Deductions : {result['total_deductions']}")
+    print(f"Net Salary       : {result['net_salary']}")
+
+    if result["anomalies"]:
+        print("⚠️  Anomaly Detected")
+
+    print(f"Explanation      : {result['explanation']}")
+
+
+def print_periods(results):
+    # One line per period run of a multi-period job
+    print("\nPeriod Runs")
+    print("-" * 50)
+    summary = results.summary_frame().groupby(
+        ["payroll_run_id", "payroll_period"]
+    ).agg(employees=("employee_id", "size"), net_salary=("net_salary", "sum"))
+
+    for (run_id, period), row in summary.iterrows():
+        print(f"{period:<16} {run_id}  employees={int(row['employees'])}  net={row['net_salary']}")
+
+
+def main(argv=None):
+    args = parse_args(argv)
 
-def main():
     # Load data
-    current_df = load_payroll_data("data/current_payroll.csv")
-    historical_df = load_payroll_data("data/historical_payroll.csv")
+    # Finalised runs in the audit log extend the history; runs finalised
+    # since the last call are folded into the cached index incrementally
+    # (employees rejected within a finalised run are left out)
+    approval_agent = PayrollApprovalAgent()
+    closed_runs = approval_agent.closed_runs()
+    historical_baseline = HistoricalBaseline.load_or_build(
+        [args.historical],
+        audit_path=AUDIT_LOG_DIR,
+        closed_runs=closed_runs,
+        excluded=approval_agent.excluded_employees(closed_runs)
+    )
+
+    # Fitted once per period and history, then cached on disk
+    anomaly_engine = None
+    if args.statistical_anomalies:
+        anomaly_engine = StatisticalAnomalyEngine.load_or_fit(
+            load_payroll_data(args.historical),
+            period=payroll_period,
+            use_model=args.isolation_forest
+        )
 
-    workflow = PayrollWorkflow()
+    # Model-worded explanations: one request per batch of distinct issue
+    # signatures, templates cached across runs in data/explanation_cache.db
+    explainer = None
+    if args.model_explanations:
+        backend = HTTPExplanationBackend.from_env()
+        if args.explanation_url:
+            backend.url = args.explanation_url
+        explainer = PayrollExplanationAgent(
+            backend=backend, cache=ExplanationCache(path=EXPLANATION_CACHE_PATH)
+        )
+
+    # Per-stage metrics land in data/metrics/<payroll_run_id>.{json,prom}
+    # Explanations are only generated when they are printed
+    workflow = PayrollWorkflow(
+        profile=args.profile,
+        anomaly_engine=anomaly_engine,
+        explainer=explainer,
+        lazy_explanations=True,
+        rules_version=args.rules_version
+    )
 
     print("\nPayroll Agent Report")
     print("-" * 50)
 
-    results = []
+    if args.stream:
+        # Chunk by chunk: nothing is kept once it has been reported
+        batches = workflow.run_stream(
+            payroll_chunks=iter_payroll_chunks(args.current, args.chunk_size),
+            historical_df=historical_baseline
+        )
+        results = None
+    elif args.multi_period:
+        # Every month of the input in one pass, one run per period
+        results = workflow.run_periods(
+            payroll_df=load_payroll_data(args.current),
+            historical_df=historical_baseline
+        )
+        batches = [results]
+    elif args.workers > 1:
+        # Sharded across a process pool, merged in input order
+        results = ParallelPayrollRunner(workers=args.workers, workflow=workflow).run(
+            payroll_df=load_payroll_data(args.current),
+            historical_df=historical_baseline
+        )
+        batches = [results]
+    else:
+        # Run payroll for the whole workforce in one pass
+        results = workflow.run_batch(
+            payroll_df=load_payroll_data(args.current),
+            historical_df=historical_baseline,
+            incremental=args.incremental
+        )
+        batches = [results]
 
-    # Run payroll for each employee
-    for _, row in current_df.iterrows():
-        employee_id = row["employee_id"]
+    report_file = open(args.output, "w", newline="", encoding="utf-8") if args.output else None
+    report = csv.writer(report_file) if report_file else None
 
-        result = workflow.run(
-            employee_id=employee_id,
-            payroll_df=current_df,
-            historical_df=historical_df
-        )
+    if report:
+        report.writerow(REPORT_COLUMNS)
 
-        results.append(result)
+    try:
+        for batch in batches:
+            if not args.quiet:
+                workflow.explain(batch)
+                for result in batch:
+                    print_result(result)
 
-        # Console Output (same spirit as before, richer now)
-        print(f"\nEmployee ID: {employee_id}")
-        print(f"Gross Salary     : {result['gross_salary']}")
-        print(f"Total Deductions : {result['total_deductions']}")
-        print(f"Net Salary       : {result['net_salary']}")
+            if report:
+                report.writerows(report_rows(batch))
+                report_file.flush()
+    finally:
+        if report_file:
+            report_file.close()
 
-        if result.get("anomaly", {}).get("anomaly"):
-            print("⚠️  Anomaly Detected")
+    if args.payslips:
+        write_payslip_archive(results, args.payslips)
 
-        print(f"Explanation      : {result['explanation']}")
+    if args.multi_period:
+        print_periods(results)
 
     return results
 
@@ -0,0 +1,163 @@
+"""
+Thin command-line client for the warm payroll worker
+(workflows/payroll_daemon.py). Standard library only, so it starts in
+milliseconds; all payroll work happens in the daemon.
+
+    python payroll_client.py run data/current_payroll.csv --output report.csv
+
+Output names (--output, --payslips) are resolved by the daemon inside
+its output directory (--output-dir, data/reports by default).
+    python payroll_client.py rerun data/current_payroll.csv E001 E007
+    python payroll_client.py what-if PR-202411-abc123 "pf10:pf_rate=0.10"
+    python payroll_client.py status
+    python payroll_client.py --socket /tmp/payroll.sock status
+"""
+
+import argparse
+import http.client
+import json
+import os
+import socket
+import sys
+from urllib.parse import urlsplit
+
+DEFAULT_URL = "http://127.0.0.1:8750"
+
+
+class _UnixConnection(http.client.HTTPConnection):
+
+    def __init__(self, socket_path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def request(method, path, body=None, url=DEFAULT_URL, socket_path=None, timeout=None):
+    """
+    Sends one request to the daemon; returns (HTTP status, JSON body).
+    """
+    if socket_path is not None:
+        conn = _UnixConnection(socket_path, timeout=timeout)
+    else:
+        parsed = urlsplit(url)
+        conn = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=timeout)
+
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    headers = {"Content-Type": "application/json"} if data is not None else {}
+
+    try:
+        conn.request(method, path, body=data, headers=headers)
+        response = conn.getresponse()
+        return response.status, json.loads(response.read() or b"{}")
+    finally:
+        conn.close()
+
+
+def parse_scenario(text):
+    # Same format as utils.scenario_engine (kept here: no pandas / numpy import)
+    name, _, params = text.partition(":")
+    scenario = {"name": name}
+    for item in filter(None, params.split(",")):
+        key, _, value = item.partition("=")
+        key, value = key.strip(), value.strip()
+        scenario[key] = value if key == "tds_basis" else float(value)
+    return scenario
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Payroll worker client")
+    parser.add_argument("--url", default=os.environ.get("PAYROLL_DAEMON_URL", DEFAULT_URL))
+    parser.add_argument("--socket", default=os.environ.get("PAYROLL_DAEMON_SOCKET"))
+    parser.add_argument(
+        "--no-wait",
+        action="store_true",
+        help="Return once the job is queued (poll it with: job <id>)"
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Run payroll for a file")
+    run.add_argument("current")
+    run.add_argument("--incremental", action="store_true")
+    run.add_argument("--multi-period", action="store_true", help="One run per month of the file")
+    run.add_argument("--output", help="CSV payroll report name (in the daemon's output directory)")
+    run.add_argument("--payslips", help="Payslip ZIP name (in the daemon's output directory)")
+
+    rerun = commands.add_parser("rerun", help="Re-run some employees of a file")
+    rerun.add_argument("current")
+    rerun.add_argument("employee_ids", nargs="+")
+
+    what_if = commands.add_parser("what-if", help="Re-price a run under rule overrides")
+    what_if.add_argument("payroll_run_id")
+    what_if.add_argument(
+        "scenarios",
+        nargs="+",
+        help='"name:param=value,param=value", e.g. "pf10:pf_rate=0.10"'
+    )
+    what_if.add_argument(
+        "--output",
+        help="Per-employee net pay deltas CSV name (in the daemon's output directory)"
+    )
+
+    job = commands.add_parser("job", help="Show a queued / finished job")
+    job.add_argument("job_id", type=int)
+
+    commands.add_parser("status", help="Show the daemon's warm state and queue")
+    commands.add_parser("reload", help="Re-read the historical payroll")
+    commands.add_parser("shutdown", help="Stop the daemon")
+
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    # Input paths are resolved here: the daemon may run in another directory
+    def path(p):
+        return os.path.abspath(p) if p else None
+
+    if args.command == "run":
+        method, endpoint, body = "POST", "/run", {
+            "current": path(args.current),
+            "incremental": args.incremental,
+            "multi_period": args.multi_period,
+            "output": args.output,
+            "payslips": args.payslips,
+        }
+    elif args.command == "rerun":
+        method, endpoint, body = "POST", "/rerun", {
+            "current": path(args.current),
+            "employee_ids": args.employee_ids,
+        }
+    elif args.command == "what-if":
+        method, endpoint, body = "POST", "/what-if", {
+            "payroll_run_id": args.payroll_run_id,
+            "scenarios": [parse_scenario(text) for text in args.scenarios],
+            "output": args.output,
+        }
+    elif args.command == "job":
+        method, endpoint, body = "GET", f"/jobs/{args.job_id}", None
+    elif args.command == "status":
+        method, endpoint, body = "GET", "/status", None
+    else:
+        method, endpoint, body = "POST", f"/{args.command}", {}
+
+    if body is not None and args.no_wait:
+        body["wait"] = False
+
+    try:
+        status, reply = request(method, endpoint, body, url=args.url, socket_path=args.socket)
+    except OSError as e:
+        print(f"Payroll worker not reachable: {e}", file=sys.stderr)
+        return 2
+
+    json.dump(reply, sys.stdout, indent=2)
+    print()
+    return 0 if status < 400 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
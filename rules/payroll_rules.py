@@ -5,6 +5,10 @@ Centralized payroll rules and validations.
 Used by validation_agent, compliance_agent, and payroll workflow.
 """
 
+from functools import lru_cache
+
+import numpy as np
+
 # ===============================
 # Statutory Configuration
 # ===============================
@@ -18,79 +22,213 @@ ESI_WAGE_LIMIT = 21000        # ESI applicable below this gross salary
 PT_AMOUNT = 200               # Professional Tax (flat)
 TDS_RATE = 0.10               # Simplified flat TDS for MVP
 
+RULES_VERSION = "MVP"         # Active statutory table (see RULE_TABLE_VERSIONS)
+
 # ===============================
-# Validation Rules
+# Versioned Statutory Tables
 # ===============================
+# Plain data, compiled once into arrays by rules.rule_tables.
+# Slabs are (threshold, value) pairs: value applies once the
+# amount EXCEEDS threshold; the first slab covers everything below.
+
+# Wage ceilings by effective date: (effective_from, pf_wage_limit, esi_wage_limit)
+WAGE_CEILINGS = {
+    "FLAT": [
+        ("1900-01-01", PF_WAGE_LIMIT, ESI_WAGE_LIMIT),
+    ],
+    "IN": [
+        ("2014-09-01", 15000, 15000),
+        ("2017-01-01", 15000, 21000),
+    ],
+}
+
+# Monthly professional tax by monthly gross: (threshold, amount)
+PT_SLABS = {
+    "FLAT": [(0, PT_AMOUNT)],
+    "MH": [(0, 0), (7500, 175), (10000, 200)],            # Maharashtra
+    "KA": [(0, 0), (24999.99, 200)],                      # Karnataka (>= 25,000)
+    "WB": [(0, 0), (10000, 110), (15000, 130), (25000, 150), (40000, 200)],
+    "GJ": [(0, 0), (11999.99, 200)],                      # Gujarat (>= 12,000)
+    "TG": [(0, 0), (15000, 150), (20000, 200)],           # Telangana
+}
+
+# Income tax by taxable income: (threshold, marginal rate)
+TDS_SLABS = {
+    "FLAT": [(0, TDS_RATE)],
+    "IN_NEW_REGIME_FY2024_25": [
+        (0, 0.0),
+        (300000, 0.05),
+        (700000, 0.10),
+        (1000000, 0.15),
+        (1200000, 0.20),
+        (1500000, 0.30),
+    ],
+}
+
+RULE_TABLE_VERSIONS = {
+    # Reproduces the flat MVP constants above
+    "MVP": {
+        "pf_rate": PF_RATE,
+        "esi_rate": ESI_RATE,
+        "wage_ceilings": "FLAT",
+        "pt_slabs": {"DEFAULT": "FLAT"},
+        "tds_slabs": "FLAT",
+        "tds_basis": "monthly",       # slabs applied to monthly taxable income
+        "standard_deduction": 0.0,
+        "rebate_limit": 0.0,
+        "cess_rate": 0.0,
+    },
+    "IN-FY2024-25": {
+        "pf_rate": 0.12,
+        "esi_rate": 0.0075,
+        "wage_ceilings": "IN",
+        "pt_slabs": {
+            "DEFAULT": "FLAT",
+            "MH": "MH",
+            "KA": "KA",
+            "WB": "WB",
+            "GJ": "GJ",
+            "TG": "TG",
+        },
+        "tds_slabs": "IN_NEW_REGIME_FY2024_25",
+        "tds_basis": "annual",        # monthly taxable × 12, tax / 12
+        "standard_deduction": 75000.0,
+        "rebate_limit": 700000.0,     # Section 87A: no tax up to this income
+        "cess_rate": 0.04,
+    },
+}
 
-def validate_payroll_record(record):
+# ===============================
+# Validation Rules
+# ===============================
+# Each rule owns one bit of an issue mask. Rules are evaluated over
+# whole columns; masks are only decoded into messages when read.
+
+ISSUE_GROSS_NOT_POSITIVE = 1 << 0
+ISSUE_NET_NEGATIVE = 1 << 1
+ISSUE_NET_EXCEEDS_GROSS = 1 << 2
+ISSUE_PF_MISSING = 1 << 3
+ISSUE_ESI_MISSING = 1 << 4
+ISSUE_PT_MISSING = 1 << 5
+ISSUE_PF_OVER_LIMIT = 1 << 6
+ISSUE_ESI_NOT_ELIGIBLE = 1 << 7
+
+# Insertion order is the order messages are reported in
+ISSUE_MESSAGES = {
+    ISSUE_GROSS_NOT_POSITIVE: "Gross salary must be greater than zero",
+    ISSUE_NET_NEGATIVE: "Net salary cannot be negative",
+    ISSUE_NET_EXCEEDS_GROSS: "Net salary cannot exceed gross salary",
+    ISSUE_PF_MISSING: "Mandatory deduction missing: PF",
+    ISSUE_ESI_MISSING: "Mandatory deduction missing: ESI",
+    ISSUE_PT_MISSING: "Mandatory deduction missing: PT",
+    ISSUE_PF_OVER_LIMIT: "PF deduction exceeds allowed limit",
+    ISSUE_ESI_NOT_ELIGIBLE: "ESI applied even though gross exceeds eligibility limit",
+}
+
+ISSUE_MASK_DTYPE = np.uint16
+
+MANDATORY_DEDUCTIONS = {
+    "PF": ISSUE_PF_MISSING,
+    "ESI": ISSUE_ESI_MISSING,
+    "PT": ISSUE_PT_MISSING,
+}
+
+
+def evaluate_payroll_rules(gross, net, deductions, pf_rate=PF_RATE, esi_wage_limit=ESI_WAGE_LIMIT):
     """
-    Validates a computed payroll record.
-    This is executed AFTER payroll calculation.
+    Core rule engine. gross / net are float arrays; deductions maps a
+    deduction name to a float array where NaN means "not applied".
+    pf_rate / esi_wage_limit come from the active statutory table
+    (scalars or one value per row; see validate_payroll_frame).
+    Returns one issue mask per row.
     """
+    gross = np.asarray(gross, dtype=float)
+    net = np.asarray(net, dtype=float)
+    missing = np.full(len(gross), np.nan)
+
+    pf = deductions.get("PF", missing)
+    esi = deductions.get("ESI", missing)
+
+    checks = [
+        # --- Salary sanity checks ---
+        (ISSUE_GROSS_NOT_POSITIVE, gross <= 0),
+        (ISSUE_NET_NEGATIVE, net < 0),
+        (ISSUE_NET_EXCEEDS_GROSS, net > gross),
+    ] + [
+        # --- Mandatory statutory checks ---
+        (code, np.isnan(deductions.get(name, missing)))
+        for name, code in MANDATORY_DEDUCTIONS.items()
+    ] + [
+        # --- Logical checks ---
+        (ISSUE_PF_OVER_LIMIT, pf > gross * pf_rate),
+        (ISSUE_ESI_NOT_ELIGIBLE, (gross > esi_wage_limit) & (esi > 0)),
+    ]
+
+    mask = np.zeros(len(gross), dtype=ISSUE_MASK_DTYPE)
+    for code, failed in checks:
+        mask |= np.where(failed, code, 0).astype(ISSUE_MASK_DTYPE)
+
+    return mask
+
+
+def validate_payroll_frame(payroll_df, rules=None, pay_dates=None):
+    """
+    Columnar validation of computed payroll.
+    Expects gross_salary, net_salary and one column per deduction
+    (missing column / NaN means the deduction was not applied).
+    rules: the RuleTable the deductions were computed with (its PF rate
+    and the ESI ceiling in force on each pay date); the flat MVP
+    constants when omitted.
+    Returns one issue mask per row, in row order.
+    """
+    deductions = {
+        name: payroll_df[name].to_numpy(dtype=float)
+        for name in MANDATORY_DEDUCTIONS
+        if name in payroll_df.columns
+    }
 
-    issues = []
-
-    gross = record.get("gross_salary", 0)
-    net = record.get("net_salary", 0)
-    deductions = record.get("deductions", {})
-
-    # --- Salary sanity checks ---
-    if gross <= 0:
-        issues.append("Gross salary must be greater than zero")
-
-    if net < 0:
-        issues.append("Net salary cannot be negative")
-
-    if net > gross:
-        issues.append("Net salary cannot exceed gross salary")
-
-    # --- Mandatory statutory checks ---
-    mandatory_deductions = ["PF", "ESI", "PT"]
-
-    for deduction in mandatory_deductions:
-        if deduction not in deductions:
-            issues.append(f"Mandatory deduction missing: {deduction}")
-
-    # --- Logical checks ---
-    if "PF" in deductions and deductions["PF"] > gross * PF_RATE:
-        issues.append("PF deduction exceeds allowed limit")
-
-    if "ESI" in deductions and gross > ESI_WAGE_LIMIT and deductions["ESI"] > 0:
-        issues.append("ESI applied even though gross exceeds eligibility limit")
-
-    return issues
+    limits = {}
+    if rules is not None:
+        _, esi_wage_limit = rules.wage_limits(pay_dates, len(payroll_df))
+        limits = {"pf_rate": rules.pf_rate, "esi_wage_limit": esi_wage_limit}
 
+    return evaluate_payroll_rules(
+        payroll_df["gross_salary"].to_numpy(dtype=float),
+        payroll_df["net_salary"].to_numpy(dtype=float),
+        deductions,
+        **limits
+    )
 
-# ===============================
-# Helper Calculation Functions
-# ===============================
 
-def calculate_pf(basic_salary):
-    """
-    PF is calculated on basic salary, capped by wage limit.
-    """
-    applicable_wage = min(basic_salary, PF_WAGE_LIMIT)
-    return round(applicable_wage * PF_RATE, 2)
+@lru_cache(maxsize=None)
+def _decode_issue_mask(mask):
+    return tuple(
+        message for code, message in ISSUE_MESSAGES.items() if mask & code
+    )
 
 
-def calculate_esi(gross_salary):
+def decode_issues(mask):
     """
-    ESI applies only if gross salary is within limit.
+    Maps an issue mask to its human-readable messages.
     """
-    if gross_salary <= ESI_WAGE_LIMIT:
-        return round(gross_salary * ESI_RATE, 2)
-    return 0.0
+    return list(_decode_issue_mask(int(mask)))
 
 
-def calculate_pt():
+def validate_payroll_record(record):
     """
-    Professional tax is flat for MVP.
+    Validates a computed payroll record.
+    This is executed AFTER payroll calculation.
     """
-    return PT_AMOUNT
-
+    deductions = record.get("deductions", {})
 
-def calculate_tds(taxable_income):
-    """
-    Simplified TDS calculation for MVP.
-    """
-    return round(taxable_income * TDS_RATE, 2)
+    mask = evaluate_payroll_rules(
+        [record.get("gross_salary", 0)],
+        [record.get("net_salary", 0)],
+        {
+            name: np.array([deductions[name]], dtype=float)
+            for name in MANDATORY_DEDUCTIONS
+            if name in deductions
+        }
+    )[0]
+
+    return decode_issues(mask)
@@ -0,0 +1,228 @@
+# rules/rule_tables.py
+
+"""
+Compiles the versioned statutory tables in rules.payroll_rules into
+NumPy arrays and computes PF / ESI / PT / TDS for whole batches with
+sorted-array slab lookups (np.searchsorted), no per-row branching.
+"""
+
+import copy
+from functools import lru_cache
+
+import numpy as np
+
+from rules.payroll_rules import (
+    RULES_VERSION,
+    RULE_TABLE_VERSIONS,
+    WAGE_CEILINGS,
+    PT_SLABS,
+    TDS_SLABS
+)
+
+DEFAULT_STATE = "DEFAULT"
+
+# Parameters a what-if scenario may override (RuleTable.with_overrides)
+SCENARIO_PARAMETERS = (
+    "pf_rate",
+    "pf_wage_limit",
+    "esi_rate",
+    "esi_wage_limit",
+    "tds_rate",
+    "tds_slabs",
+    "tds_basis",
+    "standard_deduction",
+    "rebate_limit",
+    "cess_rate",
+)
+
+
+def _slab_index(thresholds, values):
+    """
+    Index of the slab each value falls in ("exceeds threshold" semantics).
+    """
+    idx = np.searchsorted(thresholds, values, side="left") - 1
+    return np.clip(idx, 0, len(thresholds) - 1)
+
+
+def _tax_base(thresholds, rates):
+    """
+    Tax accumulated up to each slab's threshold.
+    """
+    return np.concatenate([[0.0], np.cumsum(np.diff(thresholds) * rates[:-1])])
+
+
+class RuleTable:
+    """
+    One statutory table version, compiled into arrays.
+    """
+
+    def __init__(self, version, spec):
+        self.version = version
+
+        self.pf_rate = float(spec["pf_rate"])
+        self.esi_rate = float(spec["esi_rate"])
+
+        ceilings = sorted(WAGE_CEILINGS[spec["wage_ceilings"]])
+        self.ceiling_dates = np.array([c[0] for c in ceilings], dtype="datetime64[D]")
+        self.pf_wage_limits = np.array([c[1] for c in ceilings], dtype=float)
+        self.esi_wage_limits = np.array([c[2] for c in ceilings], dtype=float)
+
+        self.pt_states = {}
+        for state, slab_name in spec["pt_slabs"].items():
+            slabs = PT_SLABS[slab_name]
+            self.pt_states[state] = (
+                np.array([t for t, _ in slabs], dtype=float),
+                np.array([a for _, a in slabs], dtype=float)
+            )
+
+        tds = TDS_SLABS[spec["tds_slabs"]]
+        self.tds_thresholds = np.array([t for t, _ in tds], dtype=float)
+        self.tds_rates = np.array([r for _, r in tds], dtype=float)
+        self.tds_base = _tax_base(self.tds_thresholds, self.tds_rates)
+
+        self.tds_basis = spec["tds_basis"]
+        self.standard_deduction = float(spec["standard_deduction"])
+        self.rebate_limit = float(spec["rebate_limit"])
+        self.cess_rate = float(spec["cess_rate"])
+
+    # -----------------------------
+    # What-if copies
+    # -----------------------------
+    def with_overrides(self, **overrides):
+        """
+        Copy of this table with some statutory parameters replaced
+        (see SCENARIO_PARAMETERS; used by utils.scenario_engine):
+        pf_rate / esi_rate, pf_wage_limit / esi_wage_limit (one ceiling
+        for every pay date), tds_rate (one flat slab) or tds_slabs
+        [(threshold, rate), ...], tds_basis ("monthly" / "annual"),
+        standard_deduction, rebate_limit, cess_rate.
+        """
+        unknown = set(overrides) - set(SCENARIO_PARAMETERS)
+        if unknown:
+            raise ValueError(
+                f"Unknown rule parameters: {', '.join(sorted(unknown))}. "
+                f"Available: {', '.join(SCENARIO_PARAMETERS)}"
+            )
+        if "tds_rate" in overrides and "tds_slabs" in overrides:
+            raise ValueError("Pass either tds_rate or tds_slabs, not both")
+        if overrides.get("tds_basis", "monthly") not in ("monthly", "annual"):
+            raise ValueError("tds_basis must be 'monthly' or 'annual'")
+
+        table = copy.copy(self)
+        table.version = f"{self.version}+what-if"
+
+        for name in ("pf_rate", "esi_rate", "standard_deduction", "rebate_limit", "cess_rate"):
+            if name in overrides:
+                setattr(table, name, float(overrides[name]))
+        if "tds_basis" in overrides:
+            table.tds_basis = overrides["tds_basis"]
+
+        if "pf_wage_limit" in overrides or "esi_wage_limit" in overrides:
+            pf_limit, esi_limit = self.wage_limits()
+            table.ceiling_dates = self.ceiling_dates[:1]
+            table.pf_wage_limits = np.array(
+                [float(overrides.get("pf_wage_limit", pf_limit[0]))]
+            )
+            table.esi_wage_limits = np.array(
+                [float(overrides.get("esi_wage_limit", esi_limit[0]))]
+            )
+
+        slabs = overrides.get("tds_slabs")
+        if "tds_rate" in overrides:
+            slabs = [(0, overrides["tds_rate"])]
+        if slabs is not None:
+            slabs = sorted((float(t), float(r)) for t, r in slabs)
+            table.tds_thresholds = np.array([t for t, _ in slabs])
+            table.tds_rates = np.array([r for _, r in slabs])
+            table.tds_base = _tax_base(table.tds_thresholds, table.tds_rates)
+
+        return table
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    def wage_limits(self, pay_dates=None, size=1):
+        """
+        (pf_wage_limit, esi_wage_limit) arrays effective on each pay date.
+        Without dates, the latest ceilings apply.
+        """
+        if pay_dates is None:
+            return (
+                np.full(size, self.pf_wage_limits[-1]),
+                np.full(size, self.esi_wage_limits[-1])
+            )
+
+        pay_dates = np.asarray(pay_dates, dtype="datetime64[D]")
+        idx = np.searchsorted(self.ceiling_dates, pay_dates, side="right") - 1
+        idx = np.clip(idx, 0, len(self.ceiling_dates) - 1)
+        return self.pf_wage_limits[idx], self.esi_wage_limits[idx]
+
+    # -----------------------------
+    # Deductions (vectorized)
+    # -----------------------------
+    def pf(self, basic, pay_dates=None):
+        basic = np.asarray(basic, dtype=float)
+        pf_limit, _ = self.wage_limits(pay_dates, len(basic))
+        return np.round(np.minimum(basic, pf_limit) * self.pf_rate, 2)
+
+    def esi(self, gross, pay_dates=None):
+        gross = np.asarray(gross, dtype=float)
+        _, esi_limit = self.wage_limits(pay_dates, len(gross))
+        return np.where(gross <= esi_limit, np.round(gross * self.esi_rate, 2), 0.0)
+
+    def pt(self, gross, states=None):
+        """
+        Monthly PT from per-state slabs. One searchsorted per distinct
+        state; unknown states fall back to DEFAULT.
+        """
+        gross = np.asarray(gross, dtype=float)
+        pt = np.empty(len(gross))
+
+        if states is None:
+            states = np.full(len(gross), DEFAULT_STATE)
+        else:
+            states = np.asarray(states, dtype=str)
+            states = np.where(np.isin(states, list(self.pt_states)), states, DEFAULT_STATE)
+
+        for state in np.unique(states):
+            rows = states == state
+            thresholds, amounts = self.pt_states[state]
+            pt[rows] = amounts[_slab_index(thresholds, gross[rows])]
+
+        return pt
+
+    def income_tax(self, taxable):
+        """
+        Progressive tax on `taxable` using the compiled slabs.
+        """
+        taxable = np.asarray(taxable, dtype=float)
+        k = _slab_index(self.tds_thresholds, taxable)
+        return self.tds_base[k] + (taxable - self.tds_thresholds[k]) * self.tds_rates[k]
+
+    def tds(self, taxable_monthly):
+        """
+        Monthly TDS on monthly taxable income (gross − PF).
+        """
+        taxable_monthly = np.asarray(taxable_monthly, dtype=float)
+
+        if self.tds_basis == "monthly":
+            return np.round(self.income_tax(taxable_monthly), 2)
+
+        annual = np.maximum(taxable_monthly * 12 - self.standard_deduction, 0.0)
+        tax = self.income_tax(annual)
+        tax = np.where(annual <= self.rebate_limit, 0.0, tax)
+        tax = tax * (1 + self.cess_rate)
+        return np.round(tax / 12, 2)
+
+
+@lru_cache(maxsize=None)
+def load_rule_table(version=RULES_VERSION):
+    """
+    Compiles (once per process) and returns the RuleTable for `version`.
+    """
+    if version not in RULE_TABLE_VERSIONS:
+        raise ValueError(
+            f"Unknown statutory rules version: {version}. "
+            f"Available: {', '.join(RULE_TABLE_VERSIONS)}"
+        )
+    return RuleTable(version, RULE_TABLE_VERSIONS[version])
@@ -0,0 +1,90 @@
+# tests/test_anomaly_engine.py
+
+"""
+StatisticalAnomalyEngine inside a payroll run: gross and net are scored
+on the history files' basis (fixed pay), so an ordinary bonus month is
+not a gross or net anomaly.
+
+    python -m pytest -q tests
+"""
+
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from utils.anomaly_engine import StatisticalAnomalyEngine
+from utils.historical_baseline import HistoricalBaseline
+from workflows.payroll_workflow import PayrollWorkflow
+
+HISTORY_MONTHS = ["2024-05", "2024-06", "2024-07", "2024-08", "2024-09", "2024-10"]
+HISTORY_BONUS = [0, 12000, 0, 0, 14000, 0]
+
+
+def _history():
+    return pd.DataFrame({
+        "employee_id": "E001",
+        "month": HISTORY_MONTHS,
+        "gross_salary": [50000, 50200, 49900, 50100, 50000, 50300],
+        "net_salary": [43000, 43150, 42900, 43100, 43000, 43250],
+        "bonus": HISTORY_BONUS,
+        "tax": 5000,
+        "insurance": 2000,
+    })
+
+
+def _current(gross_salary=50200, net_salary=43150, bonus=13000):
+    return pd.DataFrame({
+        "employee_id": ["E001"],
+        "month": ["2024-11"],
+        "gross_salary": [gross_salary],
+        "net_salary": [net_salary],
+        "bonus": [bonus],
+        "tax": [5000],
+        "insurance": [2000],
+    })
+
+
+class BonusMonthTest(unittest.TestCase):
+
+    def setUp(self):
+        # The workflow's stores live under ./data
+        self._cwd = os.getcwd()
+        self._tmp = tempfile.TemporaryDirectory()
+        os.chdir(self._tmp.name)
+
+        history = _history()
+        self.baseline = HistoricalBaseline.from_frame(history)
+        self.workflow = PayrollWorkflow(
+            anomaly_engine=StatisticalAnomalyEngine().fit(history),
+            lazy_explanations=True,
+            metrics_dir=None,
+            results_dir=None
+        )
+
+    def tearDown(self):
+        os.chdir(self._cwd)
+        self._tmp.cleanup()
+
+    def _statistical_metrics(self, current_df):
+        results = self.workflow._run_frame(
+            current_df, self.baseline, {"status": "DRAFT"}, audit=None
+        )
+        return {
+            anomaly["details"]["metric"]
+            for anomaly in results[0]["anomalies"]
+            if anomaly["issue_type"] == "Statistical Anomaly"
+        }
+
+    def test_usual_bonus_month_is_not_a_gross_or_net_anomaly(self):
+        self.assertEqual(self._statistical_metrics(_current()), set())
+
+    def test_gross_jump_is_still_flagged(self):
+        flagged = self._statistical_metrics(_current(gross_salary=70000, net_salary=61000, bonus=0))
+        self.assertIn("gross", flagged)
+        self.assertIn("net", flagged)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+# tests/test_explanation_backend.py
+
+"""
+HTTPExplanationBackend against the local stub endpoint
+(utils.explanation_stub_server): batching, retries on 429 / 5xx, rate
+limiting, and the agent's uncached fallback when the backend fails.
+
+    python -m pytest -q tests
+"""
+
+import time
+import unittest
+
+from agents.explanation_agent import PayrollExplanationAgent
+from agents.explanation_backends import HTTPExplanationBackend, SALARY_ANOMALY_TEMPLATE
+from utils.explanation_cache import ExplanationCache
+from utils.explanation_stub_server import StubExplanationServer
+
+
+def _contexts(n):
+    return [
+        {
+            "signature": f"salary:{10 * i}",
+            "issue_type": "Salary Anomaly",
+            "placeholders": ["employee_id", "change_percentage"],
+            "example": {"employee_id": f"E{i:03d}", "change_percentage": 10 * i},
+        }
+        for i in range(n)
+    ]
+
+
+def _anomaly(employee_id="E001", change_percentage=45.0):
+    return {
+        "employee_id": employee_id,
+        "issue_type": "Salary Anomaly",
+        "details": {
+            "change_percentage": change_percentage,
+            "previous_gross": 50000,
+            "current_gross": 72500,
+        },
+    }
+
+
+class HTTPExplanationBackendTest(unittest.TestCase):
+
+    def _backend(self, server, **options):
+        options = {"rate_limit": 1000.0, "backoff": 0.01, **options}
+        return HTTPExplanationBackend(url=server.url, **options)
+
+    def test_batches_contexts(self):
+        with StubExplanationServer() as server:
+            backend = self._backend(server, batch_size=4, max_concurrency=2)
+            templates = backend.generate(_contexts(10))
+
+        self.assertEqual(len(templates), 10)
+        self.assertEqual(server.requests, 3)
+        self.assertEqual(server.issues, 10)
+        self.assertEqual(backend.requests_sent, 3)
+        self.assertLessEqual(server.max_in_flight, 2)
+        self.assertEqual(
+            templates["salary:20"],
+            "[Salary Anomaly] employee_id={employee_id} change_percentage={change_percentage}"
+        )
+
+    def test_retries_rate_limited_requests(self):
+        with StubExplanationServer(fail_first=2) as server:
+            backend = self._backend(server, retries=2)
+            templates = backend.generate(_contexts(1))
+
+        self.assertEqual(len(templates), 1)
+        self.assertEqual(server.requests, 3)
+
+    def test_retries_server_errors(self):
+        with StubExplanationServer(fail_first=1, fail_status=503) as server:
+            backend = self._backend(server, retries=1)
+            templates = backend.generate(_contexts(1))
+
+        self.assertEqual(len(templates), 1)
+        self.assertEqual(server.requests, 2)
+
+    def test_gives_up_after_retries(self):
+        with StubExplanationServer(fail_first=10, fail_status=500) as server:
+            backend = self._backend(server, retries=2)
+            templates = backend.generate(_contexts(1))
+
+        self.assertEqual(templates, {})
+        self.assertEqual(server.requests, 3)
+
+    def test_client_errors_are_not_retried(self):
+        with StubExplanationServer(fail_first=10, fail_status=400) as server:
+            backend = self._backend(server, retries=2)
+            templates = backend.generate(_contexts(1))
+
+        self.assertEqual(templates, {})
+        self.assertEqual(server.requests, 1)
+
+    def test_rate_limit_spaces_requests(self):
+        rate = 20.0
+        with StubExplanationServer() as server:
+            backend = self._backend(server, batch_size=1, max_concurrency=4, rate_limit=rate)
+            started = time.monotonic()
+            backend.generate(_contexts(6))
+            elapsed = time.monotonic() - started
+
+        self.assertEqual(server.requests, 6)
+        self.assertGreaterEqual(elapsed, (6 - 1) / rate)
+
+
+class ExplanationFallbackTest(unittest.TestCase):
+
+    def test_failed_backend_falls_back_without_caching(self):
+        with StubExplanationServer(fail_first=3) as server:
+            backend = HTTPExplanationBackend(url=server.url, rate_limit=1000.0, retries=2, backoff=0.01)
+            agent = PayrollExplanationAgent(backend=backend, cache=ExplanationCache())
+            anomaly = _anomaly()
+
+            explanation = agent.explain_anomaly(anomaly)
+            self.assertEqual(explanation, SALARY_ANOMALY_TEMPLATE.format(
+                employee_id="E001",
+                change_percentage=45.0,
+                previous_gross=50000,
+                current_gross=72500
+            ))
+            self.assertEqual(len(agent.cache), 0)
+            self.assertEqual(server.requests, 3)
+
+            # The fallback was not cached: the next call asks the backend again
+            explanation = agent.explain_anomaly(_anomaly("E002"))
+            self.assertTrue(explanation.startswith("[Salary Anomaly] employee_id=E002"))
+            self.assertEqual(len(agent.cache), 1)
+            self.assertEqual(server.requests, 4)
+
+            # ... and is answered from the cache after that
+            agent.explain_anomaly(_anomaly("E003"))
+            self.assertEqual(server.requests, 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+# tests/test_historical_baseline.py
+
+"""
+HistoricalBaseline fed from finalised runs: an employee rejected inside
+a run that is otherwise approved stays out of the baseline.
+
+    python -m pytest -q tests
+"""
+
+import json
+import os
+import tempfile
+import unittest
+
+import pandas as pd
+
+from agents.payroll_approval_agent import PayrollApprovalAgent
+from utils.approval_store import ApprovalStore
+from utils.historical_baseline import HistoricalBaseline
+
+
+def _write_audit(path):
+    with open(path, "w", encoding="utf-8") as f:
+        for employee_id, gross_salary in [("E1", 90000), ("E2", 50000)]:
+            f.write(json.dumps({
+                "payroll_run_id": "PR-1",
+                "employee_id": employee_id,
+                "payroll_period": "November 2024",
+                "gross_salary": gross_salary,
+            }) + "\n")
+
+
+class ClosedRunExclusionTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.historical_path = os.path.join(self.tmp.name, "history.csv")
+        self.audit_path = os.path.join(self.tmp.name, "audit_log.jsonl")
+        self.cache_path = os.path.join(self.tmp.name, "baseline.npz")
+
+        pd.DataFrame({
+            "employee_id": ["E1", "E2"],
+            "month": ["2024-10", "2024-10"],
+            "gross_salary": [50000, 50000],
+        }).to_csv(self.historical_path, index=False)
+        _write_audit(self.audit_path)
+
+        self.agent = PayrollApprovalAgent(
+            ApprovalStore(os.path.join(self.tmp.name, "approval_log.jsonl"))
+        )
+        self.agent.init_state("PR-1", "November 2024")
+        self.agent.transition([("PR-1", "E1")], "HR", "reject")
+        self.agent.transition(["PR-1"], "HR")
+        self.agent.transition(["PR-1"], "Finance")
+
+    def _baseline(self):
+        closed_runs = self.agent.closed_runs()
+        return HistoricalBaseline.load_or_build(
+            [self.historical_path],
+            audit_path=self.audit_path,
+            cache_path=self.cache_path,
+            closed_runs=closed_runs,
+            excluded=self.agent.excluded_employees(closed_runs),
+        )
+
+    def test_rejected_employee_is_excluded(self):
+        self.assertEqual(self.agent.closed_runs(), ["PR-1"])
+        self.assertEqual(self.agent.excluded_employees(["PR-1"]), {"PR-1": ["E1"]})
+
+        baseline = self._baseline()
+        self.assertEqual(baseline.get("E1")["last_gross"], 50000)
+        self.assertEqual(baseline.get("E2")["last_gross"], 50000)
+        self.assertEqual(baseline.get("E1")["month_count"], 1)
+        self.assertEqual(baseline.get("E2")["month_count"], 2)
+
+    def test_incremental_close_excludes_rejected_employee(self):
+        # Cache built before PR-1 closed; PR-1 is then folded in with close_runs()
+        HistoricalBaseline.load_or_build(
+            [self.historical_path], audit_path=self.audit_path,
+            cache_path=self.cache_path, closed_runs=[]
+        )
+        baseline = self._baseline()
+        self.assertEqual(baseline.get("E1")["month_count"], 1)
+        self.assertEqual(baseline.get("E2")["month_count"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
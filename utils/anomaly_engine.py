@@ -0,0 +1,322 @@
+# utils/anomaly_engine.py
+
+"""
+Statistical (and optionally model-based) payroll anomaly engine.
+
+Fitted once per period on the multi-month payroll history, then scores
+a whole payroll frame in one vectorized pass:
+
+- per employee and metric (gross, net, bonus): median, MAD, mean, std
+  and month count over the last `window` months
+- robust z-score (x − median) / (1.4826 · MAD) and classic z-score
+  against those statistics; a metric is flagged when its robust z-score
+  exceeds `robust_threshold` and the change is material (see
+  `min_change`). Bonus is paid in some months only, so its median and
+  MAD are usually 0; it is scaled by the employee's typical (mean
+  non-zero) bonus instead, or by the workforce's typical bonus-to-gross
+  ratio for employees with no bonus in the window
+- optionally an IsolationForest fitted on workforce-level ratios
+  (scikit-learn, imported only when use_model=True), scored with one
+  batched decision_function call
+
+Gross and net are compared on the history files' basis: the input
+gross_salary / net_salary (fixed pay, without bonus or incentive), not a
+computed run's gross and net, which add variable pay on top. Variable
+pay is scored once, as the bonus metric. Deductions are not scored: the
+historical files only carry gross − net (tax and insurance), which is
+not comparable with a computed run's statutory PF / ESI / PT / TDS.
+Bonus includes incentive when that column exists.
+
+Fitted engines are cached on disk per period and history content, so
+a run only fits when the history changed.
+"""
+
+import hashlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+try:
+    from sklearn.ensemble import IsolationForest
+except ImportError:     # optional dependency
+    IsolationForest = None
+
+ANOMALY_MODEL_DIR = "data/anomaly_models"
+ENGINE_FORMAT = 2
+
+METRICS = ("gross", "net", "bonus")
+MODEL_FEATURES = ("gross_vs_median", "net_ratio", "bonus_ratio")
+
+MAD_SCALE = 1.4826       # MAD → standard deviation under normality
+
+
+def _to_month(values):
+    return pd.PeriodIndex(pd.to_datetime(values.astype(str)), freq="M").astype(str)
+
+
+VARIABLE_PAY = ("bonus", "incentive", "Bonus", "Incentive")
+
+
+def metric_frame(payroll_df, earnings=None):
+    """
+    (gross, net, bonus) per row of a payroll input frame, as in the
+    history files: gross / net are the fixed-pay gross_salary /
+    net_salary columns, bonus the variable pay. For a run, pass its
+    input rows; bonus then comes from the computed `earnings` frame,
+    and gross from its fixed components when the input has no
+    gross_salary column.
+    """
+    source = earnings if earnings is not None else payroll_df
+    bonus = np.zeros(len(payroll_df))
+    for col in VARIABLE_PAY:
+        if col in source.columns:
+            bonus = bonus + source[col].to_numpy(dtype=float)
+
+    if "gross_salary" in payroll_df.columns:
+        gross = payroll_df["gross_salary"].to_numpy(dtype=float)
+    elif earnings is not None:
+        fixed = [col for col in earnings.columns if col not in VARIABLE_PAY]
+        gross = earnings[fixed].to_numpy(dtype=float).sum(axis=1)
+    else:
+        gross = np.full(len(payroll_df), np.nan)
+
+    net = (
+        payroll_df["net_salary"].to_numpy(dtype=float)
+        if "net_salary" in payroll_df.columns
+        else np.full(len(payroll_df), np.nan)
+    )
+
+    return pd.DataFrame({
+        "gross": gross,
+        "net": net,
+        "bonus": bonus,
+    })
+
+
+def _model_features(metrics, median_gross):
+    gross = metrics["gross"].to_numpy()
+    with np.errstate(divide="ignore", invalid="ignore"):
+        features = np.column_stack([
+            gross / median_gross - 1,
+            metrics["net"].to_numpy() / gross,
+            metrics["bonus"].to_numpy() / gross,
+        ])
+    return np.nan_to_num(features, nan=0.0, posinf=0.0, neginf=0.0)
+
+
+class StatisticalAnomalyEngine:
+    """
+    Per-employee robust statistics (+ optional IsolationForest),
+    fitted once and scored in batch.
+    """
+
+    def __init__(self, window=6, robust_threshold=3.5, min_change=0.05,
+                 min_history=3, use_model=False, contamination="auto", seed=0):
+        if use_model and IsolationForest is None:
+            raise ImportError("use_model=True requires scikit-learn (pip install scikit-learn)")
+
+        self.window = window
+        self.robust_threshold = robust_threshold
+        self.min_change = min_change
+        self.min_history = min_history
+        self.use_model = use_model
+        self.contamination = contamination
+        self.seed = seed
+
+        self.employee_ids = None
+        self.stats = None          # {metric: {"median", "mad", "mean", "std"}} arrays
+        self.month_count = None
+        self.typical_bonus = None  # mean non-zero bonus per employee (0: none)
+        self.bonus_ratio = 0.0     # workforce median of non-zero bonus / gross
+        self.model = None
+        self.signature = None
+
+    # -----------------------------
+    # Fitting
+    # -----------------------------
+    def fit(self, history_df):
+        """
+        history_df: payroll history with employee_id, month, gross_salary
+        and optionally net_salary / bonus / incentive.
+        """
+        self.signature = self._signature(history_df, period=None)
+
+        history = pd.concat([
+            pd.DataFrame({
+                "employee_id": history_df["employee_id"].astype(str).to_numpy(),
+                "month": _to_month(history_df["month"]),
+            }),
+            metric_frame(history_df.reset_index(drop=True)),
+        ], axis=1)
+
+        history = (
+            history
+            .drop_duplicates(["employee_id", "month"], keep="last")
+            .sort_values(["employee_id", "month"], kind="stable")
+        )
+        history = history[
+            history.groupby("employee_id").cumcount(ascending=False) < self.window
+        ]
+
+        grouped = history.groupby("employee_id", sort=True)
+        median = grouped[list(METRICS)].median()
+        deviation = (history[list(METRICS)] - median.loc[history["employee_id"]].to_numpy()).abs()
+        mad = deviation.groupby(history["employee_id"].to_numpy()).median().loc[median.index]
+        mean = grouped[list(METRICS)].mean()
+        std = grouped[list(METRICS)].std(ddof=0)
+
+        self.employee_ids = median.index.to_numpy(dtype=str)
+        self.month_count = grouped.size().to_numpy()
+        self.stats = {
+            metric: {
+                "median": median[metric].to_numpy(),
+                "mad": mad[metric].to_numpy(),
+                "mean": mean[metric].to_numpy(),
+                "std": std[metric].to_numpy(),
+            }
+            for metric in METRICS
+        }
+        self._index = pd.Index(self.employee_ids)
+
+        paid = history[history["bonus"] > 0]
+        self.typical_bonus = (
+            paid.groupby("employee_id")["bonus"].mean()
+            .reindex(median.index, fill_value=0.0)
+            .to_numpy()
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratios = (paid["bonus"] / paid["gross"]).to_numpy()
+        ratios = ratios[np.isfinite(ratios)]
+        self.bonus_ratio = float(np.median(ratios)) if len(ratios) else 0.0
+
+        if self.use_model:
+            pos = self._index.get_indexer(history["employee_id"])
+            features = _model_features(
+                history.reset_index(drop=True), self.stats["gross"]["median"][pos]
+            )
+            self.model = IsolationForest(
+                contamination=self.contamination, random_state=self.seed
+            ).fit(features)
+
+        return self
+
+    @classmethod
+    def load_or_fit(cls, history_df, period, cache_dir=ANOMALY_MODEL_DIR, **options):
+        """
+        Returns the engine fitted on history_df for `period`, loading it
+        from cache_dir when the same history and options were fitted before.
+        """
+        engine = cls(**options)
+        signature = engine._signature(history_df, period)
+        path = os.path.join(cache_dir, f"{period}-{signature[:16]}.pkl")
+
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                cached = pickle.load(f)
+            if cached.signature == signature:
+                return cached
+
+        engine.fit(history_df)
+        engine.signature = signature
+
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump(engine, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        return engine
+
+    def _signature(self, history_df, period):
+        h = hashlib.sha256()
+        h.update(f"{ENGINE_FORMAT}|{period}|{self.window}|{self.robust_threshold}|"
+                 f"{self.min_change}|{self.min_history}|{self.use_model}|"
+                 f"{self.contamination}|{self.seed}".encode())
+        h.update(pd.util.hash_pandas_object(history_df, index=False).to_numpy().tobytes())
+        return h.hexdigest()
+
+    # -----------------------------
+    # Scoring
+    # -----------------------------
+    def score(self, current_df, earnings=None):
+        """
+        One list of anomalies per row of current_df (in row order).
+        current_df: the run's input rows (see metric_frame); earnings:
+        their computed earnings, aligned on current_df.
+        """
+        if self.stats is None:
+            raise ValueError("StatisticalAnomalyEngine must be fitted before scoring")
+
+        current = metric_frame(current_df, earnings)
+        emp_list = current_df["employee_id"].tolist()
+
+        pos = self._index.get_indexer(current_df["employee_id"].astype(str))
+        found = pos >= 0
+        safe = np.where(found, pos, 0)
+
+        enough = found & (np.where(found, self.month_count[safe], 0) >= self.min_history)
+        median_gross = np.where(found, self.stats["gross"]["median"][safe], np.nan)
+        floor = np.maximum(self.min_change * np.abs(median_gross), 1.0)
+
+        # Intermittent bonus: an ordinary bonus is measured against the
+        # bonuses the employee (or else the workforce) usually gets
+        typical_bonus = np.where(found, self.typical_bonus[safe], 0.0)
+        bonus_scale = np.where(
+            typical_bonus > 0, typical_bonus, self.bonus_ratio * np.abs(median_gross)
+        )
+
+        per_row = [[] for _ in range(len(current_df))]
+
+        for metric in METRICS:
+            stats = self.stats[metric]
+            values = current[metric].to_numpy()
+            median = stats["median"][safe]
+            deviation = values - median
+            scale = np.maximum(bonus_scale, floor) if metric == "bonus" else floor
+
+            with np.errstate(divide="ignore", invalid="ignore"):
+                robust_z = deviation / np.maximum(MAD_SCALE * stats["mad"][safe], scale)
+                z_score = (values - stats["mean"][safe]) / np.maximum(stats["std"][safe], scale)
+                change = np.where(median != 0, deviation / np.abs(median), np.nan)
+
+            flagged = (
+                enough
+                & (np.abs(robust_z) > self.robust_threshold)
+                & (np.abs(deviation) > floor)
+            )
+
+            for i in np.flatnonzero(flagged):
+                per_row[i].append({
+                    "employee_id": emp_list[i],
+                    "issue_type": "Statistical Anomaly",
+                    "severity": "High" if abs(robust_z[i]) > 2 * self.robust_threshold else "Medium",
+                    "details": {
+                        "metric": metric,
+                        "current_value": float(values[i]),
+                        "median_value": float(median[i]),
+                        "robust_z_score": round(float(robust_z[i]), 2),
+                        "z_score": round(float(z_score[i]), 2),
+                        "change_percentage": (
+                            None if np.isnan(change[i]) else round(float(change[i]) * 100, 2)
+                        ),
+                    }
+                })
+
+        if self.model is not None:
+            features = _model_features(current, median_gross)
+            scores = self.model.decision_function(features)
+            outliers = self.model.predict(features) == -1
+
+            for i in np.flatnonzero(outliers & found):
+                per_row[i].append({
+                    "employee_id": emp_list[i],
+                    "issue_type": "Model Anomaly",
+                    "severity": "Medium",
+                    "details": {
+                        "model": "IsolationForest",
+                        "model_score": round(float(scores[i]), 4),
+                    }
+                })
+
+        return per_row
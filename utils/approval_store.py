@@ -0,0 +1,186 @@
+# utils/approval_store.py
+
+"""
+Persistent payroll approval state.
+
+Every approval transition is one JSON line appended to a log:
+    {"payroll_run_id", "employee_id", "action", "from_status", "status",
+     "approved_by", "timestamp", "payroll_period"}
+employee_id is null for run-level transitions; employee-level entries
+override the run status for that employee only.
+
+The current state of every run / employee is kept in an in-memory index
+built from the log. Other processes' appends are picked up by reading
+only the bytes added since the last refresh, so listing every run's
+status never re-reads the log (or the audit files). A bulk transition is
+one write + one fsync, whatever the number of runs or employees.
+"""
+
+import json
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:     # not available on Windows
+    fcntl = None
+
+APPROVAL_LOG_PATH = "data/approval_log.jsonl"
+
+
+class ApprovalStore:
+    """
+    Append-only approval transition log + (run, employee) → state index.
+    """
+
+    def __init__(self, path=APPROVAL_LOG_PATH):
+        self.path = path
+        self._runs = {}         # payroll_run_id → run state
+        self._employees = {}    # payroll_run_id → {employee_id: state}
+        self._offset = 0
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_fd = None
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.refresh()
+
+    # -----------------------------
+    # Index
+    # -----------------------------
+    def refresh(self):
+        """
+        Applies log lines appended since the last refresh.
+        """
+        with self._lock:
+            if not os.path.exists(self.path) or os.path.getsize(self.path) <= self._offset:
+                return
+
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+
+            # A line being written by another process is picked up next time
+            complete = data[:data.rfind(b"\n") + 1]
+            for line in complete.splitlines():
+                if line.strip():
+                    self._apply(json.loads(line))
+            self._offset += len(complete)
+
+    def _apply(self, entry):
+        state = {
+            "payroll_run_id": entry["payroll_run_id"],
+            "status": entry["status"],
+            "approved_by": entry["approved_by"],
+            "timestamp": entry["timestamp"],
+        }
+
+        employee_id = entry.get("employee_id")
+        if employee_id is not None:
+            self._employees.setdefault(entry["payroll_run_id"], {})[employee_id] = state
+            return
+
+        previous = self._runs.get(entry["payroll_run_id"])
+        state["payroll_period"] = entry.get("payroll_period") or (previous or {}).get("payroll_period")
+        state["created_at"] = (previous or {}).get("created_at", entry["timestamp"])
+        self._runs[entry["payroll_run_id"]] = state
+
+    # -----------------------------
+    # Reads
+    # -----------------------------
+    def run_state(self, payroll_run_id):
+        with self._lock:
+            state = self._runs.get(payroll_run_id)
+            return dict(state) if state is not None else None
+
+    def state(self, payroll_run_id, employee_id=None):
+        """
+        Current state of a run, or of one employee in it (the run state
+        unless that employee has its own transitions).
+        """
+        with self._lock:
+            if employee_id is not None:
+                state = self._employees.get(payroll_run_id, {}).get(employee_id)
+                if state is not None:
+                    return dict(state)
+            return self.run_state(payroll_run_id)
+
+    def runs(self):
+        """
+        State of every run, newest first.
+        """
+        with self._lock:
+            states = [dict(s) for s in self._runs.values()]
+        return sorted(states, key=lambda s: s["created_at"] or "", reverse=True)
+
+    def employee_states(self, payroll_run_id):
+        """
+        employee_id → state for employees with their own transitions.
+        """
+        with self._lock:
+            return {
+                employee_id: dict(state)
+                for employee_id, state in self._employees.get(payroll_run_id, {}).items()
+            }
+
+    # -----------------------------
+    # Writes
+    # -----------------------------
+    def locked(self):
+        """
+        Serializes read-check-append sequences across threads and
+        processes (see PayrollApprovalAgent.transition).
+        """
+        return _FileLock(self)
+
+    def append(self, entries):
+        """
+        Appends transition entries in one write and fsync, then
+        applies them to the index.
+        """
+        if not entries:
+            return
+
+        data = "".join(json.dumps(entry) + "\n" for entry in entries).encode("utf-8")
+
+        with self.locked():
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                view = memoryview(data)
+                while view:
+                    view = view[os.write(fd, view):]
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            # Picks up any concurrent appends first, then ours, in file order
+            self.refresh()
+
+
+class _FileLock:
+    """
+    Re-entrant: thread lock + advisory lock on <log>.lock (where fcntl
+    exists), taken once per outermost block; the index is refreshed on
+    entry.
+    """
+
+    def __init__(self, store):
+        self.store = store
+
+    def __enter__(self):
+        store = self.store
+        store._lock.acquire()
+        if store._lock_depth == 0 and fcntl is not None:
+            store._lock_fd = os.open(store.path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(store._lock_fd, fcntl.LOCK_EX)
+        store._lock_depth += 1
+        store.refresh()
+        return store
+
+    def __exit__(self, exc_type, exc, tb):
+        store = self.store
+        store._lock_depth -= 1
+        if store._lock_depth == 0 and store._lock_fd is not None:
+            fcntl.flock(store._lock_fd, fcntl.LOCK_UN)
+            os.close(store._lock_fd)
+            store._lock_fd = None
+        store._lock.release()
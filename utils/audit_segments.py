@@ -0,0 +1,457 @@
+# utils/audit_segments.py
+
+"""
+Segmented audit detail log.
+
+The JSONL detail log is split into numbered segments that roll over by
+size or when the payroll period changes. Closed segments are
+block-compressed: every ~64 KB of records becomes an independent gzip
+member, so a single record can be read by decompressing one block.
+
+Each segment has a sidecar index (.idx, TSV):
+    payroll_run_id  employee_id  block_offset  offset  length
+block_offset is -1 for an uncompressed (active) segment, where offset is
+the byte offset in the file; for a compressed segment it is the offset
+of the gzip member and offset is the position inside that block.
+Entries of a discarded (aborted) write keep their line with length 0,
+so index line numbers never shift; their bytes are dropped when the
+segment is compressed.
+
+manifest.json lists segments with their period and run ids, so locating
+a run only reads the manifest and that run's segment index; an
+employee's records are looked up within one run or one period.
+
+Several writers (CLI, daemon, app, parallel runner) may share the log.
+Each batch is appended under an exclusive lock on manifest.lock that
+also covers segment allocation, rollover and the manifest update, and
+the manifest is re-read under that lock, so writers never reuse a
+segment number, write at stale offsets or drop each other's entries.
+"""
+
+import gzip
+import json
+import os
+import threading
+import zlib
+
+try:
+    import fcntl
+except ImportError:     # not available on Windows
+    fcntl = None
+
+AUDIT_LOG_DIR = "data/audit_log"
+SEGMENT_MAX_BYTES = 64 * 1024 * 1024
+BLOCK_SIZE = 64 * 1024
+
+_MANIFEST = "manifest.json"
+_LOCK = "manifest.lock"
+
+
+class SegmentedAuditLog:
+    """
+    Append-only, segmented JSONL log with a (run, employee) → offset index.
+    """
+
+    def __init__(self, directory=AUDIT_LOG_DIR, max_bytes=SEGMENT_MAX_BYTES,
+                 compress=True):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.compress = compress
+
+        self._name = None           # segment the open files belong to
+        self._data = None
+        self._index = None
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._lock_fd = None
+
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = self._load_manifest()
+
+    # -----------------------------
+    # Manifest
+    # -----------------------------
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _load_manifest(self):
+        path = self._path(_MANIFEST)
+        if not os.path.exists(path):
+            return {"next_segment": 1, "segments": []}
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _save_manifest(self):
+        tmp = self._path(_MANIFEST + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=1)
+        os.replace(tmp, self._path(_MANIFEST))
+
+    def refresh(self):
+        """
+        Re-reads the manifest (picks up other writers' segments and runs).
+        """
+        with self._lock:
+            self.manifest = self._load_manifest()
+
+    def locked(self):
+        """
+        Exclusive, re-entrant hold on the log across processes; the
+        manifest is re-read on entry.
+        """
+        return _ManifestLock(self)
+
+    # -----------------------------
+    # Writing
+    # -----------------------------
+    def _new_segment(self, period):
+        seq = self.manifest["next_segment"]
+        self.manifest["next_segment"] = seq + 1
+
+        segment = {
+            "name": f"payroll_audit_detail.{seq:06d}",
+            "period": period,
+            "compressed": False,
+            "runs": [],
+            "records": 0,
+        }
+        self.manifest["segments"].append(segment)
+        return segment
+
+    def _segment_for(self, period, size):
+        """
+        Active segment for `size` more bytes of `period`: the last
+        segment when it is still uncompressed, of the same period and
+        has room; otherwise the last one is compressed and a new one
+        started. Called under the lock.
+        """
+        segments = self.manifest["segments"]
+        last = segments[-1] if segments else None
+
+        if last is not None and not last["compressed"]:
+            used = self._segment_size(last)
+            if last["period"] == period and (not used or used + size <= self.max_bytes):
+                return last
+            if self.compress:
+                self._close_files()
+                self._compress_segment(last)
+
+        return self._new_segment(period)
+
+    def _segment_size(self, segment):
+        path = self._path(segment["name"] + ".jsonl")
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def _open_files(self, segment):
+        if self._name != segment["name"]:
+            self._close_files()
+            self._data = open(self._path(segment["name"] + ".jsonl"), "ab")
+            self._index = open(self._path(segment["name"] + ".idx"), "a", encoding="utf-8")
+            self._name = segment["name"]
+
+    def write_batch(self, entries):
+        """
+        entries: iterable of (payroll_run_id, employee_id, payroll_period, line)
+        where line is one JSON record without the trailing newline.
+        Returns [(segment name, first index line, line count)] for the
+        entries written, in order.
+        """
+        groups = []     # consecutive entries of one period
+        for run_id, employee_id, period, line in entries:
+            data = (line + "\n").encode("utf-8")
+            if not groups or groups[-1][0] != period:
+                groups.append((period, []))
+            groups[-1][1].append((run_id, employee_id, data))
+
+        written = []
+        if not groups:
+            return written
+
+        with self.locked():
+            for period, rows in groups:
+                while rows:
+                    segment = self._segment_for(period, len(rows[0][2]))
+                    rows = self._append(segment, rows, written)
+            self._save_manifest()
+
+        return written
+
+    def _append(self, segment, rows, written):
+        """
+        Appends as many rows as fit in `segment`; returns the rest.
+        """
+        self._open_files(segment)
+        offset = os.fstat(self._data.fileno()).st_size
+
+        chunk, index_lines = [], []
+        for i, (run_id, employee_id, data) in enumerate(rows):
+            if chunk and offset + len(data) > self.max_bytes:
+                rows = rows[i:]
+                break
+            index_lines.append(f"{run_id}\t{employee_id}\t-1\t{offset}\t{len(data)}\n")
+            chunk.append(data)
+            offset += len(data)
+            if run_id not in segment["runs"]:
+                segment["runs"].append(run_id)
+        else:
+            rows = []
+
+        # Flushed before the lock is released: the next writer appends after us
+        self._data.write(b"".join(chunk))
+        self._index.write("".join(index_lines))
+        self._data.flush()
+        self._index.flush()
+
+        written.append((segment["name"], segment["records"], len(chunk)))
+        segment["records"] += len(chunk)
+        return rows
+
+    def sync(self):
+        """
+        Flushes and fsyncs the open segment and its index (the
+        manifest is replaced atomically after every batch).
+        """
+        if self._data is not None:
+            for f in (self._data, self._index):
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _close_files(self):
+        if self._data is not None:
+            self._data.close()
+            self._index.close()
+        self._data = None
+        self._index = None
+        self._name = None
+
+    def close(self):
+        self.sync()
+        self._close_files()
+
+    def discard(self, written):
+        """
+        Makes entries written by write_batch unreachable (an aborted
+        run): their index lines get length 0 and the segments' run
+        lists are rebuilt from the remaining entries.
+        """
+        lines = {}
+        for name, first, count in written:
+            lines.setdefault(name, set()).update(range(first, first + count))
+        if not lines:
+            return
+
+        with self.locked():
+            for segment in self.manifest["segments"]:
+                dropped = lines.get(segment["name"])
+                if not dropped:
+                    continue
+
+                # Rewritten in place: other writers' append handles stay valid
+                with open(self._path(segment["name"] + ".idx"), "r+", encoding="utf-8") as f:
+                    entries = f.read().splitlines(keepends=True)
+                    for i in dropped:
+                        if i < len(entries):
+                            head = entries[i].rsplit("\t", 1)[0]
+                            entries[i] = head + "\t0\n"
+                    f.seek(0)
+                    f.write("".join(entries))
+                    f.truncate()
+
+                live = self._read_index(segment)
+                segment["runs"] = list(dict.fromkeys(e[0] for e in live))
+
+            self._save_manifest()
+
+    # -----------------------------
+    # Compression
+    # -----------------------------
+    def _compress_segment(self, segment):
+        """
+        Rewrites a closed segment as independent gzip blocks and
+        rebases its index onto (block_offset, offset in block).
+        """
+        name = segment["name"]
+        plain_path = self._path(name + ".jsonl")
+        entries = self._read_index(segment, discarded=True)
+
+        with open(plain_path, "rb") as src, \
+                open(self._path(name + ".jsonl.gz.tmp"), "wb") as dst, \
+                open(self._path(name + ".idx.tmp"), "w", encoding="utf-8") as idx:
+
+            block, block_entries = [], []
+            block_len = 0
+
+            def flush_block():
+                block_offset = dst.tell()
+                dst.write(gzip.compress(b"".join(block)))
+                for run_id, employee_id, offset, length in block_entries:
+                    idx.write(f"{run_id}\t{employee_id}\t{block_offset}\t{offset}\t{length}\n")
+
+            for run_id, employee_id, _, offset, length in entries:
+                if not length:
+                    # Discarded: keeps its index line, not its bytes
+                    block_entries.append((run_id, employee_id, 0, 0))
+                    continue
+
+                src.seek(offset)
+                data = src.read(length)
+
+                if block and block_len + length > BLOCK_SIZE:
+                    flush_block()
+                    block, block_entries, block_len = [], [], 0
+
+                block_entries.append((run_id, employee_id, block_len, length))
+                block.append(data)
+                block_len += length
+
+            if block_entries:
+                flush_block()
+
+        os.replace(self._path(name + ".jsonl.gz.tmp"), self._path(name + ".jsonl.gz"))
+        os.replace(self._path(name + ".idx.tmp"), self._path(name + ".idx"))
+        os.remove(plain_path)
+
+        segment["compressed"] = True
+        self._save_manifest()
+
+    # -----------------------------
+    # Reading
+    # -----------------------------
+    def _read_index(self, segment, discarded=False):
+        entries = []
+        path = self._path(segment["name"] + ".idx")
+        if not os.path.exists(path):
+            return entries
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                run_id, employee_id, block, offset, length = line.rstrip("\n").split("\t")
+                if int(length) or discarded:
+                    entries.append((run_id, employee_id, int(block), int(offset), int(length)))
+        return entries
+
+    def _read_records(self, segment, entries):
+        """
+        Reads the given index entries of one segment, decompressing
+        each needed block once.
+        """
+        if not segment["compressed"]:
+            with open(self._path(segment["name"] + ".jsonl"), "rb") as f:
+                for _, _, _, offset, length in entries:
+                    f.seek(offset)
+                    yield json.loads(f.read(length))
+            return
+
+        with open(self._path(segment["name"] + ".jsonl.gz"), "rb") as f:
+            cached_offset, cached_block = None, None
+            for _, _, block_offset, offset, length in entries:
+                if block_offset != cached_offset:
+                    cached_block = self._read_block(f, block_offset)
+                    cached_offset = block_offset
+                yield json.loads(cached_block[offset:offset + length])
+
+    @staticmethod
+    def _read_block(f, block_offset):
+        f.seek(block_offset)
+        decoder = zlib.decompressobj(wbits=31)
+        out = []
+        while not decoder.eof:
+            raw = f.read(BLOCK_SIZE)
+            if not raw:
+                break
+            out.append(decoder.decompress(raw))
+        return b"".join(out)
+
+    def segments_for_run(self, payroll_run_id):
+        return [s for s in self.manifest["segments"] if payroll_run_id in s["runs"]]
+
+    def segments_for_period(self, payroll_period):
+        return [s for s in self.manifest["segments"] if s["period"] == payroll_period]
+
+    def read_run(self, payroll_run_id):
+        """
+        All records of one run, in write order.
+        """
+        self.refresh()
+        for segment in self.segments_for_run(payroll_run_id):
+            entries = [e for e in self._read_index(segment) if e[0] == payroll_run_id]
+            yield from self._read_records(segment, entries)
+
+    def read_employee(self, employee_id, payroll_run_id=None, payroll_period=None):
+        """
+        Records of one employee within one run or one period, oldest
+        first. Only that run's / period's segment indexes are scanned.
+        """
+        if payroll_run_id is None and payroll_period is None:
+            raise ValueError("read_employee needs a payroll_run_id or a payroll_period")
+
+        self.refresh()
+        employee_id = str(employee_id)
+        segments = (
+            self.segments_for_run(payroll_run_id)
+            if payroll_run_id is not None
+            else self.segments_for_period(payroll_period)
+        )
+        for segment in segments:
+            if payroll_period is not None and segment["period"] != payroll_period:
+                continue
+            entries = [
+                e for e in self._read_index(segment)
+                if e[1] == employee_id and (payroll_run_id is None or e[0] == payroll_run_id)
+            ]
+            if entries:
+                yield from self._read_records(segment, entries)
+
+    def latest_run_id(self):
+        self.refresh()
+        for segment in reversed(self.manifest["segments"]):
+            if segment["runs"]:
+                return segment["runs"][-1]
+        return None
+
+    def tail_latest_run(self):
+        """
+        Records of the most recently written run.
+        """
+        run_id = self.latest_run_id()
+        if run_id is None:
+            return iter(())
+        return self.read_run(run_id)
+
+    def iter_records(self):
+        """
+        Every record in the log, oldest first (full scan).
+        """
+        self.refresh()
+        for segment in self.manifest["segments"]:
+            yield from self._read_records(segment, self._read_index(segment))
+
+
+class _ManifestLock:
+    """
+    Re-entrant: thread lock + advisory lock on manifest.lock (where
+    fcntl exists), taken once per outermost block; the manifest is
+    re-read on entry.
+    """
+
+    def __init__(self, log):
+        self.log = log
+
+    def __enter__(self):
+        log = self.log
+        log._lock.acquire()
+        if log._lock_depth == 0:
+            if fcntl is not None:
+                log._lock_fd = os.open(log._path(_LOCK), os.O_RDWR | os.O_CREAT, 0o644)
+                fcntl.flock(log._lock_fd, fcntl.LOCK_EX)
+            log.manifest = log._load_manifest()
+        log._lock_depth += 1
+        return log
+
+    def __exit__(self, exc_type, exc, tb):
+        log = self.log
+        log._lock_depth -= 1
+        if log._lock_depth == 0 and log._lock_fd is not None:
+            fcntl.flock(log._lock_fd, fcntl.LOCK_UN)
+            os.close(log._lock_fd)
+            log._lock_fd = None
+        log._lock.release()
@@ -0,0 +1,371 @@
+# utils/audit_store.py
+
+"""
+Indexed, queryable payroll audit store (SQLite).
+
+Every audit record is stored once, keyed by payroll_run_id, period and
+employee_id, with the full JSON record alongside the summary columns.
+A small payroll_runs table keeps per-run totals so run listings never
+scan the records.
+
+Records of a run in progress are committed batch by batch, tagged with
+the writer's pending token, so no write transaction spans a run and
+concurrent runs (app sessions, the worker, the CLI) do not lock each
+other out. Queries only see published records (pending IS NULL);
+publish() makes a run's records visible, discard() deletes them.
+"""
+
+import csv
+import io
+import json
+import os
+import sqlite3
+import uuid
+
+AUDIT_DB_PATH = "data/payroll_audit.db"
+
+SUMMARY_COLUMNS = [
+    "payroll_run_id",
+    "payroll_period",
+    "employee_id",
+    "gross_salary",
+    "net_salary",
+    "validation_issue_count",
+    "anomaly_count",
+    "execution_timestamp",
+]
+
+RECORD_COLUMNS = SUMMARY_COLUMNS + ["record"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS audit_records (
+    payroll_run_id          TEXT NOT NULL,
+    payroll_period          TEXT NOT NULL,
+    employee_id             TEXT NOT NULL,
+    gross_salary            REAL,
+    net_salary              REAL,
+    validation_issue_count  INTEGER NOT NULL DEFAULT 0,
+    anomaly_count           INTEGER NOT NULL DEFAULT 0,
+    execution_timestamp     TEXT,
+    record                  TEXT NOT NULL,
+    pending                 TEXT
+);
+
+CREATE INDEX IF NOT EXISTS ix_audit_run
+    ON audit_records (payroll_run_id, employee_id);
+CREATE INDEX IF NOT EXISTS ix_audit_period
+    ON audit_records (payroll_period, payroll_run_id);
+CREATE INDEX IF NOT EXISTS ix_audit_employee
+    ON audit_records (employee_id, execution_timestamp);
+
+CREATE TABLE IF NOT EXISTS payroll_runs (
+    payroll_run_id          TEXT PRIMARY KEY,
+    payroll_period          TEXT NOT NULL,
+    employee_count          INTEGER NOT NULL,
+    validation_issue_count  INTEGER NOT NULL,
+    anomaly_count           INTEGER NOT NULL,
+    first_timestamp         TEXT,
+    last_timestamp          TEXT
+);
+
+CREATE INDEX IF NOT EXISTS ix_runs_period
+    ON payroll_runs (payroll_period);
+
+CREATE TABLE IF NOT EXISTS employee_fingerprints (
+    payroll_period          TEXT NOT NULL,
+    employee_id             TEXT NOT NULL,
+    fingerprint             TEXT NOT NULL,
+    payroll_run_id          TEXT NOT NULL,
+    PRIMARY KEY (payroll_period, employee_id)
+);
+"""
+
+# Created after _migrate (stores from before the pending column)
+_PENDING_INDEX = """
+CREATE INDEX IF NOT EXISTS ix_audit_pending
+    ON audit_records (pending) WHERE pending IS NOT NULL;
+"""
+
+
+def summary_row(record: dict) -> tuple:
+    """
+    Store row for one serialized audit record.
+    """
+    return (
+        record["payroll_run_id"],
+        record["payroll_period"],
+        str(record["employee_id"]),
+        record.get("gross_salary", 0),
+        record.get("net_salary", 0),
+        len(record.get("validation_issues", [])),
+        len(record.get("anomalies", [])),
+        record.get("execution_timestamp"),
+        json.dumps(record),
+    )
+
+
+class AuditStore:
+    """
+    Query API over the audit database.
+    Iterators stream rows from the cursor, so exports stay
+    memory-bounded regardless of history size.
+    """
+
+    def __init__(self, path=AUDIT_DB_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+        # Writes may come from the audit writer's background thread
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(_SCHEMA)
+        self._migrate()
+        self.conn.executescript(_PENDING_INDEX)
+
+    def _migrate(self):
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(audit_records)")}
+        if "pending" not in columns:
+            self.conn.execute("ALTER TABLE audit_records ADD COLUMN pending TEXT")
+            self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+    # -----------------------------
+    # Writing
+    # -----------------------------
+    @staticmethod
+    def new_pending():
+        """
+        Token tagging one writer's unpublished records.
+        """
+        return uuid.uuid4().hex
+
+    def insert_rows(self, rows, pending=None):
+        """
+        Inserts rows built by summary_row() and commits. With a pending
+        token the rows stay invisible to queries until publish(pending).
+        """
+        self.conn.executemany(
+            f"INSERT INTO audit_records ({', '.join(RECORD_COLUMNS)}, pending) "
+            f"VALUES ({', '.join('?' * (len(RECORD_COLUMNS) + 1))})",
+            (row + (pending,) for row in rows)
+        )
+        self.conn.commit()
+
+    def publish(self, pending, run_ids):
+        """
+        Makes the records inserted under `pending` visible and refreshes
+        their runs' totals, in one transaction.
+        """
+        self.conn.execute(
+            "UPDATE audit_records SET pending = NULL WHERE pending = ?", (pending,)
+        )
+        self.refresh_runs(run_ids)
+
+    def discard(self, pending):
+        """
+        Deletes the records inserted under `pending` (an aborted run).
+        """
+        self.conn.execute("DELETE FROM audit_records WHERE pending = ?", (pending,))
+        self.conn.commit()
+
+    def refresh_runs(self, run_ids):
+        """
+        Recomputes per-run totals and commits.
+        """
+        for run_id in run_ids:
+            self.conn.execute(
+                """
+                INSERT OR REPLACE INTO payroll_runs
+                SELECT payroll_run_id, payroll_period, COUNT(*),
+                       SUM(validation_issue_count > 0), SUM(anomaly_count > 0),
+                       MIN(execution_timestamp), MAX(execution_timestamp)
+                FROM audit_records
+                WHERE payroll_run_id = ? AND pending IS NULL
+                GROUP BY payroll_run_id, payroll_period
+                """,
+                (run_id,)
+            )
+        self.conn.commit()
+
+    def import_jsonl(self, path, batch_size=5000):
+        """
+        One-off migration of an existing audit JSONL into the store.
+        Lines that are not payroll audit records are skipped; records
+        already in the store are not de-duplicated.
+        Returns the number of records imported.
+        """
+        run_ids = set()
+        batch = []
+        imported = 0
+        pending = self.new_pending()
+
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    row = summary_row(json.loads(line))
+                except (ValueError, KeyError, TypeError):
+                    continue
+
+                run_ids.add(row[0])
+                batch.append(row)
+
+                if len(batch) >= batch_size:
+                    self.insert_rows(batch, pending)
+                    imported += len(batch)
+                    batch = []
+
+        self.insert_rows(batch, pending)
+        imported += len(batch)
+        self.publish(pending, run_ids)
+        return imported
+
+    def save_fingerprints(self, payroll_period, rows):
+        """
+        Records (employee_id, fingerprint, payroll_run_id) as the latest
+        computation of each employee in the period, and commits.
+        """
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO employee_fingerprints VALUES (?, ?, ?, ?)",
+            [(payroll_period, str(emp), fp, run_id) for emp, fp, run_id in rows]
+        )
+        self.conn.commit()
+
+    # -----------------------------
+    # Queries
+    # -----------------------------
+    def fingerprints(self, payroll_period):
+        """
+        employee_id → (fingerprint, payroll_run_id) for one period.
+        """
+        cursor = self.conn.execute(
+            "SELECT employee_id, fingerprint, payroll_run_id "
+            "FROM employee_fingerprints WHERE payroll_period = ?",
+            (payroll_period,)
+        )
+        return {employee_id: (fp, run_id) for employee_id, fp, run_id in cursor}
+
+    def latest_records(self, payroll_run_id, employee_ids, chunk_size=500):
+        """
+        employee_id → latest full audit record within one run.
+        """
+        records = {}
+        employee_ids = [str(e) for e in employee_ids]
+
+        for start in range(0, len(employee_ids), chunk_size):
+            chunk = employee_ids[start:start + chunk_size]
+            cursor = self.conn.execute(
+                "SELECT employee_id, record FROM audit_records "
+                f"WHERE payroll_run_id = ? AND employee_id IN ({', '.join('?' * len(chunk))}) "
+                "AND pending IS NULL ORDER BY rowid",
+                (payroll_run_id, *chunk)
+            )
+            for employee_id, record in cursor:
+                records[employee_id] = json.loads(record)
+
+        return records
+
+    def records_for_run(self, payroll_run_id):
+        """
+        Full audit records for one run, in employee order.
+        """
+        cursor = self.conn.execute(
+            "SELECT record FROM audit_records WHERE payroll_run_id = ? "
+            "AND pending IS NULL ORDER BY employee_id",
+            (payroll_run_id,)
+        )
+        for (record,) in cursor:
+            yield json.loads(record)
+
+    def employee_history(self, employee_id):
+        """
+        Summary rows for one employee across all runs, oldest first.
+        """
+        cursor = self.conn.execute(
+            f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM audit_records "
+            "WHERE employee_id = ? AND pending IS NULL ORDER BY execution_timestamp",
+            (str(employee_id),)
+        )
+        for row in cursor:
+            yield dict(zip(SUMMARY_COLUMNS, row))
+
+    def list_runs(self, payroll_period=None):
+        """
+        Per-run totals, newest first.
+        """
+        query = "SELECT * FROM payroll_runs"
+        params = ()
+        if payroll_period is not None:
+            query += " WHERE payroll_period = ?"
+            params = (payroll_period,)
+        query += " ORDER BY last_timestamp DESC"
+
+        cursor = self.conn.execute(query, params)
+        columns = [d[0] for d in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+    def runs_with_anomalies(self):
+        """
+        Runs where at least one employee was flagged as an anomaly.
+        """
+        return [run for run in self.list_runs() if run["anomaly_count"] > 0]
+
+    # -----------------------------
+    # Export
+    # -----------------------------
+    def iter_summary(self, payroll_run_id=None, payroll_period=None,
+                     employee_id=None, anomalies_only=False):
+        """
+        Filtered summary rows (tuples in SUMMARY_COLUMNS order).
+        payroll_run_id may be one run id or a list of them.
+        """
+        clauses, params = ["pending IS NULL"], []
+
+        if isinstance(payroll_run_id, (list, tuple, set)):
+            clauses.append(f"payroll_run_id IN ({', '.join('?' * len(payroll_run_id))})")
+            params.extend(payroll_run_id)
+        elif payroll_run_id is not None:
+            clauses.append("payroll_run_id = ?")
+            params.append(payroll_run_id)
+        if payroll_period is not None:
+            clauses.append("payroll_period = ?")
+            params.append(payroll_period)
+        if employee_id is not None:
+            clauses.append("employee_id = ?")
+            params.append(str(employee_id))
+        if anomalies_only:
+            clauses.append("anomaly_count > 0")
+
+        query = f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM audit_records"
+        query += " WHERE " + " AND ".join(clauses)
+        query += " ORDER BY rowid"
+
+        return self.conn.execute(query, params)
+
+    def export_csv(self, out=None, chunk_size=10000, **filters):
+        """
+        Writes the filtered summary as CSV to `out` (file object) in chunks.
+        Without `out`, returns the CSV text (use filters to bound it).
+        """
+        buffer = io.StringIO() if out is None else out
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(SUMMARY_COLUMNS)
+
+        cursor = self.iter_summary(**filters)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            writer.writerows(rows)
+
+        if out is None:
+            return buffer.getvalue()
+        return None
@@ -1,7 +1,263 @@
+import hashlib
+import io
+import os
+
+import numpy as np
 import pandas as pd
 
-def load_payroll_data(path: str) -> pd.DataFrame:
+DEFAULT_CHUNK_SIZE = 50_000
+
+SNAPSHOT_DIR = "data/.snapshots"
+SNAPSHOT_FORMAT = 1
+
+# Snapshot cache bounds: least recently used snapshots are evicted
+SNAPSHOT_MAX_FILES = 16
+SNAPSHOT_MAX_BYTES = 1024 * 1024 * 1024
+
+# ===============================
+# Payroll Schema
+# ===============================
+ID_COLUMNS = ["employee_id"]
+MONTH_COLUMNS = ["month"]
+CATEGORY_COLUMNS = ["state"]
+AMOUNT_COLUMNS = [
+    "gross_salary",
+    "net_salary",
+    "basic",
+    "hra",
+    "allowances",
+    "bonus",
+    "incentive",
+    "tax",
+    "insurance",
+]
+
+COMPONENT_COLUMNS = ["basic", "hra", "allowances"]
+
+AMOUNT_DTYPES = ("float64", "float32", "int32")
+ID_DTYPES = ("category", "str")
+
+
+def validate_payroll_columns(columns):
+    """
+    Payroll input needs employee_id plus either salary components
+    or gross_salary.
+    """
+    columns = set(columns)
+    missing = [c for c in ID_COLUMNS if c not in columns]
+
+    if missing:
+        raise ValueError(f"Payroll data is missing required columns: {', '.join(missing)}")
+
+    if "gross_salary" not in columns and not all(c in columns for c in COMPONENT_COLUMNS):
+        raise ValueError(
+            "Payroll data must contain either salary components "
+            "or gross_salary column"
+        )
+
+
+def apply_payroll_schema(df, amount_dtype="float64", id_dtype="category", parse_month=True):
+    """
+    Casts a raw payroll frame to the explicit payroll schema:
+    categorical (or str) IDs, fixed-width amounts, month as a monthly Period.
+    Columns outside the schema are left as pandas inferred them.
+    """
+    if amount_dtype not in AMOUNT_DTYPES:
+        raise ValueError(f"amount_dtype must be one of {', '.join(AMOUNT_DTYPES)}")
+    if id_dtype not in ID_DTYPES:
+        raise ValueError(f"id_dtype must be one of {', '.join(ID_DTYPES)}")
+
+    validate_payroll_columns(df.columns)
+
+    df = df.copy()
+
+    for col in ID_COLUMNS:
+        df[col] = df[col].astype(str).astype(id_dtype)
+
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+
+    if parse_month:
+        for col in MONTH_COLUMNS:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col].astype(str)).dt.to_period("M")
+
+    for col in AMOUNT_COLUMNS:
+        if col not in df.columns:
+            continue
+
+        values = pd.to_numeric(df[col])
+
+        if amount_dtype == "int32":
+            if values.isna().any() or not np.all(np.mod(values, 1) == 0):
+                raise ValueError(f"Column {col} has non-integral amounts; use a float amount_dtype")
+
+        df[col] = values.astype(amount_dtype)
+
+    return df
+
+
+# ===============================
+# Columnar Snapshots (.npz)
+# ===============================
+def content_hash(source):
+    """
+    SHA-256 of a file (path) or raw bytes.
+    """
+    h = hashlib.sha256()
+    if isinstance(source, (bytes, bytearray)):
+        h.update(source)
+        return h.hexdigest()
+
+    with open(source, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _snapshot_path(source_hash, options, snapshot_dir):
+    key = hashlib.sha256(
+        f"{source_hash}|{SNAPSHOT_FORMAT}|{sorted(options.items())}".encode()
+    ).hexdigest()[:32]
+    return os.path.join(snapshot_dir, f"{key}.npz")
+
+
+def _save_snapshot(df, path):
+    arrays = {"__columns__": np.array(list(df.columns), dtype=str)}
+    kinds = []
+
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        key = f"c{i}"
+
+        if isinstance(series.dtype, pd.PeriodDtype):
+            kinds.append("period")    # schema periods are always monthly
+            arrays[key] = series.array.asi8
+            continue
+
+        if not isinstance(series.dtype, pd.CategoricalDtype) and not pd.api.types.is_numeric_dtype(series):
+            # Text columns are stored dictionary-encoded
+            series = series.astype("category")
+            kinds.append("text")
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            kinds.append("category")
+        else:
+            kinds.append("numeric")
+            arrays[key] = series.to_numpy()
+            continue
+
+        arrays[key] = series.cat.codes.to_numpy()
+        arrays[key + "_categories"] = series.cat.categories.to_numpy(dtype=str)
+
+    arrays["__kinds__"] = np.array(kinds, dtype=str)
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp, path)
+
+
+def _prune_snapshots(snapshot_dir, keep=None, max_files=SNAPSHOT_MAX_FILES,
+                     max_bytes=SNAPSHOT_MAX_BYTES):
+    """
+    Evicts least recently used snapshots (by mtime; loads touch it)
+    until at most max_files remain and they total at most max_bytes.
+    `keep` (the snapshot just saved) is never evicted.
+    """
+    snapshots = []
+    for entry in os.scandir(snapshot_dir):
+        if entry.is_file() and entry.name.endswith(".npz"):
+            stat = entry.stat()
+            snapshots.append((stat.st_mtime, stat.st_size, entry.path))
+
+    snapshots.sort(reverse=True)        # newest first
+    keep = os.path.abspath(keep) if keep else None
+    count, total = 0, 0
+
+    for _, size, path in snapshots:
+        count += 1
+        total += size
+        if (count > max_files or total > max_bytes) and os.path.abspath(path) != keep:
+            try:
+                os.remove(path)
+            except FileNotFoundError:   # evicted by another process
+                pass
+            count -= 1
+            total -= size
+
+
+def _load_snapshot(path):
+    columns = {}
+
+    with np.load(path, allow_pickle=False) as data:
+        for i, (col, kind) in enumerate(zip(data["__columns__"].tolist(), data["__kinds__"].tolist())):
+            key = f"c{i}"
+
+            if kind == "period":
+                columns[col] = pd.Series(pd.PeriodIndex.from_ordinals(data[key], freq="M"))
+            elif kind == "numeric":
+                columns[col] = data[key]
+            else:
+                series = pd.Categorical.from_codes(data[key], categories=data[key + "_categories"])
+                columns[col] = series if kind == "category" else pd.Series(series).astype(object)
+
+    return pd.DataFrame(columns)
+
+
+# ===============================
+# Loaders
+# ===============================
+def load_payroll_data(source, amount_dtype="float64", id_dtype="category",
+                      parse_month=True, snapshot=True, snapshot_dir=SNAPSHOT_DIR) -> pd.DataFrame:
+    """
+    Loads payroll CSV data (path, raw bytes or file-like) into a typed DataFrame.
+    With snapshot=True the typed frame is cached as a columnar .npz keyed
+    by the file's content hash and the schema options, so re-loading an
+    unchanged file skips CSV parsing entirely. The cache keeps the
+    SNAPSHOT_MAX_FILES most recently used snapshots (SNAPSHOT_MAX_BYTES
+    in total).
+    """
+    if hasattr(source, "read"):
+        # File-like (e.g. Streamlit UploadedFile)
+        source = source.read()
+
+    options = {
+        "amount_dtype": amount_dtype,
+        "id_dtype": id_dtype,
+        "parse_month": parse_month,
+    }
+
+    path = None
+    if snapshot:
+        path = _snapshot_path(content_hash(source), options, snapshot_dir)
+        if os.path.exists(path):
+            os.utime(path)      # most recently used
+            return _load_snapshot(path)
+
+    raw = pd.read_csv(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+    df = apply_payroll_schema(raw, **options)
+
+    if path is not None:
+        _save_snapshot(df, path)
+        _prune_snapshots(snapshot_dir, keep=path)
+
+    return df
+
+
+def iter_payroll_chunks(path: str, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                        amount_dtype="float64", parse_month=True):
     """
-    Loads payroll CSV data into a DataFrame.
+    Streams payroll CSV data as typed DataFrames of at most chunk_size rows.
+    Only one chunk is held in memory at a time. IDs stay plain strings,
+    since categories would differ from chunk to chunk.
     """
-    return pd.read_csv(path)
+    with pd.read_csv(path, chunksize=chunk_size) as reader:
+        for chunk in reader:
+            yield apply_payroll_schema(
+                chunk,
+                amount_dtype=amount_dtype,
+                id_dtype="str",
+                parse_month=parse_month
+            )
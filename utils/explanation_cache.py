@@ -0,0 +1,106 @@
+# utils/explanation_cache.py
+
+"""
+Explanation template cache.
+
+Templates are keyed by (backend name, issue signature). An in-memory
+LRU serves repeated signatures within and across runs; an optional
+SQLite file keeps them across processes, so a model backend is only
+asked once per distinct issue shape.
+"""
+
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+EXPLANATION_CACHE_PATH = "data/explanation_cache.db"
+DEFAULT_MAX_ENTRIES = 4096
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS explanation_templates (
+    backend     TEXT NOT NULL,
+    signature   TEXT NOT NULL,
+    template    TEXT NOT NULL,
+    PRIMARY KEY (backend, signature)
+);
+"""
+
+
+class ExplanationCache:
+    """
+    LRU of explanation templates, optionally backed by SQLite (path).
+    """
+
+    def __init__(self, path=None, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+        self.hits = 0
+        self.misses = 0
+
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.executescript(_SCHEMA)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_many(self, backend, signatures):
+        """
+        signature → template for the signatures already cached.
+        """
+        found, missing = {}, []
+
+        with self._lock:
+            for signature in signatures:
+                template = self._entries.get((backend, signature))
+                if template is None:
+                    missing.append(signature)
+                else:
+                    self._entries.move_to_end((backend, signature))
+                    found[signature] = template
+
+            if missing and self._conn is not None:
+                for start in range(0, len(missing), 500):
+                    chunk = missing[start:start + 500]
+                    cursor = self._conn.execute(
+                        "SELECT signature, template FROM explanation_templates "
+                        f"WHERE backend = ? AND signature IN ({', '.join('?' * len(chunk))})",
+                        (backend, *chunk)
+                    )
+                    for signature, template in cursor:
+                        found[signature] = template
+                        self._remember(backend, signature, template)
+
+            self.hits += len(found)
+            self.misses += len(signatures) - len(found)
+
+        return found
+
+    def put_many(self, backend, templates):
+        with self._lock:
+            for signature, template in templates.items():
+                self._remember(backend, signature, template)
+
+            if self._conn is not None and templates:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO explanation_templates VALUES (?, ?, ?)",
+                    [(backend, signature, template) for signature, template in templates.items()]
+                )
+                self._conn.commit()
+
+    def _remember(self, backend, signature, template):
+        self._entries[(backend, signature)] = template
+        self._entries.move_to_end((backend, signature))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,149 @@
+# utils/explanation_stub_server.py
+
+"""
+Local stand-in for a chat-completions explanation endpoint.
+
+Answers POST /v1/chat/completions the way HTTPExplanationBackend expects
+(one template per issue signature, built from the listed placeholders),
+with optional latency and a scripted number of failed requests (429 by
+default, or any status such as 503), and counts the requests and issues
+it served. Lets the model backend, batching, rate limiting and retries
+be exercised without network access or API keys.
+
+    python -m utils.explanation_stub_server --port 8765
+    python main.py --explanation-url http://127.0.0.1:8765/v1/chat/completions
+
+    with StubExplanationServer() as server:
+        backend = HTTPExplanationBackend(url=server.url)
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CHAT_PATH = "/v1/chat/completions"
+
+
+def stub_template(issue):
+    placeholders = " ".join(f"{name}={{{name}}}" for name in issue["placeholders"])
+    return f"[{issue['issue_type']}] {placeholders}"
+
+
+class StubExplanationServer:
+    """
+    ThreadingHTTPServer on 127.0.0.1 (port 0 = any free port), run in a
+    background thread while the context is open.
+    """
+
+    def __init__(self, port=0, latency=0.0, fail_first=0, fail_status=429):
+        self.latency = latency
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+
+        self.requests = 0
+        self.issues = 0
+        self.max_in_flight = 0
+
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{CHAT_PATH}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                if self.path != CHAT_PATH:
+                    return self._reply(404, {"error": "not found"})
+
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length))
+
+                with stub._lock:
+                    stub.requests += 1
+                    failed = stub.requests <= stub.fail_first
+                    stub._in_flight += 1
+                    stub.max_in_flight = max(stub.max_in_flight, stub._in_flight)
+
+                try:
+                    if failed:
+                        return self._reply(stub.fail_status, {"error": "scripted failure"})
+
+                    time.sleep(stub.latency)
+                    issues = json.loads(payload["messages"][-1]["content"])["issues"]
+                    with stub._lock:
+                        stub.issues += len(issues)
+
+                    templates = {issue["signature"]: stub_template(issue) for issue in issues}
+                    return self._reply(200, {
+                        "model": payload.get("model"),
+                        "choices": [{
+                            "index": 0,
+                            "message": {
+                                "role": "assistant",
+                                "content": json.dumps({"templates": templates}),
+                            },
+                            "finish_reason": "stop",
+                        }],
+                    })
+                finally:
+                    with stub._lock:
+                        stub._in_flight -= 1
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stub explanation endpoint")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per request")
+    args = parser.parse_args(argv)
+
+    server = StubExplanationServer(port=args.port, latency=args.latency)
+    print(f"Serving {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,442 @@
+# utils/historical_baseline.py
+
+"""
+Per-employee historical salary baseline used by anomaly detection.
+
+Holds, for every employee seen in history:
+- last_gross   : gross salary of the latest closed month
+- median_gross : median gross over the last `window` months
+- month_count  : number of distinct months seen
+- last_month   : latest closed month ("YYYY-MM")
+
+The index is built once per period from the historical CSVs (and
+optionally the audit JSONL), stored as a compact .npz file and updated
+incrementally when a new period closes.
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from utils.audit_segments import SegmentedAuditLog
+from utils.data_loader import load_payroll_data
+
+BASELINE_PATH = "data/historical_baseline.npz"
+DEFAULT_WINDOW = 6
+
+
+def _to_month(values):
+    """
+    Normalizes a month column (str, Period or datetime) to "YYYY-MM" strings.
+    """
+    return pd.PeriodIndex(pd.to_datetime(values.astype(str)), freq="M").astype(str)
+
+
+def _sources_signature(paths, before_month=None):
+    """
+    Changes whenever a source changes. A segmented audit log directory
+    is signed by its files (appends do not touch the directory's own
+    mtime), so new segments and appended records invalidate the cache.
+    """
+    h = hashlib.sha1(str(before_month).encode())
+    for path in paths:
+        if os.path.isdir(path):
+            entries = sorted(os.scandir(path), key=lambda e: e.name)
+            files = [(e.name, e.stat()) for e in entries if e.is_file()]
+        else:
+            files = [("", os.stat(path))]
+        h.update(os.path.abspath(path).encode())
+        for name, stat in files:
+            h.update(f"|{name}|{stat.st_size}|{stat.st_mtime_ns}".encode())
+    return h.hexdigest()
+
+
+def _signed_sources(historical_paths, audit_path, closed_runs):
+    """
+    Sources whose content the cached index depends on. Closed runs are
+    signed by the run ids themselves (their records do not change), so
+    later runs appended to the audit log do not invalidate the cache.
+    """
+    sources = list(historical_paths)
+    if audit_path is not None and closed_runs is None and os.path.exists(audit_path):
+        sources.append(audit_path)
+    return sources
+
+
+def _iter_audit_records(audit_path, run_ids=None):
+    if os.path.isdir(audit_path):
+        log = SegmentedAuditLog(audit_path)
+        if run_ids is None:
+            yield from log.iter_records()
+        else:
+            # Indexed: only the segments holding these runs are read
+            for run_id in sorted(run_ids):
+                yield from log.read_run(run_id)
+        return
+
+    with open(audit_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if run_ids is None or record.get("payroll_run_id") in run_ids:
+                yield record
+
+
+def read_audit_history(audit_path, before_month=None, run_ids=None, excluded=None):
+    """
+    Extracts (employee_id, month, gross_salary) from the audit log.
+    Only records for months strictly before `before_month` are kept,
+    so an open period never feeds its own baseline; with run_ids, only
+    the records of those (closed) runs. excluded: {payroll_run_id:
+    employee_ids} left out (e.g. employees rejected in a closed run).
+    audit_path may be a JSONL file or a segmented audit log directory.
+    Lines that are not payroll audit records are skipped.
+    """
+    rows = []
+
+    if not os.path.exists(audit_path):
+        return pd.DataFrame(columns=["employee_id", "month", "gross_salary"])
+
+    if run_ids is not None:
+        run_ids = set(run_ids)
+    excluded = {run_id: set(map(str, ids)) for run_id, ids in (excluded or {}).items()}
+
+    for record in _iter_audit_records(audit_path, run_ids):
+        try:
+            if str(record["employee_id"]) in excluded.get(record["payroll_run_id"], ()):
+                continue
+            rows.append((
+                record["employee_id"],
+                record["payroll_period"],
+                float(record["gross_salary"])
+            ))
+        except (KeyError, TypeError, ValueError):
+            continue
+
+    audit_df = pd.DataFrame(rows, columns=["employee_id", "month", "gross_salary"])
+
+    if audit_df.empty:
+        return audit_df
+
+    audit_df["month"] = pd.to_datetime(
+        audit_df["month"], format="%B %Y"
+    ).dt.strftime("%Y-%m")
+
+    if before_month is not None:
+        audit_df = audit_df[audit_df["month"] < before_month]
+
+    return audit_df
+
+
+class HistoricalBaseline:
+    """
+    Compact per-employee baseline with O(1) lookups and
+    vectorized joins against a payroll frame.
+    """
+
+    def __init__(self, employee_ids, last_gross, median_gross, month_count,
+                 last_month, recent, signature=None, closed_runs=()):
+        """
+        signature: of the sources the index was built from.
+        closed_runs: finalised payroll runs folded in from the audit log.
+        """
+        self.employee_ids = np.asarray(employee_ids, dtype=str)
+        self.last_gross = np.asarray(last_gross, dtype=float)
+        self.median_gross = np.asarray(median_gross, dtype=float)
+        self.month_count = np.asarray(month_count, dtype=np.int32)
+        self.last_month = np.asarray(last_month, dtype=str)
+        self.recent = np.asarray(recent, dtype=float)   # (employees × window), oldest → newest
+        self.signature = signature
+        self.closed_runs = tuple(sorted(closed_runs))
+
+        self._index = pd.Index(self.employee_ids)
+        self._positions = {emp: i for i, emp in enumerate(self.employee_ids)}
+
+    # -----------------------------
+    # Construction
+    # -----------------------------
+    @classmethod
+    def from_frame(cls, history_df, window=DEFAULT_WINDOW, signature=None, closed_runs=()):
+        """
+        Builds the index from a long frame of (employee_id, month, gross_salary).
+        Several rows for the same employee and month keep the last one;
+        without a month column, file order is taken as chronological.
+        """
+        if "month" in history_df.columns:
+            months = _to_month(history_df["month"])
+        else:
+            # No month column: file order is the chronology
+            months = [f"{i:012d}" for i in range(len(history_df))]
+
+        history = pd.DataFrame({
+            "employee_id": history_df["employee_id"].astype(str).to_numpy(),
+            "month": months,
+            "gross_salary": history_df["gross_salary"].to_numpy(dtype=float)
+        })
+
+        history = (
+            history
+            .drop_duplicates(["employee_id", "month"], keep="last")
+            .sort_values(["employee_id", "month"], kind="stable")
+        )
+
+        grouped = history.groupby("employee_id", sort=True)
+        employee_ids = grouped.size().index.to_numpy(dtype=str)
+        month_count = grouped.size().to_numpy()
+
+        # Newest `window` months per employee, right-aligned into a matrix
+        history["pos_from_end"] = grouped.cumcount(ascending=False)
+        tail = history[history["pos_from_end"] < window]
+
+        recent = np.full((len(employee_ids), window), np.nan)
+        rows = np.searchsorted(employee_ids, tail["employee_id"].to_numpy(dtype=str))
+        cols = window - 1 - tail["pos_from_end"].to_numpy()
+        recent[rows, cols] = tail["gross_salary"].to_numpy()
+
+        last = grouped.tail(1)
+
+        return cls(
+            employee_ids=employee_ids,
+            last_gross=last["gross_salary"].to_numpy(),
+            median_gross=cls._median(recent),
+            month_count=month_count,
+            last_month=last["month"].to_numpy(dtype=str),
+            recent=recent,
+            signature=signature,
+            closed_runs=closed_runs
+        )
+
+    @classmethod
+    def build(cls, historical_paths, audit_path=None, before_month=None,
+              window=DEFAULT_WINDOW, closed_runs=None, excluded=None):
+        """
+        Builds the index from historical CSV files and, optionally,
+        periods recorded in the audit log: every record before
+        `before_month`, or only the runs listed in closed_runs, less
+        the `excluded` employees of each run (see read_audit_history).
+        """
+        frames = []
+        for path in historical_paths:
+            history_df = load_payroll_data(path)
+            frames.append(history_df[[
+                c for c in ("employee_id", "month", "gross_salary") if c in history_df.columns
+            ]])
+
+        if audit_path is not None:
+            frames.append(read_audit_history(audit_path, before_month, closed_runs, excluded))
+
+        return cls.from_frame(
+            pd.concat(frames, ignore_index=True),
+            window=window,
+            signature=_sources_signature(
+                _signed_sources(historical_paths, audit_path, closed_runs), before_month
+            ),
+            closed_runs=closed_runs or ()
+        )
+
+    @classmethod
+    def load_or_build(cls, historical_paths, audit_path=None, before_month=None,
+                      window=DEFAULT_WINDOW, cache_path=BASELINE_PATH, closed_runs=None,
+                      excluded=None):
+        """
+        Loads the cached index when its sources are unchanged, otherwise
+        rebuilds and saves it.
+
+        With closed_runs (finalised payroll_run_ids, e.g.
+        PayrollApprovalAgent.closed_runs()), the audit log contributes
+        those runs only, without their `excluded` employees
+        (PayrollApprovalAgent.excluded_employees()). Runs finalised since
+        the cache was saved are folded in with update() instead of
+        rebuilding the whole index.
+        """
+        signature = _sources_signature(
+            _signed_sources(historical_paths, audit_path, closed_runs), before_month
+        )
+
+        if os.path.exists(cache_path):
+            cached = cls.load(cache_path)
+            if cached.signature == signature and cached.window == window:
+                closed = set(closed_runs or ())
+                if closed == set(cached.closed_runs):
+                    return cached
+
+                if set(cached.closed_runs) <= closed:
+                    baseline = cached.close_runs(
+                        audit_path, closed - set(cached.closed_runs), excluded
+                    )
+                    if baseline is not None:
+                        baseline.save(cache_path)
+                        return baseline
+
+        baseline = cls.build(
+            historical_paths, audit_path, before_month, window, closed_runs, excluded
+        )
+        baseline.save(cache_path)
+        return baseline
+
+    # -----------------------------
+    # Persistence (.npz)
+    # -----------------------------
+    def save(self, path=BASELINE_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "wb") as f:
+            np.savez_compressed(
+                f,
+                employee_ids=self.employee_ids,
+                last_gross=self.last_gross,
+                median_gross=self.median_gross,
+                month_count=self.month_count,
+                last_month=self.last_month,
+                recent=self.recent,
+                signature=np.array(self.signature or ""),
+                closed_runs=np.array(self.closed_runs, dtype=str)
+            )
+
+    @classmethod
+    def load(cls, path=BASELINE_PATH):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(
+                employee_ids=data["employee_ids"],
+                last_gross=data["last_gross"],
+                median_gross=data["median_gross"],
+                month_count=data["month_count"],
+                last_month=data["last_month"],
+                recent=data["recent"],
+                signature=str(data["signature"]) or None,
+                closed_runs=data["closed_runs"].tolist() if "closed_runs" in data else ()
+            )
+
+    # -----------------------------
+    # Incremental update
+    # -----------------------------
+    def update(self, period_df, month):
+        """
+        Folds a closed period into the index.
+        period_df: employee_id + gross_salary for that month.
+        Re-applying the same month replaces its values instead of
+        counting it twice. Returns a new HistoricalBaseline.
+        """
+        month = str(pd.Period(month, freq="M"))
+        period = (
+            pd.DataFrame({
+                "employee_id": period_df["employee_id"].astype(str).to_numpy(),
+                "gross_salary": period_df["gross_salary"].to_numpy(dtype=float)
+            })
+            .drop_duplicates("employee_id", keep="last")
+        )
+
+        new_ids = np.setdiff1d(period["employee_id"].to_numpy(dtype=str), self.employee_ids)
+        employee_ids = np.concatenate([self.employee_ids, new_ids])
+        extra = len(new_ids)
+
+        last_gross = np.concatenate([self.last_gross, np.full(extra, np.nan)])
+        month_count = np.concatenate([self.month_count, np.zeros(extra, dtype=np.int32)])
+        last_month = np.concatenate([self.last_month, np.full(extra, "")]).astype(str)
+        recent = np.vstack([self.recent, np.full((extra, self.window), np.nan)])
+
+        pos = pd.Index(employee_ids).get_indexer(period["employee_id"])
+        gross = period["gross_salary"].to_numpy()
+
+        same_month = last_month[pos] == month
+        advance = pos[~same_month]
+
+        recent[advance] = np.roll(recent[advance], -1, axis=1)
+        month_count[advance] += 1
+        last_month[advance] = month
+
+        recent[pos, -1] = gross
+        last_gross[pos] = gross
+
+        return HistoricalBaseline(
+            employee_ids=employee_ids,
+            last_gross=last_gross,
+            median_gross=self._median(recent),
+            month_count=month_count,
+            last_month=last_month,
+            recent=recent,
+            signature=None
+        )
+
+    def close_runs(self, audit_path, run_ids, excluded=None):
+        """
+        Folds finalised runs (read from the audit log, less their
+        `excluded` employees) into the index, oldest period first.
+        Returns a new HistoricalBaseline, or None when a run is older
+        than months already in the index (update() only moves forward;
+        rebuild instead).
+        """
+        history = (
+            read_audit_history(audit_path, run_ids=run_ids, excluded=excluded)
+            if audit_path else None
+        )
+        if history is None or history.empty:
+            return None
+
+        months = sorted(history["month"].unique())
+        if months[0] < max(self.last_month.tolist(), default=""):
+            return None
+
+        baseline = self
+        for month in months:
+            baseline = baseline.update(history[history["month"] == month], month)
+
+        baseline.signature = self.signature
+        baseline.closed_runs = tuple(sorted(set(self.closed_runs) | set(run_ids)))
+        return baseline
+
+    # -----------------------------
+    # Lookups
+    # -----------------------------
+    @property
+    def window(self):
+        return self.recent.shape[1]
+
+    def __len__(self):
+        return len(self.employee_ids)
+
+    def __contains__(self, employee_id):
+        return employee_id in self._positions
+
+    def get(self, employee_id):
+        """
+        O(1) lookup; None when the employee has no history.
+        """
+        i = self._positions.get(str(employee_id))
+        if i is None:
+            return None
+        return {
+            "last_gross": float(self.last_gross[i]),
+            "median_gross": float(self.median_gross[i]),
+            "month_count": int(self.month_count[i]),
+            "last_month": str(self.last_month[i])
+        }
+
+    def join(self, employee_ids):
+        """
+        Vectorized lookup for a column of employee ids.
+        Returns a DataFrame aligned on the input order; employees
+        without history get NaN / 0.
+        """
+        employee_ids = pd.Series(employee_ids).astype(str)
+        pos = self._index.get_indexer(employee_ids)
+        found = pos >= 0
+        safe = np.where(found, pos, 0)
+
+        return pd.DataFrame({
+            "last_gross": np.where(found, self.last_gross[safe], np.nan),
+            "median_gross": np.where(found, self.median_gross[safe], np.nan),
+            "month_count": np.where(found, self.month_count[safe], 0)
+        })
+
+    @staticmethod
+    def _median(recent):
+        median = np.full(len(recent), np.nan)
+        has_data = ~np.isnan(recent).all(axis=1)
+        if has_data.any():
+            median[has_data] = np.nanmedian(recent[has_data], axis=1)
+        return median
@@ -0,0 +1,29 @@
+# utils/payroll_report.py
+
+"""
+CSV payroll report: one row per employee, shared by the command line
+(main.py) and the payroll worker (workflows/payroll_daemon.py).
+"""
+
+REPORT_COLUMNS = [
+    "employee_id",
+    "gross_salary",
+    "total_deductions",
+    "net_salary",
+    "validation_issue_count",
+    "anomaly_count",
+]
+
+
+def report_rows(results):
+    """
+    REPORT_COLUMNS rows, read straight from the result columns.
+    """
+    return zip(
+        results.employee_id.tolist(),
+        results.gross_salary.tolist(),
+        results.total_deductions.tolist(),
+        results.net_salary.tolist(),
+        results.validation_issue_count.tolist(),
+        results.anomaly_count.tolist(),
+    )
@@ -0,0 +1,196 @@
+# utils/payslip_export.py
+
+"""
+Bulk payslip export.
+
+All payslips of a run are built as one long-format frame
+(employee_id, Section, Component, Amount) in a single vectorized pass,
+then written as one CSV per employee into a ZIP archive. Chunks of
+employees are rendered to CSV on a thread pool while the archive is
+written in employee order.
+
+Archive entries are <period>/salary_slip_<employee_id>.csv (period as
+YYYY-MM), so a multi-period run keeps every month's slip. Characters
+unsafe in file names are replaced, with a hash of the original id
+appended so distinct ids never share an entry.
+"""
+
+import hashlib
+import io
+import re
+import zipfile
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from utils.result_set import PayrollResultSet
+
+VARIABLE_PAY_COMPONENTS = ("Bonus", "Incentive")
+SLIP_COLUMNS = ["Section", "Component", "Amount"]
+
+SUMMARY_COMPONENTS = [
+    ("gross_salary", "Gross Salary"),
+    ("total_deductions", "Total Deductions"),
+    ("net_salary", "Net Salary"),
+]
+
+DEFAULT_CHUNK_SIZE = 2000
+
+
+def _amounts(wide):
+    return wide.apply(pd.to_numeric, errors="coerce").fillna(0.0).to_numpy(dtype="float64")
+
+
+def _section(wide, present, section_order, section):
+    """
+    Long rows for one section; `present` marks which components each
+    employee actually has.
+    """
+    rows, cols = np.nonzero(present)
+    return pd.DataFrame({
+        "_row": rows,
+        "_section": section_order,
+        "_component": cols,
+        "Section": section,
+        "Component": wide.columns.to_numpy(dtype=object)[cols],
+        "Amount": _amounts(wide)[rows, cols],
+    })
+
+
+def _payslip_rows(results):
+    if isinstance(results, PayrollResultSet):
+        # Columnar results: components are already one column each
+        employee_ids = results.employee_id.astype(str)
+        earnings = results.earnings
+        deductions = results.deductions
+        summary = pd.DataFrame(
+            {label: getattr(results, field) for field, label in SUMMARY_COMPONENTS}
+        )
+    else:
+        employee_ids = np.array([str(r["employee_id"]) for r in results], dtype=object)
+        earnings = pd.DataFrame.from_records([r["earnings"] for r in results])
+        deductions = pd.DataFrame.from_records([r["deductions"] for r in results])
+        summary = pd.DataFrame(
+            {label: [r[field] for r in results] for field, label in SUMMARY_COMPONENTS}
+        )
+
+    is_variable = earnings.columns.isin(VARIABLE_PAY_COMPONENTS)
+    fixed = earnings.loc[:, ~is_variable]
+    variable = earnings.loc[:, is_variable]
+
+    parts = [
+        _section(fixed, fixed.notna().to_numpy(), 0, "Earnings"),
+        _section(variable, variable.notna().to_numpy(), 1, "Variable Pay"),
+        _section(deductions, deductions.notna().to_numpy(), 2, "Deductions"),
+        _section(summary, np.ones(summary.shape, dtype=bool), 3, "Summary"),
+    ]
+    long_df = pd.concat(parts, ignore_index=True)
+
+    order = np.lexsort((
+        long_df["_component"].to_numpy(),
+        long_df["_section"].to_numpy(),
+        long_df["_row"].to_numpy(),
+    ))
+    long_df = long_df.iloc[order].reset_index(drop=True)
+
+    long_df.insert(0, "employee_id", employee_ids[long_df["_row"].to_numpy()])
+    return long_df
+
+
+def payslip_frame(results):
+    """
+    Payslip rows for every result, grouped by employee (in result order)
+    and, within an employee, Earnings / Variable Pay / Deductions / Summary.
+    """
+    return _payslip_rows(results).drop(columns=["_row", "_section", "_component"])
+
+
+def generate_salary_slip_df(result):
+    """
+    Payslip of a single employee (Section, Component, Amount).
+    """
+    return payslip_frame([result])[SLIP_COLUMNS]
+
+
+def _safe_name(value):
+    text = str(value)
+    safe = re.sub(r"[^A-Za-z0-9_.-]", "_", text)
+    if safe != text:
+        # E/1 and E_1 must not map to the same entry
+        safe = f"{safe}-{hashlib.sha1(text.encode('utf-8')).hexdigest()[:8]}"
+    return safe
+
+
+def _period_folder(payroll_period):
+    try:
+        return datetime.strptime(str(payroll_period), "%B %Y").strftime("%Y-%m")
+    except ValueError:
+        return _safe_name(payroll_period)
+
+
+def _slip_filename(employee_id, payroll_period=None):
+    name = f"salary_slip_{_safe_name(employee_id)}.csv"
+    if payroll_period is None:
+        return name
+    return f"{_period_folder(payroll_period)}/{name}"
+
+
+def _periods(results):
+    if isinstance(results, PayrollResultSet):
+        return results.payroll_period
+    return [r.get("payroll_period") for r in results]
+
+
+def _render_chunk(results):
+    """
+    (filename, csv bytes) per employee of one chunk, from a single
+    to_csv call split back at employee boundaries.
+    """
+    long_df = _payslip_rows(results)
+
+    header = ",".join(SLIP_COLUMNS) + "\n"
+    lines = long_df[SLIP_COLUMNS].to_csv(index=False, header=False).splitlines(keepends=True)
+
+    rows = long_df["_row"].to_numpy()
+    employee_ids = long_df["employee_id"].to_numpy()
+    periods = _periods(results)
+    starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+    stops = np.r_[starts[1:], len(rows)]
+
+    return [
+        (
+            _slip_filename(employee_ids[start], periods[rows[start]]),
+            (header + "".join(lines[start:stop])).encode("utf-8")
+        )
+        for start, stop in zip(starts, stops)
+    ]
+
+
+def write_payslip_archive(results, out=None, workers=4, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Writes one payslip CSV per employee and period into a ZIP archive at
+    `out` (path or binary file object). Without `out`, returns the
+    archive bytes. An employee listed twice in a period gets numbered
+    entries (salary_slip_E001-2.csv, ...).
+    """
+    buffer = io.BytesIO() if out is None else out
+    chunks = [results[i:i + chunk_size] for i in range(0, len(results), chunk_size)]
+    seen = set()
+
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive, \
+            ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        # map() yields chunks in submission order, so the archive is ordered
+        for files in pool.map(_render_chunk, chunks):
+            for name, data in files:
+                base, count = name[:-len(".csv")], 1
+                while name in seen:
+                    count += 1
+                    name = f"{base}-{count}.csv"
+                seen.add(name)
+                archive.writestr(name, data)
+
+    if out is None:
+        return buffer.getvalue()
+    return None
@@ -0,0 +1,407 @@
+# utils/result_set.py
+
+"""
+Columnar payroll results.
+
+PayrollResultSet holds a batch run's results as columns instead of one
+nested dict per employee:
+
+- employee_id / run / period / approval status : object arrays
+- gross_salary / total_deductions / net_salary : float arrays
+- earnings / deductions                        : one DataFrame column per component
+- validation_issues / anomalies                : sparse {position: [issues]}
+  (most employees have none)
+- explanation                                  : list (None until explained)
+- pay_date                                     : datetime64[D] array, or None
+  when the input had no month column
+
+Summary metrics, reports and the audit writer read the columns
+directly. Where a per-employee dict is expected (payslip view, console
+report, explanations) results[i] / iteration yields PayrollResultRecord
+views: __slots__ mappings with the same keys and values as the dict
+returned by PayrollWorkflow.run().
+"""
+
+import operator
+from collections.abc import MutableMapping
+
+import numpy as np
+import pandas as pd
+
+RESULT_FIELDS = (
+    "employee_id",
+    "payroll_run_id",
+    "payroll_period",
+    "approval_status",
+    "gross_salary",
+    "total_deductions",
+    "net_salary",
+    "earnings",
+    "deductions",
+    "validation_issues",
+    "anomalies",
+    "explanation",
+)
+
+LABEL_FIELDS = ("employee_id", "payroll_run_id", "payroll_period", "approval_status")
+AMOUNT_FIELDS = ("gross_salary", "total_deductions", "net_salary")
+COMPONENT_FIELDS = ("earnings", "deductions")
+ISSUE_FIELDS = ("validation_issues", "anomalies")
+
+# Employees whose audit payloads are built at a time (the audit writer's
+# default flush size)
+AUDIT_WINDOW = 1000
+
+
+def _native(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+def _labels(values, n):
+    if isinstance(values, str) or np.ndim(values) == 0:
+        return np.full(n, values, dtype=object)
+    column = np.empty(n, dtype=object)
+    column[:] = list(values)
+    return column
+
+
+def _sparse(per_row):
+    if per_row is None:
+        return {}
+    if isinstance(per_row, dict):
+        return per_row
+    return {i: issues for i, issues in enumerate(per_row) if issues}
+
+
+class PayrollResultRecord(MutableMapping):
+    """
+    Dict-style view of one employee in a PayrollResultSet.
+    """
+
+    __slots__ = ("_results", "_position")
+
+    def __init__(self, results, position):
+        self._results = results
+        self._position = position
+
+    def __getitem__(self, key):
+        return self._results._get(self._position, key)
+
+    def __setitem__(self, key, value):
+        self._results._set(self._position, key, value)
+
+    def __delitem__(self, key):
+        raise TypeError("payroll result fields cannot be removed")
+
+    def __iter__(self):
+        return iter(RESULT_FIELDS)
+
+    def __len__(self):
+        return len(RESULT_FIELDS)
+
+    def __repr__(self):
+        return f"PayrollResultRecord({dict(self)!r})"
+
+
+class PayrollResultSet:
+    """
+    Results of one batch (or chunk) of employees, in input row order.
+    """
+
+    def __init__(self, employee_id, payroll_run_id, payroll_period, approval_status,
+                 gross_salary, total_deductions, net_salary, earnings, deductions,
+                 validation_issues=None, anomalies=None, explanation=None, absent=None,
+                 pay_date=None):
+        """
+        Label arguments may be scalars (same value for every employee).
+        validation_issues / anomalies: one list per row, or sparse
+        {position: list}. absent: {(field, component): row mask} of
+        components an employee's record does not have. pay_date: the
+        per-row pay dates the deductions were computed for.
+        """
+        n = len(employee_id)
+
+        self.employee_id = _labels(employee_id, n)
+        self.payroll_run_id = _labels(payroll_run_id, n)
+        self.payroll_period = _labels(payroll_period, n)
+        self.approval_status = _labels(approval_status, n)
+
+        self.gross_salary = np.asarray(gross_salary, dtype=float)
+        self.total_deductions = np.asarray(total_deductions, dtype=float)
+        self.net_salary = np.asarray(net_salary, dtype=float)
+
+        self.earnings = earnings.reset_index(drop=True)
+        self.deductions = deductions.reset_index(drop=True)
+
+        self.validation_issues = _sparse(validation_issues)
+        self.anomalies = _sparse(anomalies)
+        self.explanation = list(explanation) if explanation is not None else [None] * n
+        self.pay_date = np.asarray(pay_date, dtype="datetime64[D]") if pay_date is not None else None
+
+        self._absent = absent or {}
+        self._component_arrays = {}
+
+    # -----------------------------
+    # Construction
+    # -----------------------------
+    @classmethod
+    def from_records(cls, records):
+        """
+        Builds a set from run() shaped dicts (e.g. stored audit records).
+        """
+        records = list(records)
+        frames, absent = {}, {}
+
+        for field in COMPONENT_FIELDS:
+            frame = pd.DataFrame.from_records([r[field] for r in records])
+            frames[field] = frame
+            for component in frame.columns:
+                mask = np.array([component not in r[field] for r in records], dtype=bool)
+                if mask.any():
+                    absent[(field, component)] = mask
+
+        return cls(
+            **{field: [r[field] for r in records] for field in LABEL_FIELDS + AMOUNT_FIELDS},
+            earnings=frames["earnings"],
+            deductions=frames["deductions"],
+            validation_issues=[r["validation_issues"] for r in records],
+            anomalies=[r["anomalies"] for r in records],
+            explanation=[r.get("explanation") for r in records],
+            absent=absent
+        )
+
+    @classmethod
+    def concat(cls, result_sets):
+        """
+        One set with the rows of every set, in order. Pay dates of sets
+        without them are NaT.
+        """
+        result_sets = list(result_sets)
+        offsets = np.cumsum([0] + [len(s) for s in result_sets])
+
+        frames, absent = {}, {}
+        for field in COMPONENT_FIELDS:
+            parts = [getattr(s, field) for s in result_sets]
+            frame = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+            frames[field] = frame
+
+            for component in frame.columns:
+                mask = np.concatenate([
+                    s._absent.get((field, component), np.zeros(len(s), dtype=bool))
+                    if component in part.columns
+                    else np.ones(len(s), dtype=bool)
+                    for s, part in zip(result_sets, parts)
+                ]) if result_sets else np.zeros(0, dtype=bool)
+                if mask.any():
+                    absent[(field, component)] = mask
+
+        def merged(field):
+            return {
+                offset + i: issues
+                for s, offset in zip(result_sets, offsets)
+                for i, issues in getattr(s, field).items()
+            }
+
+        pay_date = None
+        if any(s.pay_date is not None for s in result_sets):
+            pay_date = np.concatenate([
+                s.pay_date if s.pay_date is not None
+                else np.full(len(s), np.datetime64("NaT"), dtype="datetime64[D]")
+                for s in result_sets
+            ])
+
+        return cls(
+            **{
+                field: np.concatenate([getattr(s, field) for s in result_sets])
+                if result_sets else []
+                for field in LABEL_FIELDS + AMOUNT_FIELDS
+            },
+            earnings=frames["earnings"],
+            deductions=frames["deductions"],
+            validation_issues=merged("validation_issues"),
+            anomalies=merged("anomalies"),
+            explanation=[e for s in result_sets for e in s.explanation],
+            absent=absent,
+            pay_date=pay_date
+        )
+
+    def take(self, positions):
+        """
+        New set with the given rows, in the given order.
+        """
+        positions = np.asarray(positions, dtype=np.int64)
+        new_position = {int(old): new for new, old in enumerate(positions)}
+
+        def remapped(sparse):
+            return {
+                new_position[i]: issues
+                for i, issues in sparse.items()
+                if i in new_position
+            }
+
+        return PayrollResultSet(
+            **{field: getattr(self, field)[positions] for field in LABEL_FIELDS + AMOUNT_FIELDS},
+            earnings=self.earnings.iloc[positions],
+            deductions=self.deductions.iloc[positions],
+            validation_issues=remapped(self.validation_issues),
+            anomalies=remapped(self.anomalies),
+            explanation=[self.explanation[i] for i in positions],
+            absent={key: mask[positions] for key, mask in self._absent.items()},
+            pay_date=self.pay_date[positions] if self.pay_date is not None else None
+        )
+
+    # -----------------------------
+    # Sequence / record views
+    # -----------------------------
+    def __len__(self):
+        return len(self.employee_id)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(np.arange(len(self))[index])
+
+        position = operator.index(index)
+        if position < 0:
+            position += len(self)
+        if not 0 <= position < len(self):
+            raise IndexError("payroll result index out of range")
+        return PayrollResultRecord(self, position)
+
+    def __iter__(self):
+        for position in range(len(self)):
+            yield PayrollResultRecord(self, position)
+
+    def to_records(self):
+        """
+        Plain dicts, as returned by PayrollWorkflow.run().
+        """
+        return [dict(record) for record in self]
+
+    def _components(self, field):
+        arrays = self._component_arrays.get(field)
+        if arrays is None:
+            frame = getattr(self, field)
+            arrays = self._component_arrays[field] = [
+                (component, frame[component].to_numpy(), self._absent.get((field, component)))
+                for component in frame.columns
+            ]
+        return arrays
+
+    def _component_dict(self, field, position):
+        return {
+            component: _native(values[position])
+            for component, values, absent in self._components(field)
+            if absent is None or not absent[position]
+        }
+
+    def _get(self, position, key):
+        if key in COMPONENT_FIELDS:
+            return self._component_dict(key, position)
+        if key in ISSUE_FIELDS:
+            return getattr(self, key).get(position, [])
+        if key == "explanation":
+            return self.explanation[position]
+        if key in LABEL_FIELDS or key in AMOUNT_FIELDS:
+            return _native(getattr(self, key)[position])
+        raise KeyError(key)
+
+    def _set(self, position, key, value):
+        if key in ISSUE_FIELDS:
+            if value:
+                getattr(self, key)[position] = value
+            else:
+                getattr(self, key).pop(position, None)
+        elif key == "explanation":
+            self.explanation[position] = value
+        elif key in LABEL_FIELDS or key in AMOUNT_FIELDS:
+            getattr(self, key)[position] = value
+        elif key in COMPONENT_FIELDS:
+            raise TypeError(f"{key} are read-only; build a new PayrollResultSet instead")
+        else:
+            raise KeyError(key)
+
+    # -----------------------------
+    # Columns
+    # -----------------------------
+    def issue_counts(self, field="validation_issues"):
+        counts = np.zeros(len(self), dtype=np.int64)
+        for position, issues in getattr(self, field).items():
+            counts[position] = len(issues)
+        return counts
+
+    @property
+    def validation_issue_count(self):
+        return self.issue_counts("validation_issues")
+
+    @property
+    def anomaly_count(self):
+        return self.issue_counts("anomalies")
+
+    def component_total(self, field, components):
+        """
+        Sum of the given components over every employee (missing → 0).
+        """
+        frame = getattr(self, field)
+        present = [c for c in components if c in frame.columns]
+        if not present:
+            return 0.0
+        values = frame[present].apply(pd.to_numeric, errors="coerce").fillna(0.0)
+        return float(values.to_numpy(dtype=float).sum())
+
+    def absent_mask(self, field, component):
+        """
+        Rows whose record has no such component (None if all have it).
+        """
+        return self._absent.get((field, component))
+
+    def run_ids(self):
+        return sorted(set(self.payroll_run_id.tolist()))
+
+    def summary_frame(self):
+        """
+        One flat row per employee: labels, amounts and issue counts.
+        """
+        return pd.DataFrame({
+            **{field: getattr(self, field) for field in LABEL_FIELDS + AMOUNT_FIELDS},
+            "validation_issue_count": self.validation_issue_count,
+            "anomaly_count": self.anomaly_count,
+        })
+
+    def audit_payloads(self, window=AUDIT_WINDOW):
+        """
+        Audit payload dicts (see workflows.payroll_workflow.audit_payload),
+        built from the columns without going through record views.
+        Component dicts are built `window` employees at a time, so a
+        consumer writing in batches holds one window, not the whole run.
+        """
+        for start in range(0, len(self), window):
+            stop = min(start + window, len(self))
+            columns = {field: getattr(self, field)[start:stop].tolist() for field in LABEL_FIELDS}
+            gross = self.gross_salary[start:stop].tolist()
+            net = self.net_salary[start:stop].tolist()
+            earnings = self._component_rows("earnings", start, stop)
+            deductions = self._component_rows("deductions", start, stop)
+
+            for j in range(stop - start):
+                i = start + j
+                yield {
+                    "payroll_run_id": columns["payroll_run_id"][j],
+                    "payroll_period": columns["payroll_period"][j],
+                    "execution_status": "SUCCESS",
+                    "approval_status": columns["approval_status"][j],
+                    "employee_id": columns["employee_id"][j],
+                    "earnings": earnings[j],
+                    "deductions": deductions[j],
+                    "gross_salary": gross[j],
+                    "net_salary": net[j],
+                    "validation_issues": self.validation_issues.get(i, []),
+                    "anomalies": self.anomalies.get(i, [])
+                }
+
+    def _component_rows(self, field, start, stop):
+        rows = getattr(self, field).iloc[start:stop].to_dict("records")
+        for (section, component), mask in self._absent.items():
+            if section == field:
+                for j in np.flatnonzero(mask[start:stop]):
+                    rows[j].pop(component, None)
+        return rows
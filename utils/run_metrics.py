@@ -0,0 +1,203 @@
+# utils/run_metrics.py
+
+"""
+Per-run payroll instrumentation.
+
+RunMetrics accumulates, per stage, wall time, CPU time, calls and rows
+processed, plus run-level counters (employees, flagged employees, audit
+records and bytes). Streaming runs call the same stages once per chunk,
+so everything is summed per payroll_run_id.
+
+Optional capture modes:
+- "tracemalloc": peak traced memory per stage
+- "cprofile"   : a cProfile of the whole run, dumped as .pstats
+
+Exports: metrics JSON and a Prometheus text-format file (suitable for
+the node_exporter textfile collector).
+"""
+
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+METRICS_DIR = "data/metrics"
+PROFILE_MODES = (None, "tracemalloc", "cprofile")
+
+_PROM_STAGE_METRICS = [
+    ("seconds", "payroll_stage_seconds", "Wall time spent in a payroll stage"),
+    ("cpu_seconds", "payroll_stage_cpu_seconds", "CPU time spent in a payroll stage"),
+    ("rows", "payroll_stage_rows", "Rows processed by a payroll stage"),
+    ("calls", "payroll_stage_calls", "Times a payroll stage ran"),
+    ("peak_bytes", "payroll_stage_peak_bytes", "Peak traced memory of a payroll stage"),
+]
+
+
+class RunMetrics:
+    """
+    Stage timings and counters for one payroll_run_id.
+
+    Usage:
+        metrics = RunMetrics(run_id)
+        with metrics.run():
+            with metrics.stage("compliance", rows=len(df)):
+                ...
+            metrics.count("employees", len(df))
+    """
+
+    def __init__(self, payroll_run_id, profile=None):
+        if profile not in PROFILE_MODES:
+            raise ValueError(f"profile must be one of {', '.join(str(m) for m in PROFILE_MODES)}")
+
+        self.payroll_run_id = payroll_run_id
+        self.profile = profile
+        self.stages = {}
+        self.counters = {}
+        self.run_seconds = 0.0
+        self.runs = 0
+
+        self._profiler = cProfile.Profile() if profile == "cprofile" else None
+
+    # -----------------------------
+    # Recording
+    # -----------------------------
+    @contextmanager
+    def run(self):
+        """
+        Wraps one workflow call (run_batch / run_stream / ...).
+        """
+        if self._profiler is not None:
+            self._profiler.enable()
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.run_seconds += time.perf_counter() - start
+            self.runs += 1
+            if self._profiler is not None:
+                self._profiler.disable()
+
+    @contextmanager
+    def stage(self, name, rows=None):
+        stats = self.stages.setdefault(name, {
+            "seconds": 0.0,
+            "cpu_seconds": 0.0,
+            "calls": 0,
+            "rows": 0,
+        })
+
+        tracing = self.profile == "tracemalloc"
+        started_tracing = tracing and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if tracing:
+            tracemalloc.reset_peak()
+
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield stats
+        finally:
+            stats["seconds"] += time.perf_counter() - wall
+            stats["cpu_seconds"] += time.process_time() - cpu
+            stats["calls"] += 1
+            if rows is not None:
+                stats["rows"] += rows
+
+            if tracing:
+                peak = tracemalloc.get_traced_memory()[1]
+                stats["peak_bytes"] = max(stats.get("peak_bytes", 0), peak)
+            if started_tracing:
+                tracemalloc.stop()
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def merge(self, stages, counters):
+        """
+        Adds stage stats and counters recorded elsewhere (e.g. by the
+        worker processes of a sharded run): times, calls and rows are
+        summed, peaks take the maximum.
+        """
+        for name, stats in stages.items():
+            total = self.stages.setdefault(name, {
+                "seconds": 0.0,
+                "cpu_seconds": 0.0,
+                "calls": 0,
+                "rows": 0,
+            })
+            for key, value in stats.items():
+                if key == "peak_bytes":
+                    total[key] = max(total.get(key, 0), value)
+                else:
+                    total[key] = total.get(key, 0) + value
+
+        for name, value in counters.items():
+            self.count(name, value)
+
+    # -----------------------------
+    # Export
+    # -----------------------------
+    def to_dict(self):
+        return {
+            "payroll_run_id": self.payroll_run_id,
+            "runs": self.runs,
+            "run_seconds": self.run_seconds,
+            "stages": self.stages,
+            "counters": self.counters,
+        }
+
+    def to_prometheus(self):
+        """
+        Prometheus text exposition format, one series per stage / counter.
+        """
+        run = self.payroll_run_id.replace("\\", "\\\\").replace('"', '\\"')
+        lines = []
+
+        for key, metric, help_text in _PROM_STAGE_METRICS:
+            samples = [
+                (name, stats[key]) for name, stats in self.stages.items() if key in stats
+            ]
+            if not samples:
+                continue
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} gauge")
+            for name, value in samples:
+                lines.append(f'{metric}{{payroll_run_id="{run}",stage="{name}"}} {value}')
+
+        lines.append("# HELP payroll_run_seconds Wall time of the payroll run")
+        lines.append("# TYPE payroll_run_seconds gauge")
+        lines.append(f'payroll_run_seconds{{payroll_run_id="{run}"}} {self.run_seconds}')
+
+        for name, value in sorted(self.counters.items()):
+            metric = f"payroll_{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f'{metric}{{payroll_run_id="{run}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory=METRICS_DIR):
+        """
+        Writes <run_id>.json and <run_id>.prom (and <run_id>.pstats in
+        cprofile mode) under `directory`. Returns the written paths.
+        """
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.payroll_run_id)
+        paths = [base + ".json", base + ".prom"]
+
+        _write_atomic(paths[0], json.dumps(self.to_dict(), indent=2))
+        _write_atomic(paths[1], self.to_prometheus())
+
+        if self._profiler is not None:
+            self._profiler.dump_stats(base + ".pstats")
+            paths.append(base + ".pstats")
+
+        return paths
+
+
+def _write_atomic(path, text):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
@@ -0,0 +1,339 @@
+# utils/scenario_engine.py
+
+"""
+What-if scenarios for statutory rule changes.
+
+Takes a base run (a PayrollResultSet, or a run's exported results file)
+and a list of scenarios, each a set of rule overrides applied to the
+rules the base run was priced under:
+
+    engine = ScenarioEngine.from_results(results)
+    outcome = engine.evaluate([
+        {"name": "PF 10%", "pf_rate": 0.10},
+        {"name": "ESI ceiling 25k", "esi_wage_limit": 25000},
+        {"name": "TDS 12%", "tds_rate": 0.12},
+    ])
+    outcome.summary()               # one row per scenario
+    outcome.employee_deltas("PF 10%")
+
+Earnings do not change, so gross and PT are the base run's. PF, ESI,
+TDS and net are recomputed for every scenario at once: the scenario
+parameters are (scenarios × 1) columns broadcast against the
+(1 × employees) earnings, with the same formulas and rounding as
+rules.rule_tables, so a scenario without overrides reproduces the base
+run exactly. TDS is evaluated once per distinct tax table (usually one
+or two), not once per scenario.
+
+Parameters: see rules.rule_tables.SCENARIO_PARAMETERS.
+"""
+
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from rules.payroll_rules import RULES_VERSION
+from rules.rule_tables import load_rule_table
+from utils.results_export import RULES_VERSION_KEY, RUN_RESULTS_DIR, open_run_results
+
+DEDUCTIONS = ("PF", "ESI", "PT", "TDS")
+RECOMPUTED = ("PF", "ESI", "TDS")
+
+# Employees per block are capped so one block holds at most this many
+# (scenario, employee) cells per matrix
+MAX_BLOCK_CELLS = 2_000_000
+
+
+def _scenario_list(scenarios):
+    """
+    [(name, overrides)] from a list of {"name": ..., **overrides} dicts
+    or a {name: overrides} mapping.
+    """
+    if isinstance(scenarios, dict):
+        items = [(str(name), dict(overrides)) for name, overrides in scenarios.items()]
+    else:
+        items = []
+        for i, scenario in enumerate(scenarios):
+            overrides = dict(scenario)
+            items.append((str(overrides.pop("name", f"scenario_{i + 1}")), overrides))
+
+    names = [name for name, _ in items]
+    if len(set(names)) != len(names):
+        raise ValueError("Scenario names must be unique")
+    return items
+
+
+def _complete_dates(pay_dates):
+    # Pay dates are only usable when every employee has one
+    if pay_dates is None or np.isnat(pay_dates).any():
+        return None
+    return pay_dates
+
+
+def _tds_key(table):
+    return (
+        table.tds_thresholds.tobytes(),
+        table.tds_rates.tobytes(),
+        table.tds_basis,
+        table.standard_deduction,
+        table.rebate_limit,
+        table.cess_rate,
+    )
+
+
+def _ceiling_key(table):
+    return (
+        table.ceiling_dates.tobytes(),
+        table.pf_wage_limits.tobytes(),
+        table.esi_wage_limits.tobytes(),
+    )
+
+
+class ScenarioEngine:
+    """
+    Re-prices a base run's deductions and net pay under rule overrides.
+    """
+
+    def __init__(self, employee_id, basic, gross, net, deductions,
+                 rules_version=RULES_VERSION, pay_dates=None):
+        """
+        One value per employee of the base run: Basic, gross and net
+        salary, and deductions {"PF", "ESI", "PT", "TDS"}.
+        pay_dates: the run's pay dates when its rules have date-dependent
+        wage ceilings; without them the latest ceilings apply, as in
+        the run itself.
+        """
+        self.employee_id = np.asarray(employee_id, dtype=str)
+        self.basic = np.asarray(basic, dtype=float)
+        self.gross = np.asarray(gross, dtype=float)
+        self.net = np.asarray(net, dtype=float)
+        self.deductions = {name: np.asarray(deductions[name], dtype=float) for name in DEDUCTIONS}
+        self.rules = load_rule_table(rules_version)
+        self.pay_dates = pay_dates
+
+    @classmethod
+    def from_results(cls, results, rules_version=RULES_VERSION, pay_dates=None):
+        """
+        Engine over a PayrollResultSet (pay dates default to its own).
+        """
+        deductions = results.deductions
+        return cls(
+            employee_id=results.employee_id.astype(str),
+            basic=results.earnings["Basic"].to_numpy(dtype=float),
+            gross=results.gross_salary,
+            net=results.net_salary,
+            deductions={
+                name: deductions[name].to_numpy(dtype=float)
+                if name in deductions.columns else np.zeros(len(results))
+                for name in DEDUCTIONS
+            },
+            rules_version=rules_version,
+            pay_dates=pay_dates if pay_dates is not None else _complete_dates(results.pay_date)
+        )
+
+    @classmethod
+    def from_run(cls, payroll_run_id, base_dir=RUN_RESULTS_DIR, rules_version=None,
+                 pay_dates=None):
+        """
+        Engine over a run's exported results file (utils.results_export).
+        The rules version and pay dates default to the ones the run was
+        priced under, as recorded in the file (RULES_VERSION for files
+        that predate the record).
+        """
+        table = open_run_results(payroll_run_id, base_dir=base_dir)
+
+        if rules_version is None:
+            metadata = table.schema.metadata or {}
+            rules_version = metadata.get(RULES_VERSION_KEY, RULES_VERSION.encode()).decode()
+
+        if pay_dates is None and "pay_date" in table.column_names:
+            pay_dates = _complete_dates(
+                table.column("pay_date").to_numpy(zero_copy_only=False).astype("datetime64[D]")
+            )
+
+        def column(name):
+            if name not in table.column_names:
+                return np.zeros(table.num_rows)
+            return np.nan_to_num(table.column(name).to_numpy(zero_copy_only=False).astype(float))
+
+        return cls(
+            employee_id=table.column("employee_id").to_pylist(),
+            basic=column("earnings.Basic"),
+            gross=column("gross_salary"),
+            net=column("net_salary"),
+            deductions={name: column(f"deductions.{name}") for name in DEDUCTIONS},
+            rules_version=rules_version,
+            pay_dates=pay_dates
+        )
+
+    def __len__(self):
+        return len(self.employee_id)
+
+    # -----------------------------
+    # Evaluation
+    # -----------------------------
+    def evaluate(self, scenarios):
+        """
+        Evaluates every scenario over every employee; returns a ScenarioResult.
+        """
+        scenarios = _scenario_list(scenarios)
+        tables = [self.rules.with_overrides(**overrides) for _, overrides in scenarios]
+        n_scenarios, n_employees = len(tables), len(self)
+
+        pf_rate = np.array([t.pf_rate for t in tables])[:, None]
+        esi_rate = np.array([t.esi_rate for t in tables])[:, None]
+
+        # Wage ceilings / tax tables: computed once per distinct table
+        ceiling_groups, tds_groups = {}, {}
+        for s, table in enumerate(tables):
+            ceiling_groups.setdefault(_ceiling_key(table), []).append(s)
+            tds_groups.setdefault(_tds_key(table), []).append(s)
+
+        ceiling_of = np.empty(n_scenarios, dtype=np.int64)
+        limits = []
+        for g, rows in enumerate(ceiling_groups.values()):
+            ceiling_of[rows] = g
+            limits.append(tables[rows[0]].wage_limits(self.pay_dates, n_employees))
+        pf_limits = np.stack([pf for pf, _ in limits])
+        esi_limits = np.stack([esi for _, esi in limits])
+
+        out = {name: np.empty((n_scenarios, n_employees)) for name in RECOMPUTED + ("net",)}
+
+        block = max(1, MAX_BLOCK_CELLS // max(n_scenarios, 1))
+        for start in range(0, n_employees, block):
+            cols = slice(start, start + block)
+            basic = self.basic[None, cols]
+            gross = self.gross[None, cols]
+
+            pf = np.round(np.minimum(basic, pf_limits[ceiling_of, cols]) * pf_rate, 2)
+            esi = np.where(gross <= esi_limits[ceiling_of, cols], np.round(gross * esi_rate, 2), 0.0)
+
+            tds = np.empty_like(pf)
+            for rows in tds_groups.values():
+                tds[rows] = tables[rows[0]].tds(gross - pf[rows])
+
+            # Same left-to-right order as the calculation agent
+            total = pf + esi + self.deductions["PT"][None, cols] + tds
+
+            out["PF"][:, cols] = pf
+            out["ESI"][:, cols] = esi
+            out["TDS"][:, cols] = tds
+            out["net"][:, cols] = gross - total
+
+        return ScenarioResult(self, [name for name, _ in scenarios], out)
+
+
+class ScenarioResult:
+    """
+    (scenarios × employees) deductions and net pay, with deltas
+    against the base run.
+    """
+
+    def __init__(self, engine, names, matrices):
+        self.names = names
+        self.employee_id = engine.employee_id
+        self.base_net = engine.net
+        self.base_deductions = engine.deductions
+        self.net = matrices["net"]
+        self.deductions = {name: matrices[name] for name in RECOMPUTED}
+
+    def _position(self, scenario):
+        try:
+            return self.names.index(scenario)
+        except ValueError:
+            raise ValueError(f"Unknown scenario: {scenario}") from None
+
+    @property
+    def net_delta(self):
+        return self.net - self.base_net[None, :]
+
+    def deduction_delta(self, name):
+        return self.deductions[name] - self.base_deductions[name][None, :]
+
+    def summary(self):
+        """
+        One row per scenario: workforce totals and deltas vs the base run.
+        """
+        delta = self.net_delta
+        frame = pd.DataFrame({
+            "scenario": self.names,
+            "employees": len(self.employee_id),
+            "base_net_pay": float(self.base_net.sum()),
+            "net_pay": self.net.sum(axis=1),
+            "net_pay_delta": delta.sum(axis=1),
+            "employees_better_off": (delta > 0.005).sum(axis=1),
+            "employees_worse_off": (delta < -0.005).sum(axis=1),
+            "max_increase": delta.max(axis=1, initial=0.0),
+            "max_decrease": delta.min(axis=1, initial=0.0),
+        })
+        for name in RECOMPUTED:
+            frame[f"{name}_delta"] = self.deduction_delta(name).sum(axis=1)
+        return frame.set_index("scenario")
+
+    def employee_deltas(self, scenario, changed_only=False):
+        """
+        One row per employee for one scenario: base and scenario net
+        pay and the change in each recomputed deduction.
+        """
+        s = self._position(scenario)
+        frame = pd.DataFrame({
+            "employee_id": self.employee_id,
+            "base_net_salary": self.base_net,
+            "net_salary": self.net[s],
+            "net_delta": self.net[s] - self.base_net,
+            **{f"{name}_delta": self.deduction_delta(name)[s] for name in RECOMPUTED},
+        })
+        if changed_only:
+            frame = frame[np.abs(frame["net_delta"].to_numpy()) > 0.005]
+        return frame
+
+    def employee_delta_frame(self):
+        """
+        Net pay delta per employee (rows) and scenario (columns).
+        """
+        return pd.DataFrame(self.net_delta.T, index=self.employee_id, columns=self.names)
+
+
+def parse_scenario(text):
+    """
+    "name:param=value,param=value" → {"name": ..., param: value}
+    (scalar parameters; pass tds_slabs through the Python API).
+    """
+    name, _, params = text.partition(":")
+    scenario = {"name": name}
+    for item in filter(None, params.split(",")):
+        key, _, value = item.partition("=")
+        key, value = key.strip(), value.strip()
+        scenario[key] = value if key == "tds_basis" else float(value)
+    return scenario
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="What-if statutory rule scenarios")
+    parser.add_argument("payroll_run_id", help="Base run (its exported results file is read)")
+    parser.add_argument(
+        "--scenario",
+        action="append",
+        required=True,
+        help='"name:param=value,param=value", e.g. "pf10:pf_rate=0.10" (repeatable)'
+    )
+    parser.add_argument(
+        "--rules-version",
+        help="Rules to re-price under (default: the base run's, as recorded in its results file)"
+    )
+    parser.add_argument("--base-dir", default=RUN_RESULTS_DIR)
+    parser.add_argument("--employees", help="Also write per-employee net pay deltas to this CSV")
+    args = parser.parse_args(argv)
+
+    engine = ScenarioEngine.from_run(args.payroll_run_id, args.base_dir, args.rules_version)
+    outcome = engine.evaluate([parse_scenario(text) for text in args.scenario])
+
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(outcome.summary())
+
+    if args.employees:
+        outcome.employee_delta_frame().to_csv(args.employees, index_label="employee_id")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,243 @@
-from langgraph.graph import StateGraph
+# workflows/langgraph_workflow.py
 
-def build_payroll_graph():
-    graph = StateGraph(dict)
+"""
+LangGraph execution path for payroll.
 
-    graph.add_node("validate", lambda state: state)
-    graph.add_node("anomaly", lambda state: state)
-    graph.add_node("explain", lambda state: state)
+Each node wraps a real agent from PayrollWorkflow:
 
-    graph.set_entry_point("validate")
-    graph.add_edge("validate", "anomaly")
-    graph.add_edge("anomaly", "explain")
+    START ─┬─ structure ────┬─ compliance ─ calculation ─┬─ validation ─┬─ explanation ─ audit ─ END
+           └─ variable_pay ─┘                            └─ anomaly ────┘
+
+Independent stages (salary structure / variable pay, validation /
+anomaly) run concurrently. PayrollGraphRunner adds batched and async
+invocation with a concurrency limit, so large runs and slow explanation
+backends overlap instead of running one employee after another.
+"""
+
+from typing import Any, TypedDict
+
+import pandas as pd
+from langgraph.graph import StateGraph, START, END
+
+from workflows import payroll_workflow
+from workflows.payroll_workflow import PayrollWorkflow, audit_payload, _pay_context
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+class PayrollState(TypedDict, total=False):
+    # Inputs
+    employee_id: str
+    employee_df: Any        # the employee's input row (see employee_rows)
+    baseline: Any
+    approval_state: dict
+    payroll_run_id: str
+    payroll_period: str
+
+    # Stage outputs (one key per node, so parallel branches never collide)
+    structure: dict
+    variable_pay: dict
+    earnings: dict
+    deductions: dict
+    pay_dates: Any
+    payroll: dict
+    validation_issues: list
+    anomalies: list
+    explanation: str
+    result: dict
+
+
+def employee_rows(payroll_df):
+    """
+    employee_id → that employee's input row as a one-row frame, built in
+    one pass, so nodes never filter the whole payroll frame (the first
+    row wins for duplicated ids, as in the agents' own lookups).
+    """
+    first = ~payroll_df["employee_id"].duplicated().to_numpy()
+    positions = first.nonzero()[0]
+    ids = payroll_df["employee_id"].to_numpy()[positions].tolist()
+    return {
+        employee_id: payroll_df.iloc[position:position + 1]
+        for employee_id, position in zip(ids, positions)
+    }
+
+
+def build_payroll_graph(workflow=None):
+    """
+    Compiles the payroll graph around the agents of `workflow`
+    (a fresh PayrollWorkflow by default).
+
+    The audit node writes through the AuditWriter passed as
+    config["configurable"]["audit"] when present, else a one-off write.
+    """
+    wf = workflow or PayrollWorkflow()
+
+    def _record(state):
+        return {
+            "employee_id": state["employee_id"],
+            "gross_salary": state["payroll"]["gross_salary"],
+            "net_salary": state["payroll"]["net_salary"],
+            "deductions": state["deductions"]
+        }
+
+    # 1️⃣ Earnings (parallel)
+    def structure(state):
+        return {"structure": wf.structure_agent.run(state["employee_id"], state["employee_df"])}
+
+    def variable_pay(state):
+        return {"variable_pay": wf.variable_agent.run(state["employee_id"], state["employee_df"])}
+
+    # 2️⃣ Statutory Deductions
+    def compliance(state):
+        earnings = {**state["structure"], **state["variable_pay"]}
+
+        states, pay_dates = _pay_context(state["employee_df"])
+        deductions = wf.compliance_agent.run(
+            earnings,
+            state=None if states is None else states[0],
+            pay_date=None if pay_dates is None else pay_dates[0]
+        )
+        return {"earnings": earnings, "deductions": deductions, "pay_dates": pay_dates}
+
+    # 3️⃣ Payroll Calculation
+    def calculation(state):
+        return {"payroll": wf.calculation_agent.run(state["earnings"], state["deductions"])}
+
+    # 4️⃣ / 5️⃣ Validation + Anomaly (parallel)
+    def validation(state):
+        return {"validation_issues": wf.validation_agent.run(
+            pd.DataFrame([_record(state)]),
+            pay_dates=state["pay_dates"]
+        )}
+
+    def anomaly(state):
+        return {"anomalies": wf.anomaly_agent.run(
+            current_df=pd.DataFrame([_record(state)]),
+            baseline=state["baseline"],
+            earnings=pd.DataFrame([state["earnings"]]),
+            inputs=state["employee_df"].reset_index(drop=True)
+        )}
+
+    # 6️⃣ Explanation
+    def explanation(state):
+        return {"explanation": wf._explain(state["validation_issues"], state["anomalies"])}
+
+    # 7️⃣ Audit + 8️⃣ Result
+    def audit(state, config):
+        payroll = state["payroll"]
+        result = {
+            "employee_id": state["employee_id"],
+            "payroll_run_id": state["payroll_run_id"],
+            "payroll_period": state["payroll_period"],
+            "approval_status": state["approval_state"]["status"],
+            "gross_salary": payroll["gross_salary"],
+            "total_deductions": payroll["total_deductions"],
+            "net_salary": payroll["net_salary"],
+            "earnings": state["earnings"],
+            "deductions": state["deductions"],
+            "validation_issues": state["validation_issues"],
+            "anomalies": state["anomalies"],
+            "explanation": state["explanation"]
+        }
+
+        writer = (config or {}).get("configurable", {}).get("audit")
+        if writer is not None:
+            writer.write(audit_payload(result))
+        else:
+            wf.audit_agent.run(audit_payload(result))
+
+        return {"result": result}
+
+    graph = StateGraph(PayrollState)
+
+    graph.add_node("structure", structure)
+    graph.add_node("variable_pay", variable_pay)
+    graph.add_node("compliance", compliance)
+    graph.add_node("calculation", calculation)
+    graph.add_node("validation", validation)
+    graph.add_node("anomaly", anomaly)
+    graph.add_node("explanation", explanation)
+    graph.add_node("audit", audit)
+
+    graph.add_edge(START, "structure")
+    graph.add_edge(START, "variable_pay")
+    graph.add_edge(["structure", "variable_pay"], "compliance")
+    graph.add_edge("compliance", "calculation")
+    graph.add_edge("calculation", "validation")
+    graph.add_edge("calculation", "anomaly")
+    graph.add_edge(["validation", "anomaly"], "explanation")
+    graph.add_edge("explanation", "audit")
+    graph.add_edge("audit", END)
 
     return graph.compile()
+
+
+class PayrollGraphRunner:
+    """
+    Runs the payroll graph for one employee, a batch (thread pool) or
+    an async batch, with at most `max_concurrency` employees in flight.
+    Results have the same shape as PayrollWorkflow.run().
+    """
+
+    def __init__(self, workflow=None, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        self.workflow = workflow or PayrollWorkflow()
+        self.graph = build_payroll_graph(self.workflow)
+        self.max_concurrency = max_concurrency
+
+    def _inputs(self, employee_ids, payroll_df, historical_df):
+        # Read at call time: new_payroll_run() rebinds the run context
+        run_id = payroll_workflow.payroll_run_id
+        period = payroll_workflow.payroll_period
+
+        baseline = self.workflow._baseline_for(historical_df)
+        approval_state = self.workflow.approval_agent.init_state(run_id, period)
+        rows = employee_rows(payroll_df)
+        return [
+            {
+                "employee_id": employee_id,
+                "employee_df": rows[employee_id],
+                "baseline": baseline,
+                "approval_state": approval_state,
+                "payroll_run_id": run_id,
+                "payroll_period": period
+            }
+            for employee_id in employee_ids
+        ]
+
+    def _config(self, audit):
+        return {
+            "max_concurrency": self.max_concurrency,
+            "configurable": {"audit": audit}
+        }
+
+    def invoke(self, employee_id, payroll_df, historical_df):
+        state = self._inputs([employee_id], payroll_df, historical_df)[0]
+        return self.graph.invoke(state)["result"]
+
+    def batch(self, payroll_df, historical_df, employee_ids=None):
+        """
+        All employees (or `employee_ids`) in input order.
+        """
+        if employee_ids is None:
+            employee_ids = payroll_df["employee_id"].tolist()
+
+        inputs = self._inputs(employee_ids, payroll_df, historical_df)
+
+        with self.workflow.audit_agent.open_run() as audit:
+            states = self.graph.batch(inputs, config=self._config(audit))
+
+        return [state["result"] for state in states]
+
+    async def abatch(self, payroll_df, historical_df, employee_ids=None):
+        """
+        Async counterpart of batch().
+        """
+        if employee_ids is None:
+            employee_ids = payroll_df["employee_id"].tolist()
+
+        inputs = self._inputs(employee_ids, payroll_df, historical_df)
+
+        with self.workflow.audit_agent.open_run() as audit:
+            states = await self.graph.abatch(inputs, config=self._config(audit))
+
+        return [state["result"] for state in states]
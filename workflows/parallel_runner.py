@@ -0,0 +1,176 @@
+# workflows/parallel_runner.py
+
+"""
+Multi-process, sharded payroll execution.
+
+The employee frame is split into contiguous row shards that run on a
+process pool. The read-only payroll frame and historical baseline are
+shared with workers without per-task pickling:
+- fork (Linux): workers inherit them copy-on-write from the parent
+- spawn (macOS / Windows): they are pickled once per worker, via the
+  pool initializer
+
+Workers compute their shard, explain it (unless explanations are lazy)
+and serialize its audit records. The parent only appends the serialized
+records through one run-scoped background writer, in shard order, and
+merges shard results back in input row order, so reports are identical
+to the serial run_batch path. Workers' stage timings are merged into the
+run's metrics (summed across workers) and exported like run_batch's.
+"""
+
+import multiprocessing as mp
+import os
+
+from agents.audit_agent import serialize_audit_batch
+from agents.explanation_agent import PayrollExplanationAgent
+from rules.payroll_rules import RULES_VERSION
+from utils.explanation_cache import ExplanationCache
+from utils.result_set import PayrollResultSet
+from utils.run_metrics import RunMetrics
+from workflows import payroll_workflow
+from workflows.payroll_workflow import PayrollWorkflow
+
+# Worker-side state (set before fork, or by _init_worker under spawn)
+_SHARED = {}
+
+
+def _init_worker(payroll_df, baseline, options):
+    _SHARED["payroll_df"] = payroll_df
+    _SHARED["baseline"] = baseline
+    _SHARED["options"] = options
+
+
+def _worker_workflow():
+    workflow = _SHARED.get("workflow")
+    if workflow is not None:
+        return workflow
+
+    options = _SHARED["options"]
+
+    # Own cache connection per worker (SQLite handles do not survive fork)
+    explainer = None
+    if options["explain"]:
+        explainer = PayrollExplanationAgent(
+            backend=options["explanation_backend"],
+            cache=ExplanationCache(path=options["explanation_cache"])
+        )
+
+    workflow = _SHARED["workflow"] = PayrollWorkflow(
+        metrics_dir=None,
+        results_dir=None,
+        anomaly_engine=options["anomaly_engine"],
+        explainer=explainer,
+        lazy_explanations=not options["explain"],
+        rules_version=options["rules_version"]
+    )
+    return workflow
+
+
+def _run_shard(task):
+    start, stop, approval_state, run, audit_options = task
+
+    metrics = RunMetrics(run[0])
+    results = _worker_workflow()._run_frame(
+        _SHARED["payroll_df"].iloc[start:stop],
+        _SHARED["baseline"],
+        approval_state,
+        audit=None,
+        metrics=metrics,
+        run=run
+    )
+
+    with metrics.stage("audit", rows=len(results)):
+        audit = serialize_audit_batch(results.audit_payloads(), **audit_options)
+
+    return results, audit, metrics.stages, metrics.counters
+
+
+class ParallelPayrollRunner:
+    """
+    Runs PayrollWorkflow over a process pool, one contiguous shard of
+    employees per task.
+    """
+
+    def __init__(self, workers=None, shards_per_worker=4, min_shard_size=1000,
+                 workflow=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.shards_per_worker = shards_per_worker
+        self.min_shard_size = min_shard_size
+        self.workflow = workflow or PayrollWorkflow()
+
+    def _shards(self, n_rows):
+        target = max(self.workers * self.shards_per_worker, 1)
+        size = max(self.min_shard_size, -(-n_rows // target))
+        return [(start, min(start + size, n_rows)) for start in range(0, n_rows, size)]
+
+    def _worker_options(self):
+        workflow = self.workflow
+        explain = not workflow.lazy_explanations
+        return {
+            "anomaly_engine": workflow.anomaly_agent.engine,
+            "rules_version": getattr(workflow, "rules_version", RULES_VERSION),
+            "explain": explain,
+            "explanation_backend": workflow.explainer.backend if explain else None,
+            "explanation_cache": workflow.explainer.cache.path if explain else None,
+        }
+
+    def run(self, payroll_df, historical_df):
+        """
+        Same contract as PayrollWorkflow.run_batch: one result per row of
+        payroll_df, in input order, audited once per employee.
+        """
+        workflow = self.workflow
+        payroll_df = payroll_df.reset_index(drop=True)
+        shards = self._shards(len(payroll_df))
+
+        if self.workers == 1 or len(shards) <= 1:
+            return workflow.run_batch(payroll_df, historical_df)
+
+        # Read at call time: new_payroll_run() rebinds the run context
+        run = (payroll_workflow.payroll_run_id, payroll_workflow.payroll_period)
+        approval_state = workflow.approval_agent.init_state(*run)
+        metrics = workflow.metrics_for(run[0])
+
+        with metrics.run():
+            with metrics.stage("baseline"):
+                baseline = workflow._baseline_for(historical_df)
+
+            shared = (payroll_df, baseline, self._worker_options())
+
+            if "fork" in mp.get_all_start_methods():
+                ctx = mp.get_context("fork")
+                _init_worker(*shared)
+                pool_args = {}
+            else:
+                ctx = mp.get_context("spawn")
+                pool_args = {"initializer": _init_worker, "initargs": shared}
+
+            shard_sets = []
+
+            try:
+                with workflow.audit_agent.open_run(background=True) as audit:
+                    audit_options = {
+                        "store": audit.store_path is not None,
+                        "csv": audit.csv_path is not None,
+                    }
+                    tasks = [
+                        (start, stop, approval_state, run, audit_options)
+                        for start, stop in shards
+                    ]
+
+                    with ctx.Pool(min(self.workers, len(shards)), **pool_args) as pool:
+                        # imap keeps shard order → stable employee order
+                        for shard_results, shard_audit, stages, counters in pool.imap(_run_shard, tasks):
+                            audit.write_serialized(shard_audit)
+                            metrics.merge(stages, counters)
+                            shard_sets.append(shard_results)
+
+                    workflow._commit_audit(audit, metrics)
+            finally:
+                _SHARED.clear()
+
+            results = PayrollResultSet.concat(shard_sets)
+            workflow.export_results(results, metrics)
+
+        workflow._export_metrics(metrics)
+        return results
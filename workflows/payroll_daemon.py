@@ -0,0 +1,569 @@
+# workflows/payroll_daemon.py
+
+"""
+Warm payroll worker.
+
+A long-lived local process that keeps the agents, rule tables,
+historical baseline (and optionally the statistical anomaly engine)
+loaded, and serves payroll requests over HTTP on localhost or over a
+Unix socket:
+
+    POST /run       {"current": path, "incremental": bool, "multi_period": bool,
+                     "output": csv name, "payslips": zip name}
+    POST /rerun     {"current": path, "employee_ids": [...]}
+    POST /what-if   {"payroll_run_id": id, "scenarios": [{"name": ..., "pf_rate": ...}],
+                     "output": per-employee delta csv name}
+    POST /reload    re-read the historical payroll
+    GET  /status    warm state, queue depth, recent jobs
+    GET  /jobs/<id> one job
+    POST /shutdown
+
+Requests are queued and executed one at a time by a single worker
+thread (each is a payroll run with its own payroll_run_id); the HTTP
+call returns when its job is done, or immediately with {"wait": false}.
+
+POST bodies must be sent as application/json, and requests carrying an
+Origin header (i.e. from a web page) are refused, so a browser cannot
+drive the worker cross-origin. Reports, payslips and scenario deltas are
+only written inside the output directory (--output-dir); names are
+resolved against it.
+
+    python -m workflows.payroll_daemon --historical data/historical_payroll.csv
+    python -m workflows.payroll_daemon --socket /tmp/payroll.sock
+
+See payroll_client.py for the matching command-line client.
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import os
+import queue
+import re
+import socketserver
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from utils.anomaly_engine import StatisticalAnomalyEngine
+from utils.audit_segments import AUDIT_LOG_DIR
+from utils.data_loader import load_payroll_data
+from utils.historical_baseline import HistoricalBaseline
+from utils.payroll_report import REPORT_COLUMNS, report_rows
+from utils.payslip_export import write_payslip_archive
+from rules.payroll_rules import RULES_VERSION, RULE_TABLE_VERSIONS
+from utils.results_export import run_results_path
+from utils.scenario_engine import ScenarioEngine
+from workflows import payroll_workflow
+from workflows.payroll_workflow import PayrollWorkflow, new_payroll_run
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8750
+DEFAULT_OUTPUT_DIR = "data/reports"
+MAX_QUEUED = 64
+MAX_JOBS_KEPT = 200
+MAX_FRAMES_KEPT = 4
+MAX_RERUN_RESULTS = 1000
+
+# Run ids are single path components (PR-202411-abc123)
+RUN_ID_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]*")
+
+# Job parameters naming files the worker writes
+OUTPUT_PARAMS = ("output", "payslips")
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class _Job:
+    """
+    One queued request.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, kind, params):
+        self.id = next(self._ids)
+        self.kind = kind
+        self.params = params
+        self.status = "queued"
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "queued_seconds": (self.started_at or time.time()) - self.submitted_at,
+            "run_seconds": (
+                (self.finished_at or time.time()) - self.started_at
+                if self.started_at else None
+            ),
+        }
+
+
+class PayrollDaemon:
+    """
+    Warm workflow + request queue + single worker thread.
+    """
+
+    def __init__(self, historical_path, statistical_anomalies=False, workflow=None,
+                 rules_version=RULES_VERSION, output_dir=DEFAULT_OUTPUT_DIR):
+        self.historical_path = historical_path
+        self.statistical_anomalies = statistical_anomalies
+        self.workflow = workflow or PayrollWorkflow(rules_version=rules_version)
+        self.output_dir = os.path.realpath(output_dir)
+
+        self.started_at = time.time()
+        self.jobs = OrderedDict()
+        self._queue = queue.Queue(maxsize=MAX_QUEUED)
+        self._frames = OrderedDict()        # (path, mtime, size) → typed frame
+        self._worker = None
+        self._lock = threading.Lock()
+
+        self._historical_key = None
+        self.baseline = None
+        self.reload()
+
+    # -----------------------------
+    # Warm state
+    # -----------------------------
+    def _file_key(self, path):
+        stat = os.stat(path)
+        return (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+    def _history_key(self):
+        closed_runs = tuple(sorted(self.workflow.approval_agent.closed_runs()))
+        return self._file_key(self.historical_path), closed_runs
+
+    def _load_baseline(self, closed_runs):
+        return HistoricalBaseline.load_or_build(
+            [self.historical_path],
+            audit_path=AUDIT_LOG_DIR,
+            closed_runs=closed_runs,
+            excluded=self.workflow.approval_agent.excluded_employees(closed_runs)
+        )
+
+    def reload(self):
+        """
+        (Re)loads the historical baseline and anomaly engine.
+        """
+        self._historical_key = self._history_key()
+        self.baseline = self._load_baseline(self._historical_key[1])
+
+        if self.statistical_anomalies:
+            self.workflow.anomaly_agent.engine = StatisticalAnomalyEngine.load_or_fit(
+                load_payroll_data(self.historical_path),
+                period=payroll_workflow.payroll_period
+            )
+        return {"historical": self.historical_path, "employees": len(self.baseline.employee_ids)}
+
+    def _refresh_history(self):
+        key = self._history_key()
+        if key[0] != self._historical_key[0]:
+            self.reload()
+        elif key != self._historical_key:
+            # Runs finalised since the last job are folded in incrementally
+            self._historical_key = key
+            self.baseline = self._load_baseline(key[1])
+
+    def _payroll_frame(self, path):
+        """
+        Typed payroll frame, kept warm while the file is unchanged.
+        """
+        key = self._file_key(path)
+        frame = self._frames.get(key)
+        if frame is None:
+            frame = load_payroll_data(path)
+
+        with self._lock:
+            self._frames[key] = frame
+            self._frames.move_to_end(key)
+            while len(self._frames) > MAX_FRAMES_KEPT:
+                self._frames.popitem(last=False)
+        return frame
+
+    # -----------------------------
+    # Request checks
+    # -----------------------------
+    def output_path(self, name):
+        """
+        Absolute path for an output file name, resolved against the
+        output directory; raises ValueError for anything outside it.
+        """
+        if not isinstance(name, str) or not name:
+            raise ValueError("output paths must be non-empty strings")
+
+        path = os.path.realpath(os.path.join(self.output_dir, name))
+        if path == self.output_dir or os.path.commonpath([path, self.output_dir]) != self.output_dir:
+            raise ValueError(f"output paths must be files inside {self.output_dir}")
+        return path
+
+    def _check_params(self, params):
+        """
+        Validated copy of a job's parameters: output names become paths
+        inside the output directory, run ids must be plain identifiers.
+        """
+        params = dict(params)
+
+        for key in OUTPUT_PARAMS:
+            if params.get(key) is not None:
+                params[key] = self.output_path(params[key])
+
+        run_id = params.get("payroll_run_id")
+        if run_id is not None and not (isinstance(run_id, str) and RUN_ID_PATTERN.fullmatch(run_id)):
+            raise ValueError(f"Invalid payroll_run_id: {run_id!r}")
+
+        return params
+
+    # -----------------------------
+    # Queue
+    # -----------------------------
+    def start(self):
+        self._worker = threading.Thread(target=self._work, name="payroll-worker", daemon=True)
+        self._worker.start()
+        return self
+
+    def stop(self):
+        if self._worker is not None:
+            self._queue.put(None)
+            self._worker.join()
+            self._worker = None
+
+    def submit(self, kind, params):
+        """
+        Queues a job; raises queue.Full when MAX_QUEUED jobs are waiting
+        and ValueError for an unknown kind or invalid parameters.
+        """
+        if kind not in _HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+
+        job = _Job(kind, self._check_params(params))
+        with self._lock:
+            self.jobs[job.id] = job
+            while len(self.jobs) > MAX_JOBS_KEPT:
+                self.jobs.popitem(last=False)
+        self._queue.put_nowait(job)
+        return job
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                job.result = _HANDLERS[job.kind](self, **job.params)
+                job.status = "done"
+            except Exception as e:
+                job.error = f"{type(e).__name__}: {e}"
+                job.status = "failed"
+                traceback.print_exc()
+            finally:
+                job.finished_at = time.time()
+                job.done.set()
+
+    def status(self):
+        with self._lock:
+            recent = [job.to_dict() for job in list(self.jobs.values())[-10:]]
+            warm_files = [key[0] for key in self._frames]
+        return {
+            "pid": os.getpid(),
+            "uptime_seconds": time.time() - self.started_at,
+            "historical": self.historical_path,
+            "baseline_employees": len(self.baseline.employee_ids),
+            "statistical_anomalies": self.statistical_anomalies,
+            "warm_payroll_files": warm_files,
+            "queued": self._queue.qsize(),
+            "recent_jobs": recent,
+        }
+
+    # -----------------------------
+    # Jobs (run on the worker thread)
+    # -----------------------------
+    def _run(self, current, incremental=False, multi_period=False, output=None, payslips=None):
+        self._refresh_history()
+        payroll_df = self._payroll_frame(current)
+
+        run_id = new_payroll_run()
+        if multi_period:
+            results = self.workflow.run_periods(payroll_df, self.baseline)
+        else:
+            results = self.workflow.run_batch(payroll_df, self.baseline, incremental=incremental)
+
+        if output:
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            with open(output, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f)
+                writer.writerow(REPORT_COLUMNS)
+                writer.writerows(report_rows(results))
+
+        if payslips:
+            os.makedirs(os.path.dirname(payslips), exist_ok=True)
+            write_payslip_archive(results, payslips)
+
+        summary = self._summary(run_id, results)
+        summary["output"] = output
+        summary["payslips"] = payslips
+        if multi_period:
+            summary["periods"] = self._period_summaries(results)
+        return summary
+
+    def _rerun(self, current, employee_ids):
+        self._refresh_history()
+        payroll_df = self._payroll_frame(current)
+
+        wanted = set(str(e) for e in employee_ids)
+        subset = payroll_df[payroll_df["employee_id"].astype(str).isin(wanted)]
+        missing = sorted(wanted - set(subset["employee_id"].astype(str)))
+
+        run_id = new_payroll_run()
+        results = self.workflow.run_batch(subset, self.baseline)
+
+        # Explanations are only generated for the results returned
+        shown = self.workflow.explain(results[:MAX_RERUN_RESULTS])
+
+        summary = self._summary(run_id, results)
+        summary["missing_employee_ids"] = missing
+        summary["results"] = shown.to_records()
+        return summary
+
+    def _what_if(self, payroll_run_id, scenarios, rules_version=None, output=None):
+        engine = ScenarioEngine.from_run(
+            payroll_run_id, base_dir=self.workflow.results_dir, rules_version=rules_version
+        )
+        outcome = engine.evaluate(scenarios)
+        if output:
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            outcome.employee_delta_frame().to_csv(output, index_label="employee_id")
+
+        return {
+            "payroll_run_id": payroll_run_id,
+            "employees": len(engine),
+            "output": output,
+            "scenarios": outcome.summary().reset_index().to_dict("records"),
+        }
+
+    def _period_summaries(self, results):
+        frame = results.summary_frame().groupby(["payroll_run_id", "payroll_period"]).agg(
+            employees=("employee_id", "size"), total_net_pay=("net_salary", "sum")
+        )
+        return [
+            {
+                "payroll_run_id": run_id,
+                "payroll_period": period,
+                "employees": int(row["employees"]),
+                "total_net_pay": float(row["total_net_pay"]),
+                "results_path": self._results_path(run_id),
+            }
+            for (run_id, period), row in frame.iterrows()
+        ]
+
+    def _results_path(self, run_id):
+        """
+        Absolute path of a run's exported results file (None if not exported).
+        """
+        if self.workflow.results_dir is None:
+            return None
+        path = run_results_path(run_id, self.workflow.results_dir)
+        return os.path.abspath(path) if path is not None else None
+
+    def _summary(self, run_id, results):
+        metrics = self.workflow.release_metrics(run_id)
+        return {
+            "payroll_run_id": run_id,
+            "payroll_period": payroll_workflow.payroll_period,
+            "employees": len(results),
+            "employees_with_issues": int((results.validation_issue_count > 0).sum()),
+            "employees_with_anomalies": int((results.anomaly_count > 0).sum()),
+            "total_net_pay": float(results.net_salary.sum()),
+            "results_path": self._results_path(run_id),
+            "run_seconds": metrics.run_seconds if metrics is not None else None,
+        }
+
+
+_HANDLERS = {
+    "run": PayrollDaemon._run,
+    "rerun": PayrollDaemon._rerun,
+    "what-if": PayrollDaemon._what_if,
+    "reload": lambda daemon: daemon.reload(),
+}
+
+
+# =================================================
+# HTTP front end (TCP or Unix socket)
+# =================================================
+def _handler_for(daemon, server_ref):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, body):
+            data = json.dumps(body, default=_json_default).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path == "/status":
+                return self._reply(200, daemon.status())
+
+            if self.path.startswith("/jobs/"):
+                try:
+                    job = daemon.jobs.get(int(self.path.rsplit("/", 1)[1]))
+                except ValueError:
+                    job = None
+                if job is None:
+                    return self._reply(404, {"error": "unknown job"})
+                return self._reply(200, job.to_dict())
+
+            return self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            # Web pages always send Origin on POST; local clients do not
+            if self.headers.get("Origin") is not None:
+                return self._reply(403, {"error": "cross-origin requests are not accepted"})
+
+            content_type = (self.headers.get("Content-Type") or "").split(";")[0].strip().lower()
+            if content_type != "application/json":
+                return self._reply(415, {"error": "request body must be application/json"})
+
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                params = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._reply(400, {"error": "request body must be JSON"})
+            if not isinstance(params, dict):
+                return self._reply(400, {"error": "request body must be a JSON object"})
+
+            kind = self.path.strip("/")
+
+            if kind == "shutdown":
+                self._reply(200, {"status": "shutting down"})
+                threading.Thread(target=server_ref[0].shutdown, daemon=True).start()
+                return None
+
+            if kind not in _HANDLERS:
+                return self._reply(404, {"error": "not found"})
+
+            wait = params.pop("wait", True)
+            try:
+                job = daemon.submit(kind, params)
+            except ValueError as e:
+                return self._reply(400, {"error": str(e)})
+            except queue.Full:
+                return self._reply(503, {"error": "queue full, retry later"})
+
+            if not wait:
+                return self._reply(202, job.to_dict())
+
+            job.done.wait()
+            return self._reply(200 if job.status == "done" else 500, job.to_dict())
+
+    return Handler
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        # BaseHTTPRequestHandler expects a (host, port) client address
+        request, _ = super().get_request()
+        return request, ("local", 0)
+
+
+def make_server(daemon, host=DEFAULT_HOST, port=DEFAULT_PORT, socket_path=None):
+    """
+    HTTP server bound to host:port, or to a Unix socket when socket_path
+    is given (a stale socket file is replaced).
+    """
+    server_ref = []
+    handler = _handler_for(daemon, server_ref)
+
+    if socket_path is not None:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = _UnixHTTPServer(socket_path, handler)
+    else:
+        server = ThreadingHTTPServer((host, port), handler)
+        server.daemon_threads = True
+
+    server_ref.append(server)
+    return server
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Warm payroll worker")
+    parser.add_argument("--historical", default="data/historical_payroll.csv")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", help="Serve on this Unix socket instead of TCP")
+    parser.add_argument(
+        "--output-dir",
+        default=DEFAULT_OUTPUT_DIR,
+        help="Directory reports, payslips and scenario deltas are written to"
+    )
+    parser.add_argument(
+        "--rules-version",
+        default=RULES_VERSION,
+        choices=sorted(RULE_TABLE_VERSIONS),
+        help="Statutory table for deductions and validation"
+    )
+    parser.add_argument(
+        "--statistical-anomalies",
+        action="store_true",
+        help="Keep a fitted statistical anomaly engine warm as well"
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    daemon = PayrollDaemon(
+        args.historical,
+        statistical_anomalies=args.statistical_anomalies,
+        rules_version=args.rules_version,
+        output_dir=args.output_dir
+    )
+    server = make_server(daemon, args.host, args.port, args.socket)
+    daemon.start()
+
+    where = args.socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Payroll worker ready on {where} (pid {os.getpid()})", flush=True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.stop()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+
+
+if __name__ == "__main__":
+    main()
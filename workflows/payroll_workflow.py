@@ -1,6 +1,8 @@
 # workflows/payroll_workflow.py
 
+import numpy as np
 import pandas as pd
+from contextlib import nullcontext
 from datetime import datetime
 import uuid
 
@@ -13,6 +15,12 @@ from agents.compliance_agent import ComplianceAgent
 from agents.payroll_calculation_agent import PayrollCalculationAgent
 from agents.audit_agent import AuditAgent
 from agents.payroll_approval_agent import PayrollApprovalAgent
+from rules.payroll_rules import RULES_VERSION
+from utils.audit_store import AuditStore
+from utils.historical_baseline import HistoricalBaseline
+from utils.result_set import PayrollResultSet
+from utils.results_export import RunResultsWriter, RUN_RESULTS_DIR, arrow_available
+from utils.run_metrics import RunMetrics, METRICS_DIR
 
 
 # =================================================
@@ -22,33 +30,188 @@ payroll_run_id = f"PR-{datetime.now().strftime('%Y%m')}-{uuid.uuid4().hex[:6]}"
 payroll_period = datetime.now().strftime("%B %Y")
 
 
+def new_payroll_run(period=None):
+    """
+    Starts a new run context in this process (long-lived workers run
+    many payrolls): rebinds payroll_run_id / payroll_period (the current
+    month unless `period` is given) and returns the new run id. Modules
+    that imported the names keep the old values.
+    """
+    global payroll_run_id, payroll_period
+    payroll_run_id = f"PR-{datetime.now().strftime('%Y%m')}-{uuid.uuid4().hex[:6]}"
+    payroll_period = period or datetime.now().strftime("%B %Y")
+    return payroll_run_id
+
+
+def _pay_context(payroll_df):
+    """
+    Per-row PT state codes and pay dates used by the rule tables
+    (None when the input carries no state / month column).
+    """
+    states = (
+        payroll_df["state"].astype(str).to_numpy()
+        if "state" in payroll_df.columns
+        else None
+    )
+    pay_dates = (
+        pd.to_datetime(payroll_df["month"].astype(str)).to_numpy(dtype="datetime64[D]")
+        if "month" in payroll_df.columns
+        else None
+    )
+    return states, pay_dates
+
+
+def split_periods(payroll_df):
+    """
+    Groups rows by their `month` column for a multi-period run.
+    Returns (months, periods): the "YYYY-MM" month of every row, and one
+    dict per distinct month, oldest first, with its own payroll_run_id,
+    payroll_period label and the row positions it covers.
+    """
+    if "month" not in payroll_df.columns:
+        raise ValueError("Multi-period runs need a month column in the payroll data")
+
+    months = pd.PeriodIndex(pd.to_datetime(payroll_df["month"].astype(str)), freq="M")
+    codes, uniques = pd.factorize(months, sort=True)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+
+    periods = [
+        {
+            "month": str(month),
+            "payroll_run_id": f"PR-{month.strftime('%Y%m')}-{uuid.uuid4().hex[:6]}",
+            "payroll_period": month.strftime("%B %Y"),
+            "positions": order[start:stop],
+        }
+        for month, start, stop in zip(uniques, bounds[:-1], bounds[1:])
+    ]
+    return months.astype(str).to_numpy(), periods
+
+
+def _period_labels(periods, rows):
+    """
+    Per-row run id / period / approval status columns of a multi-period frame.
+    """
+    labels = {
+        field: np.empty(rows, dtype=object)
+        for field in ("payroll_run_id", "payroll_period", "approval_status")
+    }
+    for period in periods:
+        for field, column in labels.items():
+            column[period["positions"]] = period[field]
+    return labels
+
+
+def employee_fingerprints(payroll_df, baseline, version):
+    """
+    One fingerprint per row: a hash of the employee's input row, the
+    version string (rules version, plus the anomaly engine signature
+    when one is used) and the baseline entry anomaly detection compares
+    against. Equal fingerprints within a period mean equal results.
+    """
+    frame = pd.concat([
+        payroll_df.reset_index(drop=True),
+        baseline.join(payroll_df["employee_id"])
+    ], axis=1)
+    frame["version"] = version
+
+    hashes = pd.util.hash_pandas_object(frame, index=False).to_numpy()
+    return [f"{h:016x}" for h in hashes.tolist()]
+
+
+def audit_payload(result):
+    """
+    Audit record for one employee result.
+    """
+    return {
+        "payroll_run_id": result["payroll_run_id"],
+        "payroll_period": result["payroll_period"],
+        "execution_status": "SUCCESS",
+        "approval_status": result["approval_status"],
+        "employee_id": result["employee_id"],
+        "earnings": result["earnings"],
+        "deductions": result["deductions"],
+        "gross_salary": result["gross_salary"],
+        "net_salary": result["net_salary"],
+        "validation_issues": result["validation_issues"],
+        "anomalies": result["anomalies"]
+    }
+
+
 class PayrollWorkflow:
     """
-    Orchestrates end-to-end payroll execution for a single employee:
+    Orchestrates end-to-end payroll execution for a single employee
+    (run) or for the whole workforce in one columnar pass (run_batch):
     Earnings → Deductions → Calculation → Validation → Anomaly → Explanation → Audit
     """
 
-    def __init__(self):
-        self.validation_agent = PayrollValidationAgent()
-        self.anomaly_agent = PayrollAnomalyAgent()
-        self.explainer = PayrollExplanationAgent()
+    def __init__(self, metrics_dir=METRICS_DIR, profile=None, anomaly_engine=None,
+                 explainer=None, lazy_explanations=True,
+                 results_dir=RUN_RESULTS_DIR, results_format="arrow",
+                 rules_version=RULES_VERSION):
+        """
+        metrics_dir: where per-run metrics JSON / Prometheus files are
+        written (None to keep them in memory only).
+        profile: None, "tracemalloc" or "cprofile" (see utils.run_metrics).
+        anomaly_engine: optional fitted StatisticalAnomalyEngine.
+        explainer: PayrollExplanationAgent (e.g. with a model backend).
+        lazy_explanations: leave "explanation" as None in batch results
+        (default); callers fill them with explain() when a result is
+        viewed or exported. False explains every result of a run.
+        results_dir / results_format: where each run's results file is
+        written, "arrow" or "parquet" (see utils.results_export; skipped
+        when results_dir is None or pyarrow is not installed).
+        rules_version: statutory table used for deductions and
+        validation (see rules.payroll_rules.RULE_TABLE_VERSIONS).
+        """
+        self.rules_version = rules_version
+        self.validation_agent = PayrollValidationAgent(rules_version)
+        self.anomaly_agent = PayrollAnomalyAgent(engine=anomaly_engine)
+        self.explainer = explainer or PayrollExplanationAgent()
+        self.lazy_explanations = lazy_explanations
         self.structure_agent = SalaryStructureAgent()
         self.variable_agent = VariablePayAgent()
-        self.compliance_agent = ComplianceAgent()
+        self.compliance_agent = ComplianceAgent(rules_version)
         self.calculation_agent = PayrollCalculationAgent()
         self.audit_agent = AuditAgent()
         self.approval_agent = PayrollApprovalAgent()
 
+        self.metrics_dir = metrics_dir
+        self.profile = profile
+        self.results_dir = results_dir
+        self.results_format = results_format
+        self._metrics = {}
+
+        self._baseline = None
+        self._baseline_source = None
+
+    def _baseline_for(self, historical_df):
+        """
+        Returns the HistoricalBaseline for historical_df, building it
+        once and reusing it while the same frame is passed in.
+        A prebuilt HistoricalBaseline can be passed instead of a frame.
+        """
+        if isinstance(historical_df, HistoricalBaseline):
+            return historical_df
+
+        if self._baseline_source is not historical_df:
+            self._baseline = HistoricalBaseline.from_frame(historical_df)
+            self._baseline_source = historical_df
+
+        return self._baseline
+
     def run(self, employee_id, payroll_df, historical_df):
         """
         Executes payroll for a single employee.
-        Approval state is initialized here and managed at UI / orchestration level.
+        historical_df may be a DataFrame or a prebuilt HistoricalBaseline.
+        Approval state is registered once per payroll_run_id (see
+        PayrollApprovalAgent) and managed at UI / orchestration level.
         """
 
         # =================================================
         # 0️⃣ Initialize Approval State (DRAFT)
         # =================================================
-        approval_state = self.approval_agent.init_state(payroll_run_id)
+        approval_state = self.approval_agent.init_state(payroll_run_id, payroll_period)
 
         # =================================================
         # 1️⃣ Earnings (Salary Structure + Variable Pay)
@@ -59,7 +222,13 @@ class PayrollWorkflow:
         # =================================================
         # 2️⃣ Statutory Deductions
         # =================================================
-        deductions = self.compliance_agent.run(earnings)
+        employee_rows = payroll_df[payroll_df["employee_id"] == employee_id].iloc[:1]
+        states, pay_dates = _pay_context(employee_rows)
+        deductions = self.compliance_agent.run(
+            earnings,
+            state=None if states is None else states[0],
+            pay_date=None if pay_dates is None else pay_dates[0]
+        )
 
         # =================================================
         # 3️⃣ Payroll Calculation (Gross → Net)
@@ -77,7 +246,8 @@ class PayrollWorkflow:
         # 4️⃣ Validation (Post-calculation)
         # =================================================
         validation_issues = self.validation_agent.run(
-            pd.DataFrame([payroll_record])
+            pd.DataFrame([payroll_record]),
+            pay_dates=pay_dates
         )
 
         # =================================================
@@ -85,25 +255,15 @@ class PayrollWorkflow:
         # =================================================
         anomalies = self.anomaly_agent.run(
             current_df=pd.DataFrame([payroll_record]),
-            historical_df=historical_df
+            baseline=self._baseline_for(historical_df),
+            earnings=pd.DataFrame([earnings]),
+            inputs=employee_rows.reset_index(drop=True)
         )
 
         # =================================================
         # 6️⃣ Explanation (Human readable)
         # =================================================
-        explanations = []
-
-        for issue in validation_issues:
-            explanations.append(self.explainer.explain_validation(issue))
-
-        for anomaly in anomalies:
-            explanations.append(self.explainer.explain_anomaly(anomaly))
-
-        final_explanation = (
-            "\n".join(explanations)
-            if explanations
-            else "No validation issues or anomalies detected."
-        )
+        final_explanation = self._explain(validation_issues, anomalies)
 
         # =================================================
         # 7️⃣ Audit (JSON-safe + Approval-aware)
@@ -139,3 +299,420 @@ class PayrollWorkflow:
             "anomalies": anomalies,
             "explanation": final_explanation
         }
+
+    def _explain(self, validation_issues, anomalies):
+        return self.explainer.explain(validation_issues, anomalies)
+
+    def explain(self, results):
+        """
+        Fills missing explanations of batch results in place (one
+        template lookup per distinct issue signature). Returns results.
+        """
+        return self.explainer.explain_results(results)
+
+    def run_batch(self, payroll_df, historical_df, incremental=False, run=None):
+        """
+        Executes payroll for every employee in payroll_df in one pass.
+        Each stage works on whole columns. Returns a PayrollResultSet in
+        input row order; each of its records has the same keys and values
+        as the dict returned by run().
+
+        With incremental=True only employees whose fingerprint changed
+        since the last run of this period are recomputed and audited
+        (see _run_incremental).
+
+        run: (payroll_run_id, payroll_period) for callers that keep their
+        own run context (e.g. one per app session); this process's run
+        context by default.
+        """
+        run = run or (payroll_run_id, payroll_period)
+
+        # =================================================
+        # 0️⃣ Initialize Approval State (DRAFT)
+        # =================================================
+        approval_state = self.approval_agent.init_state(*run)
+        metrics = self.metrics_for(run[0])
+
+        with metrics.run():
+            with metrics.stage("baseline"):
+                baseline = self._baseline_for(historical_df)
+
+            if incremental:
+                results = self._run_incremental(
+                    payroll_df, baseline, approval_state, metrics, run
+                )
+            else:
+                with self.audit_agent.open_run() as audit:
+                    results = self._run_frame(
+                        payroll_df, baseline, approval_state, audit, metrics, run=run
+                    )
+                    self._commit_audit(audit, metrics)
+
+            self.export_results(results, metrics, run_id=run[0])
+
+        self._export_metrics(metrics)
+        return results
+
+    def run_periods(self, payroll_df, historical_df):
+        """
+        Multi-period run (back-dated or year-end payroll): rows are grouped
+        by their `month` column and every period is computed in the same
+        columnar pass as run_batch. Deductions follow the rules in force
+        in each row's month; salary anomalies compare each month with the
+        employee's previous month in the input (the baseline for their
+        first month).
+
+        Each period gets its own payroll_run_id, approval state, audit
+        partition (its records are written together, so they land in
+        the period's own audit segment) and results file. The pass's
+        metrics are recorded under this process's payroll_run_id.
+
+        Returns a PayrollResultSet in input row order; use
+        results.run_ids() / results.payroll_run_id to split it by period.
+        """
+        payroll_df = payroll_df.reset_index(drop=True)
+        metrics = self.metrics_for(payroll_run_id)
+
+        with metrics.run():
+            with metrics.stage("baseline"):
+                baseline = self._baseline_for(historical_df)
+
+            months, periods = split_periods(payroll_df)
+            for period in periods:
+                period["approval_status"] = self.approval_agent.init_state(
+                    period["payroll_run_id"], period["payroll_period"]
+                )["status"]
+            metrics.count("periods", len(periods))
+
+            results = self._run_frame(
+                payroll_df, baseline, None, None, metrics, periods=(months, periods)
+            )
+
+            with self.audit_agent.open_run() as audit:
+                with metrics.stage("audit", rows=len(results)):
+                    for period in periods:
+                        audit.write_results(results.take(period["positions"]))
+                self._commit_audit(audit, metrics)
+
+            for period in periods:
+                self.export_results(
+                    results.take(period["positions"]), metrics, run_id=period["payroll_run_id"]
+                )
+
+        self._export_metrics(metrics)
+        return results
+
+    # -----------------------------
+    # Instrumentation
+    # -----------------------------
+    def metrics_for(self, run_id):
+        """
+        RunMetrics of one payroll_run_id; repeated calls within the
+        same run accumulate into it.
+        """
+        metrics = self._metrics.get(run_id)
+        if metrics is None:
+            metrics = self._metrics[run_id] = RunMetrics(run_id, profile=self.profile)
+        return metrics
+
+    def release_metrics(self, run_id):
+        """
+        Drops (and returns) a finished run's RunMetrics, so long-lived
+        processes do not keep every run's metrics in memory.
+        """
+        return self._metrics.pop(run_id, None)
+
+    def _commit_audit(self, audit, metrics):
+        with metrics.stage("audit_commit"):
+            audit.commit()
+        metrics.count("audit_records", audit.records_written)
+        metrics.count("audit_bytes", audit.bytes_written)
+
+    def _export_metrics(self, metrics):
+        if self.metrics_dir is not None:
+            metrics.export(self.metrics_dir)
+
+    # -----------------------------
+    # Results export
+    # -----------------------------
+    def results_writer(self, run_id=None):
+        """
+        RunResultsWriter for a run's results file, or None when
+        results export is off (results_dir None / no pyarrow).
+        """
+        if self.results_dir is None or not arrow_available():
+            return None
+        return RunResultsWriter(
+            run_id or payroll_run_id,
+            base_dir=self.results_dir,
+            format=self.results_format,
+            rules_version=self.rules_version
+        )
+
+    def export_results(self, results, metrics=None, run_id=None):
+        """
+        Writes a run's results as data/runs/<payroll_run_id>/results.arrow
+        (memory-mappable; see utils.results_export). Returns the path.
+        """
+        writer = self.results_writer(run_id)
+        if writer is None:
+            return None
+
+        with metrics.stage("results_export", rows=len(results)) if metrics is not None else nullcontext():
+            with writer:
+                writer.write(results)
+        return writer.path
+
+    def _run_incremental(self, payroll_df, baseline, approval_state, metrics, run):
+        """
+        Re-run of a period after corrections. Employees whose fingerprint
+        (input row + rules version + baseline entry) matches the one stored
+        for this period reuse their audited result from the earlier run,
+        keeping that run's payroll_run_id; everyone else goes through
+        _run_frame and is audited under the current run.
+        """
+        payroll_df = payroll_df.reset_index(drop=True)
+        employee_ids = payroll_df["employee_id"].astype(str).tolist()
+
+        version = self.compliance_agent.rules.version
+        if self.anomaly_agent.engine is not None:
+            version = f"{version}|{self.anomaly_agent.engine.signature}"
+
+        with metrics.stage("fingerprint", rows=len(employee_ids)):
+            fingerprints = employee_fingerprints(payroll_df, baseline, version)
+
+        # Employees listed twice are always recomputed
+        unique = ~payroll_df["employee_id"].duplicated(keep=False).to_numpy()
+
+        with metrics.stage("reuse", rows=len(employee_ids)), AuditStore() as store:
+            previous = store.fingerprints(run[1])
+
+            runs = {}
+            for i, employee_id in enumerate(employee_ids):
+                stored = previous.get(employee_id)
+                if unique[i] and stored is not None and stored[0] == fingerprints[i]:
+                    runs.setdefault(stored[1], []).append(i)
+
+            reused = {}
+            for run_id, positions in runs.items():
+                records = store.latest_records(run_id, [employee_ids[i] for i in positions])
+                for i in positions:
+                    record = records.get(employee_ids[i])
+                    if record is not None:
+                        reused[i] = self._result_from_record(record)
+
+        changed = [i for i in range(len(employee_ids)) if i not in reused]
+        metrics.count("employees_reused", len(reused))
+
+        computed = None
+        if changed:
+            with self.audit_agent.open_run() as audit:
+                computed = self._run_frame(
+                    payroll_df.iloc[changed], baseline, approval_state, audit, metrics, run=run
+                )
+                self._commit_audit(audit, metrics)
+
+            with AuditStore() as store:
+                store.save_fingerprints(run[1], [
+                    (employee_ids[i], fingerprints[i], run[0])
+                    for i in changed
+                    if unique[i]
+                ])
+
+        reused_positions = list(reused)
+        reused_results = PayrollResultSet.from_records(reused.values())
+
+        if not self.lazy_explanations:
+            with metrics.stage("explanation", rows=len(reused)):
+                self.explain(reused_results)
+
+        # Back to input row order
+        order = np.argsort(np.array(reused_positions + changed, dtype=np.int64), kind="stable")
+        parts = [reused_results] + ([computed] if computed is not None else [])
+        return PayrollResultSet.concat(parts).take(order)
+
+    @staticmethod
+    def _period_history(payroll_df, payroll, periods):
+        """
+        Anomaly arguments of a multi-period frame: each row's month, and
+        the gross a month leaves in history for the next one (the input
+        gross_salary when present, as in the historical files).
+        """
+        gross = (
+            payroll_df["gross_salary"]
+            if "gross_salary" in payroll_df.columns
+            else payroll["gross_salary"]
+        )
+        return {"months": periods[0], "period_gross": gross.to_numpy(dtype=float)}
+
+    def _result_from_record(self, record):
+        """
+        Rebuilds a run() shaped result from a stored audit record.
+        """
+        return {
+            "employee_id": record["employee_id"],
+            "payroll_run_id": record["payroll_run_id"],
+            "payroll_period": record["payroll_period"],
+            "approval_status": record["approval_status"],
+            "gross_salary": record["gross_salary"],
+            "total_deductions": sum(record["deductions"].values()),
+            "net_salary": record["net_salary"],
+            "earnings": record["earnings"],
+            "deductions": record["deductions"],
+            "validation_issues": record["validation_issues"],
+            "anomalies": record["anomalies"],
+            "explanation": None
+        }
+
+    def run_stream(self, payroll_chunks, historical_df):
+        """
+        Streaming counterpart of run_batch for inputs too large to hold
+        in memory. payroll_chunks is an iterable of DataFrames (see
+        utils.data_loader.iter_payroll_chunks). Yields one
+        PayrollResultSet per chunk; each chunk is audited (and appended to
+        the run's results file) and released before the next one is read,
+        so memory stays flat.
+        """
+        approval_state = self.approval_agent.init_state(payroll_run_id, payroll_period)
+        metrics = self.metrics_for(payroll_run_id)
+
+        # Not metrics.run(): the time spent by the consumer between
+        # chunks is not payroll work, so run_seconds sums the chunks.
+        with metrics.stage("baseline"):
+            baseline = self._baseline_for(historical_df)
+
+        writer = self.results_writer()
+
+        # Background audit writer: each chunk's records are written while
+        # the next chunk is computed
+        with self.audit_agent.open_run(background=True) as audit, writer or nullcontext():
+            for chunk in payroll_chunks:
+                with metrics.run():
+                    results = self._run_frame(chunk, baseline, approval_state, audit, metrics)
+                    with metrics.stage("audit_flush"):
+                        audit.flush()
+                    if writer is not None:
+                        with metrics.stage("results_export", rows=len(results)):
+                            writer.write(results)
+                yield results
+
+            self._commit_audit(audit, metrics)
+
+        self._export_metrics(metrics)
+
+    def _run_frame(self, payroll_df, baseline, approval_state, audit, metrics=None,
+                   periods=None, run=None):
+        """
+        Stages 1–8 over one frame of employees (see run_batch).
+        With audit=None nothing is written; callers audit the returned
+        results themselves (see workflows.parallel_runner).
+        With a RunMetrics, each stage's time and row count is recorded.
+        periods: (months, periods) from split_periods for a multi-period
+        frame (see run_periods); results are labelled per period and
+        anomalies compare consecutive months.
+        run: (payroll_run_id, payroll_period) when labelling results for
+        another process's run (worker processes); this process's run
+        context by default.
+        """
+
+        payroll_df = payroll_df.reset_index(drop=True)
+        rows = len(payroll_df)
+
+        def stage(name):
+            return metrics.stage(name, rows=rows) if metrics is not None else nullcontext()
+
+        # =================================================
+        # 1️⃣ Earnings (Salary Structure + Variable Pay)
+        # =================================================
+        with stage("earnings"):
+            earnings_df = self.structure_agent.run_batch(payroll_df).join(
+                self.variable_agent.run_batch(payroll_df)
+            )
+
+        # =================================================
+        # 2️⃣ Statutory Deductions
+        # =================================================
+        with stage("deductions"):
+            states, pay_dates = _pay_context(payroll_df)
+            deductions_df = self.compliance_agent.run_batch(
+                earnings_df, states=states, pay_dates=pay_dates
+            )
+
+        # =================================================
+        # 3️⃣ Payroll Calculation (Gross → Net)
+        # =================================================
+        with stage("calculation"):
+            payroll = self.calculation_agent.run_batch(earnings_df, deductions_df)
+
+            payroll_frame = pd.concat([
+                payroll_df[["employee_id"]],
+                payroll[["gross_salary", "net_salary"]],
+                deductions_df
+            ], axis=1)
+
+        # =================================================
+        # 4️⃣ Validation (Post-calculation)
+        # =================================================
+        with stage("validation"):
+            validation_issues = self.validation_agent.run_batch(payroll_frame, pay_dates)
+
+        # =================================================
+        # 5️⃣ Anomaly Detection (vs historical)
+        # =================================================
+        with stage("anomaly"):
+            history = self._period_history(payroll_df, payroll, periods) if periods is not None else {}
+            anomalies = self.anomaly_agent.run_batch(
+                current_df=payroll_frame,
+                baseline=baseline,
+                earnings=earnings_df,
+                inputs=payroll_df,
+                **history
+            )
+
+        # =================================================
+        # 8️⃣ Result (columnar; records shaped like run())
+        # =================================================
+        with stage("results"):
+            if periods is None:
+                run_id, period = run or (payroll_run_id, payroll_period)
+                labels = {
+                    "payroll_run_id": run_id,
+                    "payroll_period": period,
+                    "approval_status": approval_state["status"],
+                }
+            else:
+                labels = _period_labels(periods[1], rows)
+
+            results = PayrollResultSet(
+                employee_id=payroll_df["employee_id"].tolist(),
+                **labels,
+                gross_salary=payroll["gross_salary"].to_numpy(),
+                total_deductions=payroll["total_deductions"].to_numpy(),
+                net_salary=payroll["net_salary"].to_numpy(),
+                earnings=earnings_df,
+                deductions=deductions_df,
+                validation_issues=validation_issues,
+                anomalies=anomalies,
+                pay_date=pay_dates
+            )
+
+        # =================================================
+        # 6️⃣ Explanation (deduplicated by issue signature)
+        # =================================================
+        if not self.lazy_explanations:
+            with stage("explanation"):
+                self.explain(results)
+
+        # =================================================
+        # 7️⃣ Audit (per employee record)
+        # =================================================
+        if audit is not None:
+            with stage("audit"):
+                audit.write_results(results)
+
+        if metrics is not None:
+            metrics.count("employees", rows)
+            metrics.count("employees_with_issues", sum(1 for v in validation_issues if v))
+            metrics.count("employees_with_anomalies", sum(1 for a in anomalies if a))
+
+        return results